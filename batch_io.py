@@ -0,0 +1,183 @@
+# batch_io.py
+"""
+E/S de datagramas por lotes para Linux (sendmmsg/recvmmsg mediante ctypes).
+
+Con una llamada al sistema por paquete, por encima de unas decenas de miles de paquetes
+por segundo el coste de las llamadas y del cambio de GIL limita el caudal. Estas clases
+envían o reciben muchos datagramas por llamada. ctypes libera el GIL durante la llamada.
+Si la plataforma no las ofrece, open_batch_sender/open_batch_receiver devuelven None y
+el llamante sigue usando sendto/recvfrom.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import socket
+import struct
+import sys
+from contextlib import contextmanager
+
+IO_BACKENDS = ("standard", "mmsg", "auto")
+
+# Límite del kernel de mensajes por llamada (UIO_MAXIOV).
+_MAX_VLEN = 1024
+
+_MSG_DONTWAIT = getattr(socket, 'MSG_DONTWAIT', 0x40)
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p), ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.c_void_p), ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p), ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _MsgHdr), ('msg_len', ctypes.c_uint)]
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+        libc.recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+_libc = _load_libc()
+HAS_MMSG = _libc is not None
+
+def use_batch_io(io_backend):
+    """True si el ajuste `io_backend` pide E/S por lotes ("mmsg" o "auto") y la plataforma la ofrece."""
+    return io_backend != "standard" and HAS_MMSG
+
+def _raise_errno():
+    err = ctypes.get_errno()
+    raise OSError(err, os.strerror(err))
+
+def _sockaddr_in(address):
+    host, port = address
+    return ctypes.create_string_buffer(struct.pack('=H', socket.AF_INET) + struct.pack('!H', port) +
+                                       socket.inet_aton(host) + bytes(8), 16)
+
+class BatchSender:
+    """
+    Agrupa datagramas (cabecera + tramo de `source`) hacia un mismo destino y los envía con
+    sendmmsg. `source` debe ser un búfer escribible (p. ej. un mmap ACCESS_COPY) para poder
+    obtener su dirección; la carga útil no se copia. La cabecera se copia a un hueco propio.
+    """
+    def __init__(self, sock, address, source, max_batch, header_size):
+        self.sock = sock
+        self.max_batch = max(1, min(max_batch, _MAX_VLEN))
+        self.header_size = header_size
+        self.count = 0
+        self.queued_bytes = 0
+
+        self._addr = _sockaddr_in(address)
+        self._headers = bytearray(self.max_batch * header_size)
+        self._headers_ref = (ctypes.c_char * len(self._headers)).from_buffer(self._headers)
+        self._source_ref = ctypes.c_char.from_buffer(source) if len(source) else None
+        self._source_base = ctypes.addressof(self._source_ref) if self._source_ref is not None else 0
+        self._iov = (_IOVec * (2 * self.max_batch))()
+        self._msgs = (_MMsgHdr * self.max_batch)()
+
+        headers_base = ctypes.addressof(self._headers_ref)
+        for i in range(self.max_batch):
+            self._iov[2 * i].iov_base = headers_base + i * header_size
+            self._iov[2 * i].iov_len = header_size
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self._addr)
+            hdr.msg_namelen = 16
+            hdr.msg_iov = ctypes.addressof(self._iov[2 * i])
+            hdr.msg_iovlen = 2
+
+    def add(self, header, offset, length):
+        """Encola un datagrama. Devuelve True si el lote está lleno y hay que llamar a flush()."""
+        i = self.count
+        self._headers[i * self.header_size:(i + 1) * self.header_size] = header
+        self._iov[2 * i + 1].iov_base = self._source_base + offset
+        self._iov[2 * i + 1].iov_len = length
+        self.count += 1
+        self.queued_bytes += self.header_size + length
+        return self.count == self.max_batch
+
+    def flush(self):
+        """Envía todo lo encolado. sendmmsg puede enviar solo una parte: se repite con el resto."""
+        sent = 0
+        fd = self.sock.fileno()
+        while sent < self.count:
+            result = _libc.sendmmsg(fd, ctypes.addressof(self._msgs[sent]), self.count - sent, 0)
+            if result < 0:
+                self.count = self.queued_bytes = 0
+                _raise_errno()
+            sent += result
+        self.count = self.queued_bytes = 0
+
+    def close(self):
+        # Suelta las referencias a los búferes para que el mmap pueda cerrarse.
+        self._source_ref = None
+        self._headers_ref = None
+
+class BatchReceiver:
+    """
+    Recibe hasta `max_batch` datagramas por llamada con recvmmsg. Los datos se escriben
+    directamente en los huecos de `buffer` (de tamaño `slot_size`) que indique el llamante.
+    """
+    def __init__(self, sock, buffer, slot_size, max_batch):
+        self.sock = sock
+        self.slot_size = slot_size
+        self.max_batch = max(1, min(max_batch, _MAX_VLEN))
+        self._buffer_ref = (ctypes.c_char * len(buffer)).from_buffer(buffer)
+        self._base = ctypes.addressof(self._buffer_ref)
+        self._iov = (_IOVec * self.max_batch)()
+        self._msgs = (_MMsgHdr * self.max_batch)()
+        for i in range(self.max_batch):
+            self._iov[i].iov_len = slot_size
+            self._msgs[i].msg_hdr.msg_iov = ctypes.addressof(self._iov[i])
+            self._msgs[i].msg_hdr.msg_iovlen = 1
+        self._poller = select.poll()
+        self._poller.register(sock.fileno(), select.POLLIN)
+
+    def recv(self, slots, timeout_ms=500):
+        """
+        Espera datos como mucho `timeout_ms` y los recibe en los huecos `slots` (en orden).
+        Devuelve la lista de longitudes recibidas, una por datagrama (vacía si no llegó nada).
+        """
+        events = self._poller.poll(timeout_ms)
+        if not events:
+            return []
+        if events[0][1] & (select.POLLNVAL | select.POLLERR):
+            raise OSError("El socket de recepción se ha cerrado.")
+        count = min(len(slots), self.max_batch)
+        for i in range(count):
+            self._iov[i].iov_base = self._base + slots[i] * self.slot_size
+        result = _libc.recvmmsg(self.sock.fileno(), ctypes.addressof(self._msgs), count, _MSG_DONTWAIT, None)
+        if result < 0:
+            if ctypes.get_errno() in (errno.EAGAIN, errno.EINTR):
+                return []
+            _raise_errno()
+        return [self._msgs[i].msg_len for i in range(result)]
+
+    def close(self):
+        self._buffer_ref = None
+
+@contextmanager
+def open_batch_sender(sock, address, source, max_batch, header_size):
+    """Context manager que produce un BatchSender, o None si la plataforma no lo soporta."""
+    batch = None
+    if HAS_MMSG:
+        try:
+            batch = BatchSender(sock, address, source, max_batch, header_size)
+        except (TypeError, BufferError, ValueError):
+            batch = None  # Búfer de solo lectura: se envía paquete a paquete.
+    try:
+        yield batch
+    finally:
+        if batch: batch.close()
+
+def open_batch_receiver(sock, buffer, slot_size, max_batch):
+    return BatchReceiver(sock, buffer, slot_size, max_batch) if HAS_MMSG else None
@@ -0,0 +1,94 @@
+# checksum.py
+"""
+Utilidades para calcular el CRC32 de un archivo por partes.
+
+crc32_combine() obtiene CRC32(A + B) a partir de CRC32(A), CRC32(B) y len(B) sin volver
+a leer los datos (mismo algoritmo que crc32_combine de zlib, sobre GF(2)). Esto permite
+al receptor verificar el archivo a medida que llegan los bloques y dejar la comprobación
+final en una operación proporcional al número de bloques.
+"""
+import zlib
+from functools import lru_cache
+
+_CRC32_POLY = 0xEDB88320
+
+def _gf2_matrix_times(mat, vec):
+    result = 0
+    i = 0
+    while vec:
+        if vec & 1:
+            result ^= mat[i]
+        vec >>= 1
+        i += 1
+    return result
+
+def _gf2_matrix_compose(a, b):
+    return [_gf2_matrix_times(a, column) for column in b]
+
+@lru_cache(maxsize=64)
+def _crc32_shift_operator(length):
+    """Matriz que aplica a un CRC el efecto de añadir `length` bytes a cero."""
+    one_bit = [_CRC32_POLY] + [1 << (n - 1) for n in range(1, 32)]
+    op = one_bit
+    for _ in range(3):  # 1 bit -> 2 -> 4 -> 8 bits (un byte)
+        op = _gf2_matrix_compose(op, op)
+    result = [1 << n for n in range(32)]
+    while length:
+        if length & 1:
+            result = _gf2_matrix_compose(op, result)
+        length >>= 1
+        if length:
+            op = _gf2_matrix_compose(op, op)
+    return tuple(result)
+
+def crc32_combine(crc1, crc2, len2):
+    """CRC32 de la concatenación A + B, dados CRC32(A), CRC32(B) y len(B)."""
+    if len2 <= 0:
+        return crc1
+    return _gf2_matrix_times(_crc32_shift_operator(len2), crc1) ^ crc2
+
+def compute_file_crc32(file_path):
+    """CRC32 de un archivo completo, leído en trozos de 64 KB para no cargarlo en memoria."""
+    crc_value = 0
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(65536):
+            crc_value = zlib.crc32(chunk, crc_value)
+    return crc_value
+
+def crc32_concat(parts):
+    """CRC32 de la concatenación de varias partes dadas como [(crc, longitud), ...] en orden."""
+    crc = 0
+    for part_crc, length in parts:
+        crc = crc32_combine(crc, part_crc, length)
+    return crc
+
+class ChunkedCrc32:
+    """
+    CRC32 de un tramo de trozos consecutivos que pueden llegar desordenados.
+    Los trozos que llegan en orden se encadenan directamente con zlib.crc32; los que
+    llegan adelantados se guardan como (crc, longitud) y se combinan al cerrar el hueco.
+    """
+    def __init__(self, first_seq):
+        self.next_seq = first_seq
+        self.crc = 0
+        self.length = 0
+        self.out_of_order = {}
+
+    def add(self, seq_num, data):
+        if seq_num == self.next_seq:
+            self.crc = zlib.crc32(data, self.crc)
+            self.length += len(data)
+            self.next_seq += 1
+            while self.next_seq in self.out_of_order:
+                part_crc, part_len = self.out_of_order.pop(self.next_seq)
+                self.crc = crc32_combine(self.crc, part_crc, part_len)
+                self.length += part_len
+                self.next_seq += 1
+        elif seq_num > self.next_seq and seq_num not in self.out_of_order:
+            self.out_of_order[seq_num] = (zlib.crc32(data), len(data))
+
+    def result(self, end_seq):
+        """(crc, longitud) del tramo completo hasta `end_seq`, o None si aún falta algún trozo."""
+        if self.next_seq != end_seq:
+            return None
+        return self.crc, self.length
@@ -0,0 +1,112 @@
+# compression.py
+"""
+Compresión opcional de los trozos de datos, decidida trozo a trozo.
+
+Cada trozo se comprime por separado (el receptor puede descomprimirlo aunque falten los
+anteriores) y solo viaja comprimido si ocupa claramente menos; el códec usado se marca en
+el byte de flags de la cabecera, así que en un mismo bloque conviven trozos comprimidos y
+sin comprimir. Para no gastar CPU en datos que no se dejan comprimir (vídeo, archivos ya
+comprimidos) el emisor mide el ratio en ventanas de trozos y, si no compensa, deja de
+intentarlo durante un tramo que se duplica mientras las nuevas muestras sigan sin compensar.
+
+Códecs: 'zlib' (biblioteca estándar, nivel 1) y 'lz4' (más rápido, requiere el paquete
+opcional `lz4`). La FEC y los CRC trabajan siempre sobre los datos sin comprimir.
+"""
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lz4.block as _lz4_block
+except ImportError:
+    _lz4_block = None
+
+# Valor de los bits de códec (protocol.FLAG_CODEC_MASK) en la cabecera de un PKT_DATA.
+CODEC_FLAGS = {'zlib': 0x01, 'lz4': 0x02}
+
+ZLIB_LEVEL = 1
+# Un trozo solo se envía comprimido si ocupa menos de esta fracción del original.
+MAX_RATIO = 0.9
+# Trozos que forman una ventana de muestreo.
+SAMPLE_CHUNKS = 32
+# Trozos que se envían sin intentar comprimir tras una ventana que no compensa: empieza
+# en el mínimo y se duplica con cada ventana fallida seguida, hasta el máximo.
+MIN_BYPASS_CHUNKS = 32
+MAX_BYPASS_CHUNKS = 1024
+
+def available_codecs():
+    """Códecs que se pueden usar en este equipo."""
+    return ['zlib', 'lz4'] if _lz4_block else ['zlib']
+
+def codec_available(codec):
+    return codec in available_codecs()
+
+def _compress_function(codec):
+    if codec == 'lz4':
+        return lambda chunk: _lz4_block.compress(chunk, store_size=False)
+    return lambda chunk: zlib.compress(chunk, ZLIB_LEVEL)
+
+def decompress(flags, payload, max_size):
+    """
+    Descomprime un trozo según los bits de códec de la cabecera. Devuelve None si el códec
+    no está disponible o los datos no son válidos (el trozo se descarta y se volverá a pedir).
+    """
+    try:
+        if flags == CODEC_FLAGS['zlib']:
+            decompressor = zlib.decompressobj()
+            chunk = decompressor.decompress(payload, max_size)
+            return chunk if decompressor.eof else None
+        if flags == CODEC_FLAGS['lz4'] and _lz4_block:
+            return _lz4_block.decompress(payload, uncompressed_size=max_size)
+    except (zlib.error, ValueError, RuntimeError, MemoryError):
+        pass
+    return None
+
+class AdaptiveCompressor:
+    """Compresor del emisor con desactivación automática cuando los datos no se comprimen."""
+    def __init__(self, codec):
+        self.codec = codec
+        self.flag = CODEC_FLAGS[codec]
+        self._compress = _compress_function(codec)
+        # Totales de la sesión: bytes originales y bytes que salieron a la red.
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+        self.window_raw = 0
+        self.window_packed = 0
+        self.window_chunks = 0
+        self.bypass_remaining = 0
+        self.bypass_length = MIN_BYPASS_CHUNKS
+
+    def compress(self, chunk):
+        """Devuelve el trozo comprimido, o None si debe enviarse tal cual."""
+        size = len(chunk)
+        self.raw_bytes += size
+        if self.bypass_remaining:
+            self.bypass_remaining -= 1
+            self.wire_bytes += size
+            return None
+
+        packed = self._compress(chunk)
+        useful = len(packed) < size * MAX_RATIO
+        sent = len(packed) if useful else size
+        self.wire_bytes += sent
+        self.window_raw += size
+        self.window_packed += sent
+        self.window_chunks += 1
+        if self.window_chunks >= SAMPLE_CHUNKS:
+            window_ratio = self.window_packed / max(1, self.window_raw)
+            if window_ratio >= MAX_RATIO:
+                if self.bypass_length == MIN_BYPASS_CHUNKS:
+                    logger.info("[SND] Datos poco comprimibles (ratio %.2f): compresión en pausa.", window_ratio)
+                self.bypass_remaining = self.bypass_length
+                self.bypass_length = min(self.bypass_length * 2, MAX_BYPASS_CHUNKS)
+            elif self.bypass_length != MIN_BYPASS_CHUNKS:
+                logger.info("[SND] Los datos vuelven a comprimirse (ratio %.2f): compresión reanudada.", window_ratio)
+                self.bypass_length = MIN_BYPASS_CHUNKS
+            self.window_raw = self.window_packed = self.window_chunks = 0
+        return packed if useful else None
+
+    def ratio(self):
+        """Bytes enviados por cada byte original (1.0 = sin ganancia)."""
+        return self.wire_bytes / self.raw_bytes if self.raw_bytes else 1.0
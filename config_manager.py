@@ -1,8 +1,11 @@
 # config_manager.py
+import logging
 import json
 import os
 import socket
 
+logger = logging.getLogger(__name__)
+
 CONFIG_FILE = 'config.json'
 
 CONFIG_PRESETS = {
@@ -12,7 +15,14 @@ CONFIG_PRESETS = {
             "chunk_size": 4096,
             "block_size_packets": 128,
             "nack_listen_timeout": 0.5,
-            "repair_rounds": 8
+            "nack_backoff_ms": 150,
+            "repair_rounds": 8,
+            "target_bitrate": 20.0,
+            "max_burst": 8,
+            "fec_parity_packets": 8,
+            "window_blocks": 1,
+            "io_backend": "standard",
+            "compression": "zlib"
         }
     },
     "Wi-Fi (Estándar)": {
@@ -21,7 +31,14 @@ CONFIG_PRESETS = {
             "chunk_size": 8192,
             "block_size_packets": 256,
             "nack_listen_timeout": 0.2,
-            "repair_rounds": 5
+            "nack_backoff_ms": 60,
+            "repair_rounds": 5,
+            "target_bitrate": 100.0,
+            "max_burst": 16,
+            "fec_parity_packets": 4,
+            "window_blocks": 2,
+            "io_backend": "standard",
+            "compression": "zlib"
         }
     },
     "Ethernet (Rápido)": {
@@ -30,7 +47,14 @@ CONFIG_PRESETS = {
             "chunk_size": 16384,
             "block_size_packets": 512,
             "nack_listen_timeout": 0.15,
-            "repair_rounds": 4
+            "nack_backoff_ms": 40,
+            "repair_rounds": 4,
+            "target_bitrate": 900.0,
+            "max_burst": 32,
+            "fec_parity_packets": 0,
+            "window_blocks": 4,
+            "io_backend": "auto",
+            "compression": "off"
         }
     },
     "Ethernet (Extremo)": {
@@ -40,7 +64,30 @@ CONFIG_PRESETS = {
             "chunk_size": 32768,
             "block_size_packets": 512,      # Reducido de 1024 para evitar desbordamiento de búfer.
             "nack_listen_timeout": 0.15,    # Aumentado de 0.1 para dar más tiempo de respuesta.
-            "repair_rounds": 5              # Aumentado de 3 para mayor robustez.
+            "nack_backoff_ms": 40,
+            "repair_rounds": 5,             # Aumentado de 3 para mayor robustez.
+            "target_bitrate": 950.0,
+            "max_burst": 64,
+            "fec_parity_packets": 0,
+            "window_blocks": 8,
+            "io_backend": "auto",
+            "compression": "off"
+        }
+    },
+    "Ethernet 10G": {
+        "help": "Para redes de 10 Gbps. Usa paquetes casi del tamaño máximo de UDP para que un solo núcleo del emisor pueda llenar el enlace. Requiere una red cableada sin pérdidas.",
+        "settings": {
+            "chunk_size": 61440,
+            "block_size_packets": 256,
+            "nack_listen_timeout": 0.15,
+            "nack_backoff_ms": 40,
+            "repair_rounds": 5,
+            "target_bitrate": 9000.0,
+            "max_burst": 64,
+            "fec_parity_packets": 0,
+            "window_blocks": 8,
+            "io_backend": "auto",
+            "compression": "off"
         }
     }
 }
@@ -78,15 +125,98 @@ CONFIG_METADATA = {
             "label": "Espera NACK (segundos)",
             "help": "El tiempo que el emisor espera por informes de error (NACKs) tras enviar un bloque. Aumentar este valor puede ayudar en redes con alta latencia, pero ralentizará la transferencia."
         },
+        "nack_backoff_ms": {
+            "default": 40, # Corresponde a "Ethernet (Rápido)"
+            "label": "Espera Aleatoria NACK (ms)",
+            "help": "Tiempo máximo que cada receptor espera, elegido al azar, antes de pedir los paquetes que le faltan. Los NACK se envían al grupo multicast: si en ese tiempo oye que otro receptor ya ha pedido lo mismo, no lo pide. Así el emisor recibe casi los mismos NACK con 5 que con 500 receptores. Se limita a la mitad de la Espera NACK; use 0 para pedir sin esperar."
+        },
         "repair_rounds": {
             "default": 4, # Corresponde a "Ethernet (Rápido)"
             "label": "Rondas de Reparación",
             "help": "Número máximo de intentos para reenviar los paquetes perdidos de un bloque. Aumenta la robustez en redes muy inestables a costa de posibles pausas si la red es mala."
+        },
+        "target_bitrate": {
+            "default": 900.0, # Corresponde a "Ethernet (Rápido)"
+            "label": "Tasa Objetivo (Mbps)",
+            "help": "Velocidad de envío que el emisor intenta mantener, medida con un reloj de alta resolución. Use 0 para enviar sin límite. Un valor por encima de lo que soporta la red (o el receptor más lento) provoca pérdidas y más rondas de reparación."
+        },
+        "max_burst": {
+            "default": 32, # Corresponde a "Ethernet (Rápido)"
+            "label": "Ráfaga Máxima (paquetes)",
+            "help": "Número de paquetes que pueden enviarse seguidos sin pausa cuando el emisor va por detrás de la tasa objetivo. Ráfagas grandes reducen la sobrecarga de CPU, pero pueden desbordar los búferes de receptores en Wi-Fi."
+        },
+        "fec_parity_packets": {
+            "default": 0, # Corresponde a "Ethernet (Rápido)"
+            "label": "Paquetes de Paridad (FEC)",
+            "help": "Paquetes de corrección de errores enviados al final de cada bloque. Cada uno permite a los receptores reconstruir un paquete perdido sin pedir retransmisión. Útil en Wi-Fi con muchos receptores; use 0 para desactivarlo."
+        },
+        "window_blocks": {
+            "default": 4, # Corresponde a "Ethernet (Rápido)"
+            "label": "Bloques en Vuelo",
+            "help": "Número de bloques que el emisor puede enviar antes de que se cierren las rondas de reparación de los anteriores. Con 1 el emisor espera a cada bloque (parada y espera); valores mayores evitan las pausas en redes limpias y rápidas."
+        },
+        "io_backend": {
+            "default": "auto", # Corresponde a "Ethernet (Rápido)"
+            "choices": ["standard", "mmsg", "auto"],
+            "label": "E/S de Red",
+            "help": "Cómo se envían y reciben los datagramas. 'standard' hace una llamada al sistema por paquete; 'mmsg' agrupa muchos paquetes por llamada (sendmmsg/recvmmsg, solo Linux) y reduce el uso de CPU a tasas altas; 'auto' usa 'mmsg' cuando está disponible. Si no lo está, se usa siempre 'standard'."
+        },
+        "compression": {
+            "default": "off", # Corresponde a "Ethernet (Rápido)"
+            "choices": ["off", "zlib", "lz4"],
+            "label": "Compresión",
+            "help": "Comprime cada paquete de datos antes de enviarlo y solo lo manda comprimido si ocupa bastante menos. Si los datos no se dejan comprimir (vídeo, ZIP, imágenes), el emisor deja de intentarlo automáticamente durante un tiempo. Ayuda en redes lentas como Wi-Fi; en Ethernet rápida la CPU suele ser el límite. 'lz4' es más rápido que 'zlib' pero requiere instalar el paquete lz4 en ambos equipos."
+        },
+        "multicast_group_range": {
+            "default": "239.192.2.0/24",
+            "label": "Rango de Grupos Multicast",
+            "help": "Rango (en notación CIDR) del que cada sesión elige al azar su propio grupo multicast. Los receptores solo se unen al grupo de la sesión que descargan, así que el tráfico de otras sesiones lo filtra la tarjeta de red."
+        },
+        "session_port_range": {
+            "default": "5100-5199",
+            "label": "Rango de Puertos de Sesión",
+            "help": "Puertos entre los que cada sesión reserva dos libres: uno para el handshake (TCP) y los datos (UDP) y el siguiente para los NACK (UDP). Permite varios emisores en el mismo equipo. Debe estar abierto en el firewall."
+        },
+        "write_buffer_mb": {
+            "default": 64,
+            "label": "Búfer de Escritura (MB)",
+            "help": "Memoria máxima que el receptor usa para acumular datos pendientes de escribir en disco. Si el disco es más lento que la red y el búfer se llena, los paquetes se descartan y se vuelven a pedir en lugar de detener la recepción."
+        },
+        "adaptive_rate": {
+            "default": 1,
+            "label": "Tasa Adaptativa (1/0)",
+            "help": "Con 1, el emisor ajusta la velocidad en cada bloque según las pérdidas que notifican los receptores: la sube mientras no haya pérdidas y la reduce cuando aparecen. La Tasa Objetivo pasa a ser el máximo y se arranca en su mitad; si es 0, el máximo es 10 Gbps y se arranca en la Tasa Inicial Adaptativa. Con 0, se envía siempre a la Tasa Objetivo."
+        },
+        "metrics_port": {
+            "default": 0,
+            "label": "Puerto de Métricas",
+            "help": "Puerto local (solo 127.0.0.1) en el que se publican las métricas de envío y recepción: paquetes enviados y reenviados, NACKs, rondas de reparación, descartes, bytes escritos y latencia de bloque. /metrics usa el formato de Prometheus y /metrics.json es JSON. Use 0 para desactivarlo. Se aplica al abrir la aplicación."
+        },
+        "start_bitrate": {
+            "default": 100.0,
+            "label": "Tasa Inicial Adaptativa (Mbps)",
+            "help": "Con la Tasa Adaptativa activada y la Tasa Objetivo en 0 (sin límite), velocidad a la que empieza el envío antes de subir o bajar según las pérdidas. Con una Tasa Objetivo se empieza en la mitad de ella. La tasa nunca baja de 1 Mbps."
+        },
+        "stream_checksum": {
+            "default": 1,
+            "label": "Checksum durante el Envío (1/0)",
+            "help": "Con 1, el emisor calcula el CRC32 mientras envía y lo manda al final de la transmisión, de modo que el envío empieza al instante aunque el archivo sea enorme. Con 0, lo calcula antes de empezar leyendo el archivo completo."
         }
     }
 }
 
 
+def coerce_network_setting(key, value):
+    """
+    Convierte un valor de la configuración de red (p. ej. el texto de un campo de la GUI)
+    al tipo de su valor por defecto en CONFIG_METADATA. Lanza ValueError si no es válido.
+    """
+    meta = CONFIG_METADATA['network_settings'][key]
+    value = type(meta['default'])(value)
+    if 'choices' in meta and value not in meta['choices']:
+        raise ValueError(f"Valor no válido para {key}: {value}")
+    return value
+
 def get_default_username():
     """Genera un nombre de usuario por defecto a partir del nombre del host."""
     hostname = socket.gethostname()
@@ -107,7 +237,9 @@ def get_default_config():
         'network_settings': {
             key: data['default'] 
             for key, data in CONFIG_METADATA['network_settings'].items()
-        }
+        },
+        # Ajustes medidos con `pycast_app.py tune`, por subred: se aplican al estar en esa red.
+        'network_profiles': {}
     }
     return config
 
@@ -154,4 +286,4 @@ def save_config(config_data):
         with open(CONFIG_FILE, 'w') as f:
             json.dump(config_data, f, indent=4)
     except IOError as e:
-        print(f"Error al guardar la configuración: {e}")
+        logger.error("Error al guardar la configuración: %s", e)
@@ -0,0 +1,259 @@
+# disk_writer.py
+import bisect
+import errno
+import os
+import threading
+from collections import OrderedDict
+
+# Límite de búferes por llamada a pwritev (IOV_MAX es 1024 en Linux y la mayoría de Unix).
+_IOV_MAX = 1024
+# Descriptores abiertos a la vez al escribir un conjunto de archivos.
+_MAX_OPEN_FILES = 64
+
+def _preallocate(fd, size):
+    """Reserva el espacio del archivo de una vez (fallocate) o, si no se puede, lo extiende (sparse)."""
+    if size <= 0:
+        return
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass  # Sistemas de archivos sin soporte (p. ej. algunos FUSE/NFS).
+    os.ftruncate(fd, size)
+
+def _open_file(path, size, truncate):
+    # Sin truncar se conserva el contenido de una descarga interrumpida que se reanuda.
+    flags = os.O_RDWR | os.O_CREAT | (os.O_TRUNC if truncate else 0) | getattr(os, 'O_BINARY', 0)
+    fd = os.open(path, flags, 0o644)
+    try:
+        _preallocate(fd, size)
+    except OSError:
+        os.close(fd)
+        raise
+    return fd
+
+def _check_progress(written):
+    """Una escritura de 0 bytes no avanzaría nunca (disco lleno en algunos FUSE): se trata como error."""
+    if written <= 0:
+        raise OSError(errno.EIO, "La escritura en disco no avanza (0 bytes escritos)")
+    return written
+
+def _write_buffers(fd, offset, buffers):
+    if hasattr(os, 'pwritev'):
+        for i in range(0, len(buffers), _IOV_MAX):
+            group = buffers[i:i + _IOV_MAX]
+            total = sum(len(b) for b in group)
+            written = os.pwritev(fd, group, offset)
+            if written < total:  # Escritura parcial: se completa con el resto, que también puede quedarse corto.
+                _check_progress(written)
+                rest = memoryview(b''.join(group))
+                while written < total:
+                    written += _check_progress(os.pwrite(fd, rest[written:], offset + written))
+            offset += total
+    else:
+        os.lseek(fd, offset, os.SEEK_SET)
+        data = memoryview(b''.join(buffers))
+        while data:
+            data = data[_check_progress(os.write(fd, data)):]
+
+class _SingleFileTarget:
+    def __init__(self, path, file_size, truncate):
+        self.fd = _open_file(path, file_size, truncate)
+
+    def write_run(self, offset, buffers):
+        _write_buffers(self.fd, offset, buffers)
+
+    def close(self):
+        os.close(self.fd)
+
+class _FileSetTarget:
+    """
+    Reparte las escrituras del espacio lógico de un conjunto de archivos (ver file_set.py)
+    entre los archivos, creados bajo la carpeta `root`. Un tramo contiguo puede abarcar
+    varios archivos pequeños; se divide en sus límites.
+    """
+    def __init__(self, root, files, truncate):
+        os.makedirs(root, exist_ok=True)
+        self.paths, self.starts, self.sizes = [], [], []
+        offset = 0
+        for relative_path, size in files:
+            path = os.path.join(root, relative_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.close(_open_file(path, size, truncate))
+            self.paths.append(path)
+            self.starts.append(offset)
+            self.sizes.append(size)
+            offset += size
+        self.fds = OrderedDict()
+
+    def write_run(self, offset, buffers):
+        position, end = offset, offset + sum(len(b) for b in buffers)
+        # Caso habitual con archivos grandes: todo el tramo cae en un mismo archivo.
+        idx = bisect.bisect_right(self.starts, position) - 1
+        if end - self.starts[idx] <= self.sizes[idx]:
+            _write_buffers(self._fd(idx), position - self.starts[idx], buffers)
+            return
+        data = memoryview(b''.join(buffers))
+        while position < end:
+            idx = bisect.bisect_right(self.starts, position) - 1
+            file_offset = position - self.starts[idx]
+            length = min(end - position, self.sizes[idx] - file_offset)
+            if length <= 0: break
+            _write_buffers(self._fd(idx), file_offset, [data[position - offset:position - offset + length]])
+            position += length
+
+    def _fd(self, idx):
+        fd = self.fds.get(idx)
+        if fd is not None:
+            self.fds.move_to_end(idx)
+            return fd
+        if len(self.fds) >= _MAX_OPEN_FILES:
+            os.close(self.fds.popitem(last=False)[1])
+        fd = self.fds[idx] = os.open(self.paths[idx], os.O_RDWR | getattr(os, 'O_BINARY', 0))
+        return fd
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds.clear()
+
+def _coalesce(pending):
+    """Agrupa los trozos pendientes {offset: datos} en tramos contiguos [(offset, [datos, ...])]."""
+    runs = []
+    next_offset = None
+    for offset in sorted(pending):
+        data = pending[offset]
+        if offset == next_offset:
+            runs[-1][1].append(data)
+        else:
+            runs.append((offset, [data]))
+        next_offset = offset + len(data)
+    return runs
+
+class WriteBehindWriter:
+    """
+    Escritor en segundo plano para el archivo temporal del receptor.
+    El hilo de red solo deposita los trozos en memoria (submit) y un hilo dedicado los
+    escribe agrupando los contiguos en escrituras grandes. La memoria retenida está
+    limitada por `memory_budget`: si se supera, el trozo se descarta en lugar de bloquear
+    al hilo de red, y se recuperará con un NACK como cualquier paquete perdido.
+    """
+    def __init__(self, path, file_size, memory_budget, truncate=True, files=None, metrics=None):
+        """
+        Con `files` = [(ruta relativa, tamaño)], `path` es la carpeta donde se escribe el conjunto.
+        Con `metrics` (ReceiverMetrics) se suman también los bytes escritos y los trozos descartados.
+        """
+        self.path = path
+        self.metrics = metrics
+        self.memory_budget = memory_budget
+        if files is None:
+            self.target = _SingleFileTarget(path, file_size, truncate)
+        else:
+            self.target = _FileSetTarget(path, files, truncate)
+
+        self.cond = threading.Condition()
+        self.pending = {}
+        self.pending_bytes = 0  # Incluye lo que el hilo está escribiendo en este momento.
+        self.closing = False
+        self.error = None
+        # Contadores de trozos aceptados y ya escritos, para saber qué ha llegado al archivo.
+        self.submitted_count = 0
+        self.written_count = 0
+
+        # Métricas de contrapresión
+        self.peak_pending_bytes = 0
+        self.dropped_chunks = 0
+        self.write_calls = 0
+        self.bytes_written = 0
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, offset, data):
+        """Encola un trozo para escribirlo en `offset`. Devuelve False si se descartó."""
+        with self.cond:
+            # Un trozo que sustituye a otro aún pendiente en el mismo offset libera el espacio de aquel.
+            replaced = self.pending.get(offset)
+            added_bytes = len(data) - (len(replaced) if replaced is not None else 0)
+            if self.error or self.closing or self.pending_bytes + added_bytes > self.memory_budget:
+                self.dropped_chunks += 1
+                if self.metrics: self.metrics.write_drops.inc()
+                return False
+            self.pending[offset] = data
+            self.pending_bytes += added_bytes
+            self.submitted_count += 1
+            if self.pending_bytes > self.peak_pending_bytes:
+                self.peak_pending_bytes = self.pending_bytes
+            self.cond.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closing:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                batch, self.pending = self.pending, {}
+                batch_count = self.submitted_count
+
+            batch_bytes = sum(len(data) for data in batch.values())
+            try:
+                for offset, buffers in _coalesce(batch):
+                    self._write_run(offset, buffers)
+            except OSError as e:
+                with self.cond:
+                    self.error = e
+            with self.cond:
+                self.pending_bytes -= batch_bytes
+                if not self.error: self.written_count = batch_count
+                self.cond.notify_all()
+
+    def _write_run(self, offset, buffers):
+        self.target.write_run(offset, buffers)
+        written = sum(len(b) for b in buffers)
+        self.write_calls += 1
+        self.bytes_written += written
+        if self.metrics: self.metrics.bytes_written.inc(written)
+
+    def write_token(self):
+        """Marca la posición actual: is_written(token) indica cuándo todo lo anterior está en el archivo."""
+        return self.submitted_count
+
+    def is_written(self, token):
+        return self.written_count >= token
+
+    def flush(self):
+        """Espera a que todo lo encolado esté escrito."""
+        with self.cond:
+            while self.pending_bytes and not self.error:
+                self.cond.wait()
+
+    def close(self):
+        """Escribe lo pendiente, detiene el hilo y cierra el archivo. Relanza el error de E/S si lo hubo."""
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+        self.thread.join()
+        self.target.close()
+        if self.error:
+            raise self.error
+
+    def discard(self):
+        """Cierra sin garantizar que lo pendiente llegue a disco (descarga cancelada)."""
+        with self.cond:
+            self.pending.clear()
+            self.closing = True
+            self.cond.notify_all()
+        self.thread.join()
+        self.target.close()
+
+    def stats(self):
+        return {
+            'pending_bytes': self.pending_bytes,
+            'peak_pending_bytes': self.peak_pending_bytes,
+            'dropped_chunks': self.dropped_chunks,
+            'write_calls': self.write_calls,
+            'bytes_written': self.bytes_written,
+        }
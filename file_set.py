@@ -0,0 +1,171 @@
+# file_set.py
+"""
+Envío de varios archivos o carpetas en una sola sesión.
+
+Los archivos se transmiten como un único espacio de bytes lógico: sus contenidos van uno
+tras otro, sin relleno, en el orden del manifiesto. Así los archivos pequeños comparten
+trozos y bloques en lugar de ocupar cada uno su propio datagrama, y no se crea ningún
+archivo empaquetado intermedio. El manifiesto (rutas relativas con '/', tamaños y fechas,
+más las carpetas vacías) acompaña a los metadatos; con él el receptor escribe cada tramo
+directamente en su archivo.
+"""
+import bisect
+import os
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Descriptores abiertos a la vez al leer el conjunto (se lee casi siempre en orden).
+MAX_OPEN_FILES = 64
+
+def _pread(fd, length, offset):
+    if hasattr(os, 'pread'):
+        return os.pread(fd, length, offset)
+    os.lseek(fd, offset, os.SEEK_SET)  # Windows no tiene pread.
+    return os.read(fd, length)
+
+def _manifest_path(relative_path):
+    return relative_path.replace(os.sep, '/')
+
+def file_set_label(paths):
+    """Nombre con el que se identifica el conjunto (archivo temporal, estado de reanudación)."""
+    first = os.path.basename(os.path.normpath(paths[0]))
+    return first if len(paths) == 1 else f"{first}+{len(paths) - 1}"
+
+def scan_paths(paths):
+    """
+    Recorre los archivos y carpetas indicados. Devuelve (manifiesto, rutas de origen), con las
+    rutas de origen en el mismo orden que manifiesto['files'] = [[ruta, tamaño, mtime], ...].
+    Lanza FileNotFoundError si algún elemento no existe y ValueError si dos comparten nombre.
+    """
+    files, dirs, sources = [], [], []
+    top_names = set()
+    for path in paths:
+        path = os.path.abspath(path)
+        top_name = os.path.basename(os.path.normpath(path))
+        if top_name in top_names:
+            raise ValueError(f"Hay dos elementos con el mismo nombre: {top_name}")
+        top_names.add(top_name)
+
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            files.append([top_name, stat.st_size, int(stat.st_mtime)])
+            sources.append(path)
+        elif os.path.isdir(path):
+            parent = os.path.dirname(os.path.normpath(path))
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                relative_dir = os.path.relpath(dirpath, parent)
+                regular = [name for name in sorted(filenames) if os.path.isfile(os.path.join(dirpath, name))]
+                if not regular and not dirnames:
+                    dirs.append(_manifest_path(relative_dir))
+                for name in regular:
+                    full_path = os.path.join(dirpath, name)
+                    stat = os.stat(full_path)
+                    files.append([_manifest_path(os.path.join(relative_dir, name)), stat.st_size, int(stat.st_mtime)])
+                    sources.append(full_path)
+        else:
+            raise FileNotFoundError(f"No existe: {path}")
+    return {'files': files, 'dirs': dirs}, sources
+
+def safe_relative_path(manifest_path):
+    """Convierte una ruta del manifiesto a ruta local, rechazando absolutas o con '..'."""
+    if not isinstance(manifest_path, str) or not manifest_path or '\\' in manifest_path or '\0' in manifest_path:
+        raise ValueError(f"Ruta no válida en el manifiesto: {manifest_path!r}")
+    parts = manifest_path.split('/')
+    if manifest_path.startswith('/') or any(part in ('', '.', '..') for part in parts) or ':' in parts[0]:
+        raise ValueError(f"Ruta no válida en el manifiesto: {manifest_path!r}")
+    return os.path.join(*parts)
+
+def validate_manifest(manifest, total_size):
+    """
+    Comprueba el manifiesto recibido. Devuelve (archivos, carpetas) con rutas locales seguras:
+    archivos = [(ruta, tamaño, mtime)]. Lanza ValueError si no es coherente con `total_size`.
+    """
+    try:
+        files = [(safe_relative_path(path), int(size), int(mtime)) for path, size, mtime in manifest['files']]
+        dirs = [safe_relative_path(path) for path in manifest.get('dirs', [])]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Manifiesto mal formado: {e}")
+    if any(size < 0 for _, size, _ in files) or sum(size for _, size, _ in files) != total_size:
+        raise ValueError("Los tamaños del manifiesto no suman el tamaño anunciado.")
+    if len({path for path, _, _ in files}) != len(files):
+        raise ValueError("El manifiesto repite rutas.")
+    return files, dirs
+
+class FileSetSource:
+    """
+    Vista de solo lectura del espacio lógico de un conjunto de archivos, para el emisor.
+    Admite len() y rebanadas como el mapeo de un único archivo; cada rebanada se lee con
+    pread de los archivos que abarca (un trozo puede contener varios archivos pequeños).
+    """
+    def __init__(self, sources, sizes):
+        self.sources = sources
+        self.sizes = sizes
+        self.starts = []
+        offset = 0
+        for size in sizes:
+            self.starts.append(offset)
+            offset += size
+        self.total_size = offset
+        self.fds = OrderedDict()
+
+    def __len__(self):
+        return self.total_size
+
+    def __getitem__(self, key):
+        start, stop, _ = key.indices(self.total_size)
+        parts = []
+        position = start
+        while position < stop:
+            idx = bisect.bisect_right(self.starts, position) - 1
+            file_offset = position - self.starts[idx]
+            length = min(stop - position, self.sizes[idx] - file_offset)
+            if length <= 0: break
+            data = _pread(self._fd(idx), length, file_offset)
+            # Si el archivo encogió tras el recorrido se rellena: el CRC delatará el cambio.
+            parts.append(data if len(data) == length else data.ljust(length, b'\0'))
+            position += length
+        return parts[0] if len(parts) == 1 else b''.join(parts)
+
+    def _fd(self, idx):
+        fd = self.fds.get(idx)
+        if fd is not None:
+            self.fds.move_to_end(idx)
+            return fd
+        if len(self.fds) >= MAX_OPEN_FILES:
+            os.close(self.fds.popitem(last=False)[1])
+        fd = self.fds[idx] = os.open(self.sources[idx], os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        return fd
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds.clear()
+
+@contextmanager
+def open_file_set_source(sources, sizes):
+    source = FileSetSource(sources, sizes)
+    try:
+        yield source
+    finally:
+        source.close()
+
+def file_set_crc32(paths):
+    """CRC32 de la concatenación de los archivos, en orden."""
+    crc_value = 0
+    for path in paths:
+        with open(path, 'rb') as f:
+            while chunk := f.read(65536):
+                crc_value = zlib.crc32(chunk, crc_value)
+    return crc_value
+
+def place_file_set(staging_dir, destination_folder, files, dirs):
+    """Mueve los archivos ya verificados de la carpeta temporal a su sitio (renombrando, sin copiar)."""
+    for directory in dirs:
+        os.makedirs(os.path.join(destination_folder, directory), exist_ok=True)
+    for path, _, mtime in files:
+        final_path = os.path.join(destination_folder, path)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(os.path.join(staging_dir, path), final_path)
+        os.utime(final_path, (mtime, mtime))
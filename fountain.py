@@ -0,0 +1,142 @@
+# fountain.py
+"""
+Códigos fuente (LT) por bloque para el modo carrusel.
+
+En el modo carrusel el emisor recorre el archivo una y otra vez sin esperar NACKs. Cada
+bloque de K trozos se envía como símbolos: los K primeros identificadores son los propios
+trozos (código sistemático: un receptor sin pérdidas no tiene que decodificar nada) y a
+partir de K cada símbolo es el XOR de un subconjunto de trozos. El grado y los vecinos de
+un símbolo salen de un generador pseudoaleatorio determinista sembrado con (bloque, id), así
+que el receptor los calcula por su cuenta y los paquetes solo llevan el identificador.
+Con algo más de K símbolos distintos de un bloque, en cualquier orden y de cualquier
+pasada, el decodificador por pelado (peeling) recupera el bloque completo.
+
+El grado sigue la distribución robusta de solitones de Luby. La tabla se construye con
+enteros de 32 bits para que emisor y receptor elijan exactamente el mismo grado.
+"""
+import bisect
+import math
+from functools import lru_cache
+
+# Parámetros de la distribución robusta de solitones.
+SOLITON_C = 0.1
+SOLITON_DELTA = 0.5
+
+_MASK64 = (1 << 64) - 1
+
+class _SplitMix64:
+    """Generador determinista e independiente de la versión de Python (random puede cambiar)."""
+    def __init__(self, seed):
+        self.state = seed & _MASK64
+
+    def next(self):
+        self.state = (self.state + 0x9E3779B97F4A7C15) & _MASK64
+        z = self.state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+        return z ^ (z >> 31)
+
+@lru_cache(maxsize=8)
+def _degree_table(k):
+    """Distribución acumulada del grado para bloques de k trozos, en enteros de 32 bits."""
+    r = SOLITON_C * math.log(k / SOLITON_DELTA) * math.sqrt(k)
+    spike = max(1, min(k, int(round(k / r)))) if r > 0 else k
+    weights = []
+    for d in range(1, k + 1):
+        rho = 1.0 / k if d == 1 else 1.0 / (d * (d - 1))
+        if d < spike:
+            tau = r / (d * k)
+        elif d == spike:
+            tau = r * math.log(r / SOLITON_DELTA) / k if r > SOLITON_DELTA else 0.0
+        else:
+            tau = 0.0
+        weights.append(rho + max(tau, 0.0))
+    total = sum(weights)
+    cumulative, acc = [], 0.0
+    for weight in weights:
+        acc += weight
+        cumulative.append(min(int(acc / total * 0xFFFFFFFF), 0xFFFFFFFF))
+    cumulative[-1] = 0xFFFFFFFF
+    return cumulative
+
+def symbol_neighbors(block_idx, symbol_id, k):
+    """Índices (relativos al bloque) de los trozos que combina un símbolo."""
+    if symbol_id < k:
+        return [symbol_id]
+    rng = _SplitMix64((block_idx << 32) | symbol_id)
+    degree = bisect.bisect_left(_degree_table(k), rng.next() >> 32) + 1
+    neighbors = set()
+    while len(neighbors) < degree:
+        neighbors.add(rng.next() % k)
+    return sorted(neighbors)
+
+class FountainEncoder:
+    """Genera los símbolos de un bloque a partir de sus trozos."""
+    def __init__(self, block_idx, chunks, chunk_size):
+        self.block_idx = block_idx
+        self.k = len(chunks)
+        self.chunk_size = chunk_size
+        self.values = [int.from_bytes(chunk, 'little') for chunk in chunks]
+
+    def symbol(self, symbol_id):
+        value = 0
+        for idx in symbol_neighbors(self.block_idx, symbol_id, self.k):
+            value ^= self.values[idx]
+        return value.to_bytes(self.chunk_size, 'little')
+
+class FountainDecoder:
+    """Decodificador por pelado de un bloque: acumula símbolos hasta conocer sus k trozos."""
+    def __init__(self, block_idx, k, chunk_size):
+        self.block_idx = block_idx
+        self.k = k
+        self.chunk_size = chunk_size
+        self.known = {}
+        # Ecuaciones pendientes [vecinos desconocidos, valor] y, por trozo, las que lo contienen.
+        self.waiting = {}
+        self.equations = 0
+
+    def is_complete(self):
+        return len(self.known) == self.k
+
+    def memory_bytes(self):
+        """Cota de la memoria retenida: trozos conocidos más ecuaciones guardadas."""
+        return (len(self.known) + self.equations) * self.chunk_size
+
+    def add_symbol(self, symbol_id, payload):
+        """Incorpora un símbolo. Devuelve True si aportó algo nuevo."""
+        if self.is_complete(): return False
+        value = int.from_bytes(payload, 'little')
+        unknown = set()
+        for idx in symbol_neighbors(self.block_idx, symbol_id, self.k):
+            if idx in self.known:
+                value ^= self.known[idx]
+            else:
+                unknown.add(idx)
+        if not unknown: return False
+        if len(unknown) == 1:
+            self._learn(unknown.pop(), value)
+            return True
+        equation = [unknown, value]
+        self.equations += 1
+        for idx in unknown:
+            self.waiting.setdefault(idx, []).append(equation)
+        return True
+
+    def _learn(self, idx, value):
+        pending = [(idx, value)]
+        while pending:
+            idx, value = pending.pop()
+            if idx in self.known: continue
+            self.known[idx] = value
+            for equation in self.waiting.pop(idx, []):
+                unknown = equation[0]
+                if idx not in unknown: continue
+                unknown.discard(idx)
+                equation[1] ^= value
+                if len(unknown) == 1:
+                    other = unknown.pop()
+                    pending.append((other, equation[1]))
+
+    def chunks(self):
+        """[(índice, bytes)] con los k trozos, de tamaño chunk_size (el llamante recorta el último)."""
+        return [(idx, self.known[idx].to_bytes(self.chunk_size, 'little')) for idx in range(self.k)]
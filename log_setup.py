@@ -0,0 +1,99 @@
+# log_setup.py
+"""
+Salida de diagnóstico de emisor y receptor a través del módulo logging.
+
+Los hilos de red solo crean el registro y lo dejan en una cola, sin formatearlo: el texto se
+compone y se escribe en la consola desde el hilo de un QueueListener, así una consola lenta
+no frena el envío ni la recepción. Por eso los argumentos de un mensaje deben ser valores
+que no cambien después (números, textos, copias).
+
+Los mensajes de cada bloque, NACK y ronda de reparación van en el nivel DEBUG y solo se
+muestran con --verbose; con el nivel desactivado la llamada no llega a crear el registro.
+Además, un filtro limita cuántas veces por segundo sale un mismo mensaje y, cuando lo vuelve
+a dejar pasar, indica cuántos se omitieron. El filtro agrupa por plantilla: los mensajes deben
+usar el estilo de logging ("%s", valores aparte) y no textos ya formateados, que serían todos
+distintos.
+"""
+import atexit
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Como mucho RATE_LIMIT_BURST registros de un mismo mensaje cada RATE_LIMIT_INTERVAL segundos.
+RATE_LIMIT_INTERVAL = 1.0
+RATE_LIMIT_BURST = 10
+# Plantillas distintas que se recuerdan como mucho: al superarlo se olvidan las ventanas vencidas.
+RATE_LIMIT_MAX_KEYS = 1024
+
+class RateLimitFilter(logging.Filter):
+    """Limita cada mensaje (misma plantilla del mismo logger) a `burst` registros cada `interval` segundos."""
+    def __init__(self, interval=RATE_LIMIT_INTERVAL, burst=RATE_LIMIT_BURST, max_keys=RATE_LIMIT_MAX_KEYS):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.max_keys = max_keys
+        # (logger, plantilla) -> [inicio de la ventana, registros que pasaron, registros omitidos]
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is not None and now - window[0] < self.interval:
+                if window[1] >= self.burst:
+                    window[2] += 1
+                    return False
+                window[1] += 1
+                return True
+            if window is None and len(self.windows) >= self.max_keys:
+                self._evict(now)
+            self.windows[key] = [now, 1, 0]
+        if window is not None and window[2]:
+            record.msg = f"{record.msg} (+{window[2]} mensajes iguales omitidos)"
+        return True
+
+    def _evict(self, now):
+        """Olvida las ventanas vencidas (y todas, si ninguna lo está). Se llama con self.lock."""
+        self.windows = {key: window for key, window in self.windows.items() if now - window[0] < self.interval}
+        if len(self.windows) >= self.max_keys:
+            self.windows.clear()
+
+class _DeferredQueueHandler(QueueHandler):
+    """Encola el registro tal cual: QueueHandler lo formatearía en el hilo que lo emite."""
+    def prepare(self, record):
+        return record
+
+_listener = None
+
+def setup_logging(level=logging.INFO):
+    """
+    Dirige los registros de todos los módulos a la consola a través de la cola. INFO muestra
+    el resumen de cada transferencia, DEBUG (--verbose) además cada bloque y cada NACK y
+    WARNING (--quiet) solo los avisos y errores.
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None: return
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter('%(asctime)s.%(msecs)03d %(message)s' if level <= logging.DEBUG else '%(message)s',
+                                           datefmt='%H:%M:%S'))
+    log_queue = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(log_queue)
+    handler.addFilter(RateLimitFilter())
+    root.addHandler(handler)
+    _listener = QueueListener(log_queue, console)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging():
+    """Escribe lo que quede en la cola y detiene el hilo de escritura."""
+    global _listener
+    if _listener is None: return
+    _listener.stop()
+    _listener = None
@@ -0,0 +1,234 @@
+# metrics.py
+"""
+Métricas de emisor y receptor: contadores, indicadores e histogramas en un registro común.
+
+Para no frenar el bucle de paquetes se actualizan por lote (sendmmsg/recvmmsg, escrituras
+agrupadas) o por bloque, y sin cerrojos: un incremento es una suma sobre un atributo, y solo
+cuando se envía paquete a paquete acompaña a cada llamada al sistema. Si dos hilos suman a
+la vez en la misma métrica (los escritores de dos descargas) puede perderse algún incremento
+suelto, algo aceptable para una métrica de observación. Lo que ya cuentan otras piezas
+(anillo de recepción, descartes del socket en el kernel) se expone con funciones que solo
+se evalúan al consultar las métricas.
+
+Se consultan con un endpoint HTTP local opcional (`metrics_port`): /metrics en el formato de
+texto de Prometheus y /metrics.json en JSON. La CLI puede además volcarlas a un archivo JSON
+al terminar (`--metrics-json`).
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Límites de los histogramas de duración (segundos) y de recuentos por bloque.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+class Counter:
+    """Valor que solo crece. Con `fn` se lee de otra pieza en el momento de la consulta."""
+    kind = 'counter'
+
+    def __init__(self, name, help_text, fn=None):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def get(self):
+        if self.fn is None: return self.value
+        try:
+            return self.fn() or 0
+        except Exception:
+            return 0  # La pieza que la calcula ya no existe (p. ej. socket cerrado).
+
+class Gauge(Counter):
+    """Valor que sube y baja (tasa actual, ocupación)."""
+    kind = 'gauge'
+
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    """Distribución de observaciones en intervalos acumulados, como los histogramas de Prometheus."""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # El último intervalo es +Inf.
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def get(self):
+        cumulative, total = {}, 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            cumulative[str(bound)] = total
+        return {'buckets': cumulative, 'sum': self.sum, 'count': self.count}
+
+class MetricsRegistry:
+    """Conjunto de métricas por nombre. Pedir dos veces la misma métrica devuelve el mismo objeto."""
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args)
+            return metric
+
+    def counter(self, name, help_text, fn=None):
+        metric = self._get_or_create(Counter, name, help_text)
+        if fn is not None: metric.fn = fn  # La última instancia que la registra es la que se lee.
+        return metric
+
+    def gauge(self, name, help_text, fn=None):
+        metric = self._get_or_create(Gauge, name, help_text)
+        if fn is not None: metric.fn = fn
+        return metric
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets)
+
+    def snapshot(self):
+        """{nombre: valor} con todas las métricas (un histograma es un diccionario)."""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.get() for metric in metrics}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def render_prometheus(self):
+        """Todas las métricas en el formato de texto de Prometheus (versión 0.0.4)."""
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            value = metric.get()
+            if metric.kind == 'histogram':
+                for bound, count in value['buckets'].items():
+                    lines.append(f'{metric.name}_bucket{{le="{bound}"}} {count}')
+                lines.append(f"{metric.name}_sum {value['sum']}")
+                lines.append(f"{metric.name}_count {value['count']}")
+            else:
+                lines.append(f"{metric.name} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def dump_json(self, path):
+        """Escribe las métricas en `path` ('-' = salida estándar)."""
+        if path == '-':
+            print(self.to_json())
+            return
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json())
+
+# Registro del proceso, compartido por Sender y Receiver.
+REGISTRY = MetricsRegistry()
+
+class SenderMetrics:
+    """Métricas del emisor. Varias sesiones en el mismo proceso suman en las mismas."""
+    def __init__(self, registry=REGISTRY):
+        self.packets_sent = registry.counter('pycast_sender_packets_sent_total', 'Paquetes de datos, paridad y símbolos enviados.')
+        self.bytes_sent = registry.counter('pycast_sender_bytes_sent_total', 'Bytes enviados en esos paquetes, cabeceras incluidas.')
+        self.packets_retransmitted = registry.counter('pycast_sender_packets_retransmitted_total', 'Paquetes de datos reenviados por NACK.')
+        self.nacks_received = registry.counter('pycast_sender_nacks_received_total', 'NACKs recibidos de los receptores.')
+        self.acks_received = registry.counter('pycast_sender_acks_received_total', 'ACKs de bloque recibidos de los receptores.')
+        self.blocks_confirmed = registry.counter('pycast_sender_blocks_confirmed_total', 'Bloques cuya ronda de reparación se cerró.')
+        self.blocks_skipped = registry.counter('pycast_sender_blocks_skipped_total', 'Bloques no enviados porque los receptores ya los tenían.')
+        self.send_rate = registry.gauge('pycast_sender_rate_bps', 'Tasa de envío reciente en la red (bits por segundo).')
+        self.block_nacks = registry.histogram('pycast_sender_block_nacks', 'NACKs recibidos por bloque.', COUNT_BUCKETS)
+        self.block_repair_rounds = registry.histogram('pycast_sender_block_repair_rounds', 'Rondas de FIN_DE_BLOQUE usadas por bloque.', COUNT_BUCKETS)
+        self.block_latency = registry.histogram('pycast_sender_block_latency_seconds', 'Tiempo desde el primer envío de un bloque hasta su cierre.')
+
+class ReceiverMetrics:
+    """Métricas del receptor, sumadas sobre todas sus descargas."""
+    def __init__(self, registry=REGISTRY):
+        self.packets_received = registry.counter('pycast_receiver_packets_received_total', 'Datagramas leídos de los sockets de los grupos unidos.')
+        self.bytes_received = registry.counter('pycast_receiver_bytes_received_total', 'Bytes de esos datagramas.')
+        self.nacks_sent = registry.counter('pycast_receiver_nacks_sent_total', 'NACKs enviados.')
+        self.nacks_suppressed = registry.counter('pycast_receiver_nacks_suppressed_total', 'NACKs no enviados porque otro receptor ya había pedido lo mismo.')
+        self.acks_sent = registry.counter('pycast_receiver_acks_sent_total', 'ACKs de bloque enviados.')
+        self.fec_recovered = registry.counter('pycast_receiver_fec_recovered_total', 'Paquetes reconstruidos con FEC.')
+        self.blocks_completed = registry.counter('pycast_receiver_blocks_completed_total', 'Bloques completos y verificados.')
+        self.block_crc_failures = registry.counter('pycast_receiver_block_crc_failures_total', 'Bloques descartados por no coincidir su CRC.')
+        self.bytes_written = registry.counter('pycast_receiver_bytes_written_total', 'Bytes escritos en disco por el escritor diferido.')
+        self.write_drops = registry.counter('pycast_receiver_write_drops_total', 'Paquetes descartados por tener lleno el búfer de escritura.')
+        self.block_latency = registry.histogram('pycast_receiver_block_latency_seconds', 'Tiempo desde el primer paquete de un bloque hasta completarlo.')
+
+def udp_socket_drops(sock):
+    """
+    Datagramas que el kernel descartó en este socket por tener el búfer lleno (solo Linux,
+    columna `drops` de /proc/net/udp). Devuelve 0 si no se puede saber.
+    """
+    try:
+        inode = str(os.fstat(sock.fileno()).st_ino)
+        with open('/proc/net/udp') as f:
+            next(f)
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 13 and fields[9] == inode:
+                    return int(fields[12])
+    except (OSError, ValueError, StopIteration):
+        pass
+    return 0
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        registry = self.server.registry
+        if self.path.startswith('/metrics.json'):
+            body, content_type = registry.to_json().encode('utf-8'), 'application/json'
+        elif self.path.startswith('/metrics'):
+            body, content_type = registry.render_prometheus().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Sin una línea por cada consulta.
+
+class MetricsServer:
+    """Endpoint HTTP de métricas, solo en la interfaz local (127.0.0.1)."""
+    def __init__(self, port, registry=REGISTRY):
+        self.port = port
+        self.registry = registry
+        self.httpd = None
+
+    def start(self):
+        try:
+            self.httpd = ThreadingHTTPServer(('127.0.0.1', self.port), _MetricsHandler)
+        except OSError as e:
+            logger.warning("No se pudo abrir el endpoint de métricas en el puerto %s: %s", self.port, e)
+            return False
+        self.httpd.daemon_threads = True
+        self.httpd.registry = self.registry
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        logger.info("Métricas en http://127.0.0.1:%s/metrics (Prometheus) y /metrics.json", self.port)
+        return True
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
@@ -0,0 +1,108 @@
+# pacing.py
+import time
+
+class TokenBucketPacer:
+    """
+    Regula el ritmo de envío con un cubo de tokens sobre un reloj de alta resolución.
+    Permite ráfagas de hasta `burst_bytes` y mantiene la tasa media en `rate_bps`.
+    Una tasa de 0 desactiva la regulación (solo se contabilizan los bytes).
+    """
+    # Por debajo de este margen se espera activamente en lugar de dormir,
+    # porque la granularidad de time.sleep() en muchos SO ronda el milisegundo.
+    SPIN_THRESHOLD = 0.0005
+
+    def __init__(self, rate_bps, burst_bytes):
+        self.clock = time.perf_counter
+        self.burst_bytes = max(1, int(burst_bytes))
+        self.set_rate(rate_bps)
+
+        now = self.clock()
+        self.tokens = self.burst_bytes
+        self.last_refill = now
+        self.start_time = now
+        self.bytes_sent = 0
+
+        self._window_start = now
+        self._window_bytes = 0
+
+    def set_rate(self, rate_bps):
+        """Cambia la tasa objetivo (bits/s). Se aplica al siguiente paquete."""
+        self.rate_bps = max(0, rate_bps or 0)
+        self.bytes_per_second = self.rate_bps / 8
+
+    def consume(self, nbytes):
+        """Descuenta `nbytes` del cubo, esperando lo necesario para no superar la tasa."""
+        self.bytes_sent += nbytes
+        self._window_bytes += nbytes
+        if not self.bytes_per_second:
+            return
+
+        now = self.clock()
+        self.tokens = min(self.burst_bytes, self.tokens + (now - self.last_refill) * self.bytes_per_second)
+        self.last_refill = now
+        self.tokens -= nbytes
+        if self.tokens >= 0:
+            return
+
+        # El déficit se recupera en la siguiente recarga, así que basta con esperar a que se cubra.
+        deadline = now + (-self.tokens / self.bytes_per_second)
+        remaining = deadline - now
+        if remaining > self.SPIN_THRESHOLD:
+            time.sleep(remaining - self.SPIN_THRESHOLD)
+        while self.clock() < deadline:
+            pass
+
+    def measure_rate(self):
+        """Tasa real (bits/s) desde la última medición."""
+        now = self.clock()
+        elapsed = now - self._window_start
+        rate = (self._window_bytes * 8) / elapsed if elapsed > 0 else 0.0
+        self._window_start = now
+        self._window_bytes = 0
+        return rate
+
+    def average_rate(self):
+        """Tasa real media (bits/s) desde la creación del regulador."""
+        elapsed = self.clock() - self.start_time
+        return (self.bytes_sent * 8) / elapsed if elapsed > 0 else 0.0
+
+class AimdRateController:
+    """
+    Control de congestión AIMD sobre la tasa de un TokenBucketPacer. La señal es la pérdida
+    de cada bloque (paquetes pedidos por algún receptor en la primera ronda / paquetes del bloque).
+    Se arranca en `start_rate_bps` (medida o configurada, no una fracción del máximo, que sin
+    tasa objetivo es un techo arbitrario). Sin pérdidas relevantes la tasa sube por bloque un
+    paso fijo, proporcional a la tasa inicial (así escala igual en Wi-Fi que en 10 Gbps); con
+    pérdidas baja de forma multiplicativa hasta un mínimo absoluto. La subida aditiva y la bajada
+    multiplicativa hacen que varios emisores en la misma red converjan a un reparto equitativo.
+    Tras una bajada se ignoran los bloques que ya se habían enviado a la tasa anterior, para no
+    reducirla varias veces por la misma congestión.
+    """
+    LOSS_THRESHOLD = 0.02   # Pérdida tolerada sin reducir la tasa
+    DECREASE_FACTOR = 0.75
+    INCREASE_FRACTION = 0.1   # Subida por bloque sin pérdidas, como fracción de la tasa inicial
+    MIN_RATE_BPS = 1_000_000  # Tasa mínima (1 Mbps), sea cual sea el máximo
+
+    def __init__(self, pacer, max_rate_bps, start_rate_bps):
+        self.pacer = pacer
+        self.max_rate_bps = max_rate_bps
+        self.min_rate_bps = min(self.MIN_RATE_BPS, max_rate_bps)
+        self.rate_bps = min(max(start_rate_bps, self.min_rate_bps), max_rate_bps)
+        self.increase_bps = self.rate_bps * self.INCREASE_FRACTION
+        self.recovery_until_block = -1
+        pacer.set_rate(self.rate_bps)
+
+    def on_block_feedback(self, block_idx, loss_ratio, last_sent_block):
+        """Ajusta la tasa con la pérdida de un bloque. Devuelve True si la tasa ha cambiado."""
+        previous = self.rate_bps
+        if loss_ratio > self.LOSS_THRESHOLD:
+            if block_idx <= self.recovery_until_block:
+                return False
+            self.rate_bps = max(self.min_rate_bps, self.rate_bps * self.DECREASE_FACTOR)
+            self.recovery_until_block = last_sent_block
+        else:
+            self.rate_bps = min(self.max_rate_bps, self.rate_bps + self.increase_bps)
+        if self.rate_bps == previous:
+            return False
+        self.pacer.set_rate(self.rate_bps)
+        return True
@@ -0,0 +1,75 @@
+# packet_ring.py
+import queue
+
+# Cada hueco admite el mayor datagrama UDP posible, sea cual sea el tamaño de trozo del emisor.
+SLOT_SIZE = 65536
+
+class PacketRing:
+    """
+    Anillo de búferes preasignados entre el hilo que lee del socket y el que procesa.
+    El lector toma huecos libres, recibe en ellos y los publica como (hueco, longitud);
+    el procesador los consume en orden y los devuelve a la lista de libres. Así el socket
+    se vacía a ritmo constante aunque el procesado (disco, NACKs) tenga picos de latencia.
+    """
+    def __init__(self, slot_count, slot_size=SLOT_SIZE):
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.buffer = bytearray(slot_count * slot_size)
+        self.view = memoryview(self.buffer)
+        self.free = queue.SimpleQueue()
+        self.ready = queue.SimpleQueue()
+        for slot in range(slot_count):
+            self.free.put(slot)
+
+        # Métricas de ocupación (las actualiza el hilo lector)
+        self.peak_occupancy = 0
+        self.full_waits = 0
+
+    def acquire(self, max_slots, timeout):
+        """Toma hasta `max_slots` huecos libres; espera como mucho `timeout` si no hay ninguno."""
+        try:
+            slots = [self.free.get_nowait()]
+        except queue.Empty:
+            self.full_waits += 1  # El procesador va por detrás: el anillo está lleno.
+            try:
+                slots = [self.free.get(timeout=timeout)]
+            except queue.Empty:
+                return []
+        while len(slots) < max_slots:
+            try:
+                slots.append(self.free.get_nowait())
+            except queue.Empty:
+                break
+        return slots
+
+    def publish(self, slot, length):
+        self.ready.put((slot, length))
+
+    def publish_done(self):
+        occupancy = self.ready.qsize()
+        if occupancy > self.peak_occupancy:
+            self.peak_occupancy = occupancy
+
+    def next_packet(self, timeout):
+        """Devuelve (hueco, memoryview del datagrama) o None si no llega nada en `timeout`."""
+        try:
+            slot, length = self.ready.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        start = slot * self.slot_size
+        return slot, self.view[start:start + length]
+
+    def release(self, slot):
+        self.free.put(slot)
+
+    def slot_view(self, slot):
+        start = slot * self.slot_size
+        return self.view[start:start + self.slot_size]
+
+    def stats(self):
+        return {
+            'slots': self.slot_count,
+            'occupancy': self.ready.qsize(),
+            'peak_occupancy': self.peak_occupancy,
+            'full_waits': self.full_waits,
+        }
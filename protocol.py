@@ -0,0 +1,260 @@
+# protocol.py
+"""
+Formato binario de los paquetes de PyCast.
+
+Todos los datagramas comienzan con la misma cabecera fija:
+
+    magic (2) | versión (1) | tipo (1) | flags (1) | session_id (16) | seq (4)
+
+`seq` es el número de secuencia en los paquetes de datos y el índice de bloque en los
+de control. El receptor despacha comparando un solo byte (el tipo) en vez de intentar
+decodificar cada datagrama como JSON. La versión se negocia en el paquete de metadatos.
+
+NACK: tras la cabecera va la lista de paquetes perdidos, codificada como rangos
+(desplazamiento, longitud) o como mapa de bits relativos a `base_seq`, lo que ocupe menos.
+Un NACK muy grande se divide en varios datagramas, cada uno autocontenido.
+Los receptores los envían al grupo de la sesión (puerto de NACK) tras una espera aleatoria:
+quien oye que otro receptor ya pidió los mismos paquetes no los pide (supresión al estilo SRM).
+Con FLAG_NACK_RECEIVER el NACK termina con el identificador del receptor (8 bytes).
+
+ACK: confirmación de un bloque completo (`seq` = índice de bloque) que cada miembro del lobby
+envía al emisor por unicast; la carga útil es su identificador. Con FLAG_ACK_COVERED significa
+que al receptor aún le faltan paquetes, pero otro receptor ya los pidió (NACK suprimido). Cuando
+todos los miembros han respondido, el emisor no espera a que acabe el tiempo de escucha.
+
+Integridad: cada FIN_DE_BLOQUE lleva el CRC32 de su bloque y el EOF (o los metadatos) el del
+archivo, que es la combinación de los de los bloques. Es un árbol de dos niveles: el receptor
+comprueba cada bloque al completarlo y pide de nuevo solo los que no coinciden.
+
+MANIFIESTO: al enviar varios archivos, la lista de archivos (JSON comprimido con zlib) se
+divide en partes que siguen a cada paquete de metadatos; `seq` es el índice de la parte.
+Los metadatos anuncian el número de partes y el CRC32 del manifiesto comprimido.
+
+COMPRESIÓN: en un paquete de datos, los bits FLAG_CODEC_MASK de `flags` indican el códec con
+el que va comprimida la carga útil (0 = sin comprimir); ver compression.py. En un FIN_DE_BLOQUE,
+FLAG_LOCAL_BLOCK indica que el bloque no se envió porque los receptores ya lo tienen.
+
+SÍMBOLO (modo carrusel): `seq` es el índice de bloque y la carga útil empieza con el
+identificador del símbolo (4 bytes) seguido de sus datos; ver fountain.py.
+"""
+import json
+import struct
+import zlib
+
+PACKET_MAGIC = b'PC'
+PROTOCOL_VERSION = 2
+SUPPORTED_PROTOCOL_VERSIONS = (2,)
+
+# Tipos de paquete
+PKT_DATA = 1
+PKT_PARITY = 2
+PKT_METADATA = 3
+PKT_BLOCK_END = 4
+PKT_EOF = 5
+PKT_CANCEL = 6
+PKT_NACK = 7
+PKT_MANIFEST = 8
+PKT_SYMBOL = 9
+PKT_ACK = 10
+
+HEADER = struct.Struct('!2sBBB16sI')
+HEADER_SIZE = HEADER.size
+# Mayor carga útil que cabe en un datagrama UDP sobre IPv4 junto con la cabecera.
+MAX_CHUNK_SIZE = 65507 - HEADER_SIZE
+
+# Posiciones de la cabecera, para despachar sin desempaquetarla entera.
+TYPE_OFFSET = 3
+FLAGS_OFFSET = 4
+SESSION_ID_SLICE = slice(5, 21)
+SEQ_SLICE = slice(21, 25)
+
+# Bits de `flags` de un paquete de datos con el códec de su carga útil (0 = sin comprimir).
+FLAG_CODEC_MASK = 0x03
+# Bit de `flags` de un FIN_DE_BLOQUE cuyo bloque no se envía: cada receptor lo toma de su copia local.
+FLAG_LOCAL_BLOCK = 0x01
+# Bit de `flags` de un NACK que termina con el identificador del receptor que lo envía.
+FLAG_NACK_RECEIVER = 0x01
+# Bit de `flags` de un ACK de un receptor al que le faltan paquetes que ya pidió otro.
+FLAG_ACK_COVERED = 0x01
+
+# Identificador aleatorio de cada receptor, enviado en el handshake (en hexadecimal) y en sus ACK.
+RECEIVER_ID_SIZE = 8
+
+NACK_ENCODING_RANGES = 0
+NACK_ENCODING_BITMAP = 1
+
+# codificación, base_seq, número de elementos
+_NACK_BODY_HEADER = struct.Struct('!BIH')
+_NACK_RANGE = struct.Struct('!HH')
+
+# Carga útil máxima por datagrama: cabe en una MTU Ethernet sin fragmentar.
+MAX_NACK_PAYLOAD = 1200
+# Un datagrama cubre como mucho esta ventana de secuencias (lo que cabe en el mapa de bits).
+_MAX_NACK_SPAN = min(MAX_NACK_PAYLOAD * 8, 0xFFFF)
+
+def pack_header(ptype, session_id_bytes, seq=0, flags=0):
+    return HEADER.pack(PACKET_MAGIC, PROTOCOL_VERSION, ptype, flags, session_id_bytes, seq)
+
+def unpack_header(data):
+    """Devuelve (versión, tipo, flags, session_id_bytes, seq) o None si no es un paquete PyCast."""
+    if len(data) < HEADER_SIZE or data[:2] != PACKET_MAGIC:
+        return None
+    _, version, ptype, flags, session_id_bytes, seq = HEADER.unpack_from(data)
+    return version, ptype, flags, session_id_bytes, seq
+
+def build_metadata_packet(session_id_bytes, metadata):
+    """El paquete de metadatos lleva un JSON tras la cabecera; se envía pocas veces por sesión."""
+    return pack_header(PKT_METADATA, session_id_bytes) + json.dumps(metadata).encode('utf-8')
+
+def parse_metadata_packet(data):
+    try:
+        return json.loads(bytes(data[HEADER_SIZE:]).decode('utf-8'))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+def build_manifest_packets(session_id_bytes, manifest, part_size):
+    """Divide el manifiesto en paquetes de como mucho `part_size` bytes. Devuelve (paquetes, crc32)."""
+    payload = zlib.compress(json.dumps(manifest, separators=(',', ':')).encode('utf-8'))
+    parts = [payload[i:i + part_size] for i in range(0, len(payload), part_size)]
+    return [pack_header(PKT_MANIFEST, session_id_bytes, idx) + part for idx, part in enumerate(parts)], zlib.crc32(payload)
+
+def parse_manifest_parts(parts, expected_crc32):
+    """Reconstruye el manifiesto a partir de sus partes en orden, o None si no es válido."""
+    payload = b''.join(parts)
+    if zlib.crc32(payload) != expected_crc32:
+        return None
+    try:
+        return json.loads(zlib.decompress(payload).decode('utf-8'))
+    except (zlib.error, json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+_SYMBOL_ID = struct.Struct('!I')
+SYMBOL_ID_SIZE = _SYMBOL_ID.size
+
+def pack_symbol_header(session_id_bytes, block_index, symbol_id):
+    """Cabecera de un SÍMBOLO más su identificador; los datos del símbolo van a continuación."""
+    return pack_header(PKT_SYMBOL, session_id_bytes, block_index) + _SYMBOL_ID.pack(symbol_id)
+
+def parse_symbol_id(data):
+    """Identificador de símbolo de un paquete SÍMBOLO, o None si es demasiado corto."""
+    if len(data) < HEADER_SIZE + SYMBOL_ID_SIZE:
+        return None
+    return _SYMBOL_ID.unpack_from(data, HEADER_SIZE)[0]
+
+# CRC32 opcional tras la cabecera del FIN_DE_BLOQUE (CRC del bloque) y del EOF (CRC del archivo).
+_CRC_TRAILER = struct.Struct('!I')
+
+def _parse_crc_trailer(data):
+    if len(data) < HEADER_SIZE + _CRC_TRAILER.size:
+        return None
+    return _CRC_TRAILER.unpack_from(data, HEADER_SIZE)[0]
+
+def build_block_end_packet(session_id_bytes, block_index, block_crc32=None, flags=0):
+    """FIN_DE_BLOQUE. El CRC del bloque permite al receptor localizar bloques corruptos y pedir solo esos."""
+    header = pack_header(PKT_BLOCK_END, session_id_bytes, block_index, flags)
+    return header if block_crc32 is None else header + _CRC_TRAILER.pack(block_crc32)
+
+def parse_block_end_packet(data):
+    """Devuelve el CRC32 del bloque que lleva el FIN_DE_BLOQUE, o None si no lleva ninguno."""
+    return _parse_crc_trailer(data)
+
+def build_eof_packet(session_id_bytes, file_crc32=None, eof_round=0):
+    """
+    EOF. Si el checksum se calculó durante el envío, viaja aquí en lugar de en los metadatos.
+    `seq` lleva la ronda de reparación final: tras cada ronda el emisor repite el EOF con la siguiente.
+    """
+    header = pack_header(PKT_EOF, session_id_bytes, eof_round)
+    return header if file_crc32 is None else header + _CRC_TRAILER.pack(file_crc32)
+
+def parse_eof_packet(data):
+    """Devuelve el CRC32 que lleva el EOF, o None si no lleva ninguno."""
+    return _parse_crc_trailer(data)
+
+def _to_ranges(sorted_seqs, base_seq):
+    ranges = []
+    for seq in sorted_seqs:
+        offset = seq - base_seq
+        if ranges and ranges[-1][0] + ranges[-1][1] == offset:
+            ranges[-1][1] += 1
+        else:
+            ranges.append([offset, 1])
+    return ranges
+
+def encode_nack(session_id_bytes, block_index, missing_seqs, receiver_id=None):
+    """Codifica los paquetes perdidos de un bloque. Devuelve una lista de datagramas."""
+    datagrams = []
+    header = pack_header(PKT_NACK, session_id_bytes, block_index, FLAG_NACK_RECEIVER if receiver_id else 0)
+    trailer = receiver_id or b''
+    pending = sorted(missing_seqs)
+    while pending:
+        base_seq = pending[0]
+        window_end = base_seq + _MAX_NACK_SPAN
+        split = next((i for i, seq in enumerate(pending) if seq >= window_end), len(pending))
+        window, pending = pending[:split], pending[split:]
+
+        ranges = _to_ranges(window, base_seq)
+        span = window[-1] - base_seq + 1
+        if len(ranges) * _NACK_RANGE.size <= (span + 7) // 8:
+            body = _NACK_BODY_HEADER.pack(NACK_ENCODING_RANGES, base_seq, len(ranges))
+            body += b''.join(_NACK_RANGE.pack(offset, length) for offset, length in ranges)
+        else:
+            bitmap = bytearray((span + 7) // 8)
+            for seq in window:
+                offset = seq - base_seq
+                bitmap[offset >> 3] |= 0x80 >> (offset & 7)
+            body = _NACK_BODY_HEADER.pack(NACK_ENCODING_BITMAP, base_seq, span) + bytes(bitmap)
+        datagrams.append(header + body + trailer)
+    return datagrams
+
+def decode_nack(data):
+    """
+    Decodifica un datagrama NACK. Devuelve (session_id_bytes, block_index, [seqs])
+    o None si el datagrama no es un NACK válido.
+    """
+    header = unpack_header(data)
+    if not header or header[1] != PKT_NACK or header[0] not in SUPPORTED_PROTOCOL_VERSIONS:
+        return None
+    _, _, _, session_id_bytes, block_index = header
+    if len(data) < HEADER_SIZE + _NACK_BODY_HEADER.size:
+        return None
+    encoding, base_seq, count = _NACK_BODY_HEADER.unpack_from(data, HEADER_SIZE)
+    body = memoryview(data)[HEADER_SIZE + _NACK_BODY_HEADER.size:]
+
+    seqs = []
+    if encoding == NACK_ENCODING_RANGES:
+        if len(body) < count * _NACK_RANGE.size:
+            return None
+        for offset, length in _NACK_RANGE.iter_unpack(body[:count * _NACK_RANGE.size]):
+            start = base_seq + offset
+            seqs.extend(range(start, start + length))
+    elif encoding == NACK_ENCODING_BITMAP:
+        if len(body) < (count + 7) // 8:
+            return None
+        for byte_idx, byte in enumerate(body[:(count + 7) // 8]):
+            if not byte:
+                continue
+            for bit in range(8):
+                if byte & (0x80 >> bit):
+                    seqs.append(base_seq + byte_idx * 8 + bit)
+    else:
+        return None
+    return session_id_bytes, block_index, seqs
+
+def nack_receiver_id(data):
+    """Identificador del receptor al final de un NACK, o None si no lo lleva."""
+    if len(data) < HEADER_SIZE + RECEIVER_ID_SIZE or not data[FLAGS_OFFSET] & FLAG_NACK_RECEIVER:
+        return None
+    return bytes(data[-RECEIVER_ID_SIZE:])
+
+def build_ack_packet(session_id_bytes, block_index, receiver_id, covered=False):
+    return pack_header(PKT_ACK, session_id_bytes, block_index, FLAG_ACK_COVERED if covered else 0) + receiver_id
+
+def parse_ack_packet(data):
+    """Devuelve (session_id_bytes, block_index, receiver_id, covered) o None si no es un ACK válido."""
+    header = unpack_header(data)
+    if not header or header[1] != PKT_ACK or header[0] not in SUPPORTED_PROTOCOL_VERSIONS:
+        return None
+    if len(data) != HEADER_SIZE + RECEIVER_ID_SIZE:
+        return None
+    _, _, flags, session_id_bytes, block_index = header
+    return session_id_bytes, block_index, bytes(data[HEADER_SIZE:]), bool(flags & FLAG_ACK_COVERED)
@@ -1,6 +1,6 @@
 # pycast_app.py
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, TclError
+from tkinter import ttk, filedialog, messagebox, simpledialog, TclError
 import socket
 import json
 import threading
@@ -8,16 +8,24 @@ import os
 import argparse
 import sys
 import time
+import logging
 from tkinterdnd2 import DND_FILES, TkinterDnD
 
-from sender import Sender, HANDSHAKE_PORT
+from sender import Sender
+from session_endpoints import session_endpoints
 from receiver import Receiver
 from service_discovery import PyCastServiceBrowser
-from config_manager import load_config, save_config, get_default_config, CONFIG_METADATA, CONFIG_PRESETS
+from config_manager import load_config, save_config, get_default_config, coerce_network_setting, CONFIG_METADATA, CONFIG_PRESETS
+from file_set import file_set_label
+from metrics import REGISTRY, MetricsServer
+from log_setup import setup_logging
+from tuning import NetworkProbe, ProbeResponder, ProbeError, current_network_key, parse_network_key, save_network_profile, apply_network_profile
+
+logger = logging.getLogger(__name__)
 
 # --- INICIO: LÓGICA Y FUNCIONES AUXILIARES PARA EL MODO CLI ---
 
-def _cli_print_progress(bytes_processed, total_bytes):
+def _cli_print_progress(bytes_processed, total_bytes, rate_bps=None):
     """Muestra una barra de progreso en la terminal."""
     if total_bytes == 0: return
     percentage = (bytes_processed / total_bytes) * 100
@@ -28,18 +36,20 @@ def _cli_print_progress(bytes_processed, total_bytes):
     processed_mb = bytes_processed / (1024 * 1024)
     total_mb = total_bytes / (1024 * 1024)
     
-    sys.stdout.write(f'\rProgreso: [{bar}] {percentage:.1f}% ({processed_mb:.2f}/{total_mb:.2f} MB)')
+    rate_text = f' {rate_bps / 1_000_000:.1f} Mbps' if rate_bps else ''
+    sys.stdout.write(f'\rProgreso: [{bar}] {percentage:.1f}% ({processed_mb:.2f}/{total_mb:.2f} MB){rate_text}')
     sys.stdout.flush()
     if bytes_processed == total_bytes:
         sys.stdout.write('\n')
 
 def run_cli_sender(args, config):
     """Ejecuta la lógica del emisor en modo CLI."""
-    if not os.path.exists(args.file_path):
-        print(f"Error: El archivo '{args.file_path}' no existe.")
-        return
+    for path in args.file_path:
+        if not os.path.exists(path):
+            print(f"Error: El archivo '{path}' no existe.")
+            return
 
-    session_name = args.name if args.name else os.path.basename(args.file_path)
+    session_name = args.name if args.name else file_set_label(args.file_path)
     
     clients_connected = []
     # --- MODIFICADO: Callback de conexión de cliente mejorado ---
@@ -57,7 +67,7 @@ def run_cli_sender(args, config):
         pass
 
     sender = Sender(
-        args.file_path,
+        args.file_path if len(args.file_path) > 1 else args.file_path[0],
         session_name,
         config,
         _cli_print_progress,
@@ -67,9 +77,11 @@ def run_cli_sender(args, config):
     )
 
     try:
-        sender.start_session(multiclient=args.multi)
+        sender.start_session(multiclient=args.multi, carousel=args.carousel)
         
-        if args.multi:
+        if args.carousel:
+            print(f"Carrusel en marcha para la sesión '{session_name}'. Los receptores pueden unirse en cualquier momento (Ctrl+C para detener).")
+        elif args.multi:
             print(f"Lobby abierto para la sesión '{session_name}'.")
             print("Esperando que los clientes se unan...")
             # Muestra el prompt inicial y espera la entrada del usuario
@@ -94,8 +106,10 @@ def run_cli_receiver(args, config):
     """Ejecuta la lógica del receptor en modo CLI."""
     active_sessions = {}
     sessions_lock = threading.Lock()
+    # Estado final de cada sesión elegida {session_id: estado}; se sale cuando terminan todas.
+    download_status = {}
+    downloads_pending = set()
     download_complete_event = threading.Event()
-    download_status = "pending"
 
     def _add_session(details):
         with sessions_lock:
@@ -105,10 +119,11 @@ def run_cli_receiver(args, config):
         with sessions_lock:
             active_sessions.pop(session_id, None)
 
-    def _on_cli_download_complete(status):
-        nonlocal download_status
-        download_status = status
-        download_complete_event.set()
+    def _on_cli_download_complete(status, session_id=None):
+        with sessions_lock:
+            download_status[session_id] = status
+            downloads_pending.discard(session_id)
+            if not downloads_pending: download_complete_event.set()
 
     receiver = Receiver(config, _cli_print_progress, lambda msg: print(f"[Estado] {msg}"), _on_cli_download_complete)
     service_browser = PyCastServiceBrowser(_add_session, _remove_session, _add_session)
@@ -117,8 +132,8 @@ def run_cli_receiver(args, config):
         receiver.start_listening()
         print("Buscando sesiones en la red (Ctrl+C para salir)...")
         
-        chosen_session = None
-        while not chosen_session:
+        chosen_sessions = []
+        while not chosen_sessions:
             time.sleep(2)
             with sessions_lock:
                 if not active_sessions:
@@ -132,18 +147,18 @@ def run_cli_receiver(args, config):
                     print(f"  {i+1}) '{details['session_name']}' por {details['username']} [{details['status']}]")
 
             try:
-                choice = input("\nElige el número de la sesión a descargar (o 'q' para salir): ")
+                choice = input("\nElige el número de la sesión a descargar, o varios separados por comas (o 'q' para salir): ")
                 if choice.lower() == 'q':
                     return
-                choice_idx = int(choice) - 1
-                if 0 <= choice_idx < len(sorted_sessions):
-                    session_info = sorted_sessions[choice_idx]
-                    if session_info['status'] != 'available':
-                        print("Esa sesión no está disponible (está ocupada). Inténtalo de nuevo.")
-                        continue
-                    chosen_session = session_info
-                else:
+                choice_idxs = sorted({int(part) - 1 for part in choice.split(',') if part.strip()})
+                if not choice_idxs or not all(0 <= idx < len(sorted_sessions) for idx in choice_idxs):
                     print("Selección inválida.")
+                    continue
+                busy = [sorted_sessions[idx]['session_name'] for idx in choice_idxs if sorted_sessions[idx]['status'] not in ('available', 'carousel')]
+                if busy:
+                    print(f"La sesión '{busy[0]}' no está disponible (está ocupada). Inténtalo de nuevo.")
+                    continue
+                chosen_sessions = [sorted_sessions[idx] for idx in choice_idxs]
             except ValueError:
                 print("Por favor, introduce un número.")
 
@@ -152,37 +167,54 @@ def run_cli_receiver(args, config):
             os.makedirs(output_dir)
             print(f"Carpeta de destino creada: {output_dir}")
 
-        print(f"Intentando conectar con la sesión '{chosen_session['session_name']}'...")
-        
-        try:
-            handshake_sock = socket.create_connection((chosen_session['address'], HANDSHAKE_PORT), timeout=10)
-            with handshake_sock:
-                payload = json.dumps({'session_id': chosen_session['session_id'], 'username': config.get('username')}).encode('utf-8')
-                handshake_sock.sendall(payload)
-                response = handshake_sock.recv(1024)
-                if response == b'ACK_MULTI':
-                    print("Conectado al lobby. Esperando que el emisor inicie la transmisión...")
-                    handshake_sock.settimeout(None)
-                    start_signal = handshake_sock.recv(1024)
-                    if start_signal != b'START':
-                        raise ConnectionAbortedError("Señal de inicio inválida.")
-                elif response != b'ACK_SINGLE':
-                    raise ConnectionAbortedError("Respuesta de handshake desconocida.")
-            
-            receiver.join_session(chosen_session, output_dir)
-            print("¡Conexión exitosa! Esperando datos...")
-            
-            download_complete_event.wait()
-            
-            if download_status == "completed":
-                print("\n¡Descarga completada y verificada con éxito!")
-            elif download_status == "failed_verification":
-                print("\n¡ERROR! El archivo recibido estaba corrupto y ha sido eliminado.")
+        def _connect_and_join(chosen_session):
+            print(f"Intentando conectar con la sesión '{chosen_session['session_name']}'...")
+            try:
+                handshake_sock = socket.create_connection((chosen_session['address'], session_endpoints(chosen_session)['handshake_port']), timeout=10)
+                with handshake_sock:
+                    request = {'session_id': chosen_session['session_id'], 'username': config.get('username'),
+                               'receiver_id': receiver.receiver_id.hex()}
+                    request.update(receiver.resume_request(chosen_session, output_dir))
+                    payload = json.dumps(request).encode('utf-8') + b'\n'
+                    handshake_sock.sendall(payload)
+                    response = handshake_sock.recv(1024)
+                    if response == b'ACK_MULTI':
+                        print(f"Conectado al lobby de '{chosen_session['session_name']}'. Esperando que el emisor inicie la transmisión...")
+                        handshake_sock.settimeout(None)
+                        start_signal = handshake_sock.recv(1024)
+                        if start_signal != b'START':
+                            raise ConnectionAbortedError("Señal de inicio inválida.")
+                    elif response == b'ACK_CAROUSEL':
+                        print("Sesión en modo carrusel: la descarga empieza con la siguiente repetición de los metadatos.")
+                    elif response != b'ACK_SINGLE':
+                        raise ConnectionAbortedError("Respuesta de handshake desconocida.")
+                if not receiver.join_session(chosen_session, output_dir):
+                    raise ConnectionAbortedError("No se pudo unir al grupo multicast de la sesión.")
+                print(f"¡Conexión exitosa con '{chosen_session['session_name']}'! Esperando datos...")
+            except (socket.timeout, ConnectionRefusedError, OSError, ConnectionAbortedError, ValueError) as e:
+                print(f"\nError de Conexión: No se pudo contactar al emisor de '{chosen_session['session_name']}'. {e}")
+                _on_cli_download_complete("cancelled", chosen_session['session_id'])
+
+        # Cada handshake en su hilo: un lobby que espera su START no retrasa a las demás sesiones.
+        downloads_pending.update(session['session_id'] for session in chosen_sessions)
+        for chosen_session in chosen_sessions:
+            threading.Thread(target=_connect_and_join, args=(chosen_session,), daemon=True).start()
+
+        download_complete_event.wait()
+
+        for chosen_session in chosen_sessions:
+            status = download_status.get(chosen_session['session_id'])
+            prefix = f"'{chosen_session['session_name']}': " if len(chosen_sessions) > 1 else ""
+            if status == "completed":
+                print(f"\n{prefix}¡Descarga completada y verificada con éxito!")
+            elif status == "failed_verification":
+                print(f"\n{prefix}¡ERROR! El archivo recibido estaba corrupto y ha sido eliminado.")
+            elif status == "incomplete":
+                print(f"\n{prefix}La descarga quedó incompleta. Lo recibido se ha conservado: vuelve a unirte a la sesión para completarla.")
+            elif status == "failed":
+                print(f"\n{prefix}La descarga falló: el emisor no es compatible con esta versión de PyCast.")
             else:
-                print("\nLa descarga fue cancelada.")
-
-        except (socket.timeout, ConnectionRefusedError, OSError, ConnectionAbortedError) as e:
-            print(f"\nError de Conexión: No se pudo contactar al emisor. {e}")
+                print(f"\n{prefix}La descarga fue cancelada.")
 
     except KeyboardInterrupt:
         print("\nOperación cancelada por el usuario.")
@@ -191,6 +223,42 @@ def run_cli_receiver(args, config):
         if receiver: receiver.stop_listening()
         print("Cerrando la aplicación CLI.")
 
+def run_cli_tune(args, config):
+    """Ejecuta la sonda de ajuste de red contra un receptor, o responde a las sondas de otro equipo."""
+    if args.respond:
+        responder = ProbeResponder()
+        if not responder.start(): return
+        print("Respondiendo a sondas de ajuste (Ctrl+C para salir)...")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("\nOperación cancelada por el usuario.")
+        finally:
+            responder.stop()
+        return
+
+    try:
+        network_key = parse_network_key(args.network) if args.network else current_network_key()
+    except ValueError:
+        print(f"Error: '{args.network}' no es una subred válida (ej: 192.168.0.0/22).")
+        return
+    print(f"Ajustando la red {network_key} contra {args.peer} (el receptor debe estar en escucha)...")
+    try:
+        result = NetworkProbe(args.peer, lambda msg: print(f"  {msg}")).run()
+    except (ProbeError, OSError) as e:
+        print(f"Error: {e}")
+        return
+    except KeyboardInterrupt:
+        print("\nOperación cancelada por el usuario.")
+        return
+
+    save_network_profile(config, network_key, result)
+    save_config(config)
+    print(f"\nAjustes guardados para la red {network_key}:")
+    for key, value in result['settings'].items():
+        print(f"  - {key}: {value}")
+
 # --- FIN: LÓGICA Y FUNCIONES AUXILIARES PARA EL MODO CLI ---
 
 
@@ -240,7 +308,11 @@ class PyCastApp:
         self.root.title("PyCast - Transferencia de Archivos LAN")
         self.root.protocol("WM_DELETE_WINDOW", self._on_closing)
 
+        # self.config es lo que se guarda en disco; el perfil de la red actual solo se aplica
+        # a la copia que reciben Sender y Receiver (ver _effective_config).
         self.config = load_config()
+        _, network_key = apply_network_profile(self.config)
+        if network_key: logger.info("Aplicado el perfil de red ajustado para %s.", network_key)
 
         self.style = ttk.Style()
         self.style.theme_use('clam')
@@ -253,12 +325,17 @@ class PyCastApp:
         self.service_browser = None
         
         self.selected_file_path = tk.StringVar()
+        # Archivos y carpetas a enviar; selected_file_path es solo su descripción en pantalla.
+        self.selected_paths = []
         self.selected_folder_path = tk.StringVar(value=self.config.get('download_folder'))
         self.session_name = tk.StringVar()
         self.progress_var = tk.DoubleVar()
         self.progress_text = tk.StringVar()
         self.multiclient_mode_var = tk.BooleanVar(value=self.config.get('multiclient_enabled_by_default'))
+        self.carousel_mode_var = tk.BooleanVar(value=False)
         self.active_sessions = {}
+        # Estado de la descarga de cada sesión de la lista a la que nos hemos unido (columna "Descarga").
+        self.download_states = {}
 
         self.status_label = None
         self.sessions_tree = None
@@ -266,8 +343,18 @@ class PyCastApp:
         self.last_update_time = 0
         self.last_bytes_processed = 0
 
+        self.metrics_server = None
+        metrics_port = self.config['network_settings'].get('metrics_port', 0)
+        if metrics_port:
+            self.metrics_server = MetricsServer(metrics_port)
+            if not self.metrics_server.start(): self.metrics_server = None
+
         self.create_welcome_screen()
 
+    def _effective_config(self):
+        """Configuración con el perfil ajustado para la red actual, si lo hay (no se guarda)."""
+        return apply_network_profile(self.config)[0]
+
     def _clear_container(self):
         for widget in self.main_container.winfo_children():
             widget.destroy()
@@ -278,10 +365,12 @@ class PyCastApp:
         self._cleanup_network_services()
         
         self.selected_file_path.set("")
+        self.selected_paths = []
         self.session_name.set("")
         self.progress_var.set(0)
         self.progress_text.set("")
         self.multiclient_mode_var.set(self.config.get('multiclient_enabled_by_default'))
+        self.carousel_mode_var.set(False)
         
         welcome_frame = ttk.Frame(self.main_container)
         welcome_frame.pack(expand=True)
@@ -297,7 +386,7 @@ class PyCastApp:
     def show_config_window(self):
         config_win = tk.Toplevel(self.root)
         config_win.title("Configuración")
-        config_win.geometry("520x520") 
+        config_win.geometry("520x630")
         config_win.resizable(False, False)
         config_win.transient(self.root)
         config_win.grab_set()
@@ -363,15 +452,14 @@ class PyCastApp:
         def _check_for_custom_settings():
             current_settings = {}
             try:
-                current_settings['chunk_size'] = int(net_vars['chunk_size'].get())
-                current_settings['block_size_packets'] = int(net_vars['block_size_packets'].get())
-                current_settings['nack_listen_timeout'] = float(net_vars['nack_listen_timeout'].get())
-                current_settings['repair_rounds'] = int(net_vars['repair_rounds'].get())
+                for key, var in net_vars.items():
+                    current_settings[key] = coerce_network_setting(key, var.get())
             except (ValueError, TclError):
                 return "Personalizado"
 
+            # Los ajustes locales del receptor (p. ej. el búfer de escritura) no forman parte de los perfiles.
             for name, preset in CONFIG_PRESETS.items():
-                if preset['settings'] == current_settings:
+                if all(current_settings.get(key) == value for key, value in preset['settings'].items()):
                     return name
             return "Personalizado"
 
@@ -393,7 +481,10 @@ class PyCastApp:
             label = ttk.Label(expert_frame, text=meta['label'] + ":")
             label.grid(row=net_row, column=0, sticky="w", pady=3)
             Tooltip(label, meta['help'])
-            entry = ttk.Entry(expert_frame, textvariable=var, state='disabled')
+            if 'choices' in meta:
+                entry = ttk.Combobox(expert_frame, textvariable=var, values=meta['choices'], state='disabled')
+            else:
+                entry = ttk.Entry(expert_frame, textvariable=var, state='disabled')
             entry.grid(row=net_row, column=1, sticky="ew")
             Tooltip(entry, meta['help'])
             expert_entries.append(entry)
@@ -408,13 +499,54 @@ class PyCastApp:
             messagebox.showinfo("Restaurado", "Valores de red restaurados al perfil estándar.", parent=config_win)
 
         restore_btn = ttk.Button(expert_frame, text="Restaurar Perfil Estándar", command=_restore_defaults, state='disabled')
-        restore_btn.grid(row=net_row, column=0, columnspan=2, pady=(10,0))
+        restore_btn.grid(row=net_row, column=0, pady=(10,0))
+
+        def _on_tune_finished(network_key, result, error):
+            if not config_win.winfo_exists(): return
+            tune_btn.config(state='normal' if expert_mode_var.get() else 'disabled', text="Ajustar para esta Red...")
+            if error:
+                messagebox.showerror("Error de Ajuste", f"No se pudo completar la sonda: {error}", parent=config_win)
+                return
+            save_network_profile(self.config, network_key, result)
+            save_config(self.config)
+            messagebox.showinfo("Ajuste Completado",
+                                f"Ajustes guardados para la red {network_key} "
+                                f"({result['best']['goodput_bps'] / 1_000_000:.1f} Mbps útiles, pérdida {result['best']['loss']:.1%}). "
+                                "Se aplicarán automáticamente en esta red.", parent=config_win)
+
+        def _run_tuning():
+            peer_ip = simpledialog.askstring("Ajustar para esta Red", "IP de un equipo con PyCast en modo recepción:", parent=config_win)
+            if not peer_ip: return
+            network_text = simpledialog.askstring("Ajustar para esta Red", "Subred a la que se aplicarán los ajustes:",
+                                                  initialvalue=current_network_key(), parent=config_win)
+            if not network_text: return
+            try:
+                network_key = parse_network_key(network_text)
+            except ValueError:
+                messagebox.showerror("Error de Ajuste", f"'{network_text}' no es una subred válida (ej: 192.168.0.0/22).", parent=config_win)
+                return
+            tune_btn.config(state='disabled', text="Ajustando...")
+
+            def task():
+                result, error = None, None
+                try:
+                    result = NetworkProbe(peer_ip.strip()).run()
+                except (ProbeError, OSError) as e:
+                    error = e
+                self.root.after(0, lambda: _on_tune_finished(network_key, result, error))
+            threading.Thread(target=task, daemon=True).start()
+
+        tune_btn = ttk.Button(expert_frame, text="Ajustar para esta Red...", command=_run_tuning, state='disabled')
+        tune_btn.grid(row=net_row, column=1, pady=(10,0))
+        Tooltip(tune_btn, "Mide la red contra un receptor (tamaños de trozo y bloque, pérdida y RTT) y guarda los mejores ajustes para esta subred.")
         
         def _toggle_expert_mode():
             new_state = 'normal' if expert_mode_var.get() else 'disabled'
             for entry in expert_entries:
-                entry.config(state=new_state)
+                # Los campos con opciones fijas solo permiten elegir de la lista.
+                entry.config(state='readonly' if new_state == 'normal' and isinstance(entry, ttk.Combobox) else new_state)
             restore_btn.config(state=new_state)
+            tune_btn.config(state=new_state)
             preset_combo.config(state=new_state)
 
         expert_mode_var = tk.BooleanVar()
@@ -432,10 +564,7 @@ class PyCastApp:
                 
                 net_settings_data = self.config['network_settings']
                 for key, var in net_vars.items():
-                    if key == 'nack_listen_timeout':
-                        net_settings_data[key] = float(var.get())
-                    else:
-                        net_settings_data[key] = int(var.get())
+                    net_settings_data[key] = coerce_network_setting(key, var.get())
 
                 self.selected_folder_path.set(self.config['download_folder'])
                 self.multiclient_mode_var.set(self.config['multiclient_enabled_by_default'])
@@ -466,24 +595,31 @@ class PyCastApp:
         self.session_name_entry = ttk.Entry(sender_frame, textvariable=self.session_name)
         self.session_name_entry.grid(row=0, column=1, columnspan=2, sticky="ew", padx=5, pady=5)
         
-        ttk.Label(sender_frame, text="Archivo a Enviar:").grid(row=1, column=0, sticky="w", padx=5, pady=5)
+        ttk.Label(sender_frame, text="Archivos a Enviar:").grid(row=1, column=0, sticky="w", padx=5, pady=5)
         self.file_path_entry = ttk.Entry(sender_frame, textvariable=self.selected_file_path, state="readonly")
         self.file_path_entry.grid(row=1, column=1, sticky="ew", padx=5, pady=5)
-        self.select_file_btn = ttk.Button(sender_frame, text="Seleccionar...", command=self._select_file)
-        self.select_file_btn.grid(row=1, column=2, sticky="ew", padx=5, pady=5)
-
-        self.drop_target_frame = ttk.LabelFrame(sender_frame, text="Arrastra y suelta un archivo aquí", padding="10")
+        select_buttons = ttk.Frame(sender_frame)
+        select_buttons.grid(row=1, column=2, sticky="ew", padx=5, pady=5)
+        self.select_file_btn = ttk.Button(select_buttons, text="Archivos...", command=self._select_file)
+        self.select_file_btn.pack(side=tk.LEFT)
+        self.select_dir_btn = ttk.Button(select_buttons, text="Carpeta...", command=self._select_send_folder)
+        self.select_dir_btn.pack(side=tk.LEFT, padx=(5, 0))
+
+        self.drop_target_frame = ttk.LabelFrame(sender_frame, text="Arrastra y suelta archivos o carpetas aquí", padding="10")
         self.drop_target_frame.grid(row=2, column=0, columnspan=3, sticky="ew", padx=5, pady=10)
         self.drop_target_frame.grid_columnconfigure(0, weight=1)
-        ttk.Label(self.drop_target_frame, text="O haz clic en 'Seleccionar...' arriba", anchor="center").grid(row=0, column=0, sticky="ew", pady=5)
+        ttk.Label(self.drop_target_frame, text="O haz clic en 'Archivos...' o 'Carpeta...' arriba", anchor="center").grid(row=0, column=0, sticky="ew", pady=5)
 
         self.drop_target_frame.drop_target_register(DND_FILES)
         self.drop_target_frame.dnd_bind('<<Drop>>', self._on_file_drop_dnd)
-        self.drop_target_frame.bind("<Enter>", lambda e: self.drop_target_frame.config(text="¡Suelta el archivo!"))
-        self.drop_target_frame.bind("<Leave>", lambda e: self.drop_target_frame.config(text="Arrastra y suelta un archivo aquí"))
+        self.drop_target_frame.bind("<Enter>", lambda e: self.drop_target_frame.config(text="¡Suéltalos aquí!"))
+        self.drop_target_frame.bind("<Leave>", lambda e: self.drop_target_frame.config(text="Arrastra y suelta archivos o carpetas aquí"))
 
         self.multiclient_checkbox = ttk.Checkbutton(sender_frame, text="Enviar a múltiples clientes", variable=self.multiclient_mode_var, command=self._on_multiclient_toggle)
-        self.multiclient_checkbox.grid(row=3, column=0, columnspan=3, sticky='w', padx=5, pady=5)
+        self.multiclient_checkbox.grid(row=3, column=0, columnspan=2, sticky='w', padx=5, pady=5)
+        self.carousel_checkbox = ttk.Checkbutton(sender_frame, text="Modo carrusel", variable=self.carousel_mode_var, command=self._on_multiclient_toggle)
+        self.carousel_checkbox.grid(row=3, column=2, sticky='e', padx=5, pady=5)
+        Tooltip(self.carousel_checkbox, "Emite el archivo en bucle hasta que lo detengas. Los receptores pueden unirse en cualquier momento y terminan en cuanto reúnen datos suficientes, sin pedir retransmisiones.")
         
         self.clients_tree_label = ttk.Label(sender_frame, text="Clientes Conectados:")
         
@@ -519,44 +655,57 @@ class PyCastApp:
         if not files:
             messagebox.showwarning("Error de Arrastre", "No se pudo identificar el archivo soltado.", parent=self.root)
             return
-        if len(files) > 1:
-            messagebox.showinfo("Información", "Solo se puede enviar un archivo a la vez. Se usará el primero de la lista.", parent=self.root)
-        file_path = files[0]
-        if os.path.isfile(file_path):
-            self.selected_file_path.set(file_path)
-            self.session_name.set(os.path.basename(file_path))
-            self._set_sender_ui_state('ready')
+        invalid = [path for path in files if not os.path.exists(path)]
+        if invalid:
+            messagebox.showwarning("Error de Arrastre", f"El elemento soltado no es un archivo válido o no existe:\n{invalid[0]}", parent=self.root)
         else:
-            messagebox.showwarning("Error de Arrastre", f"El elemento soltado no es un archivo válido o no existe:\n{file_path}", parent=self.root)
-        self.drop_target_frame.config(text="Arrastra y suelta un archivo aquí")
+            self._set_selected_paths(list(files))
+        self.drop_target_frame.config(text="Arrastra y suelta archivos o carpetas aquí")
+
+    def _set_selected_paths(self, paths):
+        self.selected_paths = paths
+        if len(paths) == 1:
+            self.selected_file_path.set(paths[0])
+        else:
+            self.selected_file_path.set(f"{len(paths)} elementos: " + ", ".join(os.path.basename(os.path.normpath(p)) for p in paths))
+        self.session_name.set(file_set_label(paths))
+        self._set_sender_ui_state('ready')
+
+    def _sender_action_text(self):
+        if self.carousel_mode_var.get(): return "Iniciar Carrusel"
+        return "Abrir Lobby" if self.multiclient_mode_var.get() else "Enviar Archivo"
 
     def _on_multiclient_toggle(self):
         if self.action_btn['state'] == 'normal':
-            is_multi = self.multiclient_mode_var.get()
-            self.action_btn.config(text="Enviar Archivo" if not is_multi else "Abrir Lobby")
+            self.action_btn.config(text=self._sender_action_text())
 
     def _set_sender_ui_state(self, state):
         self.clients_tree_label.grid_remove()
         self.clients_frame.grid_remove()
         self.progress_bar.grid_remove()
         self.progress_label.grid_remove()
-        is_multi = self.multiclient_mode_var.get()
         if state == 'initial':
             self.session_name_entry.config(state="normal")
             self.select_file_btn.config(state="normal")
+            self.select_dir_btn.config(state="normal")
             self.multiclient_checkbox.config(state="normal")
-            self.action_btn.config(text="Enviar Archivo" if not is_multi else "Abrir Lobby", state="disabled")
+            self.carousel_checkbox.config(state="normal")
+            self.action_btn.config(text=self._sender_action_text(), state="disabled")
             self._update_status("Selecciona un archivo para enviar.")
         elif state == 'ready':
             self.session_name_entry.config(state="normal")
             self.select_file_btn.config(state="normal")
+            self.select_dir_btn.config(state="normal")
             self.multiclient_checkbox.config(state="normal")
-            self.action_btn.config(text="Enviar Archivo" if not is_multi else "Abrir Lobby", state="normal")
+            self.carousel_checkbox.config(state="normal")
+            self.action_btn.config(text=self._sender_action_text(), state="normal")
             self._update_status("Listo. Pulsa el botón para empezar.")
         elif state == 'lobby':
             self.session_name_entry.config(state="disabled")
             self.select_file_btn.config(state="disabled")
+            self.select_dir_btn.config(state="disabled")
             self.multiclient_checkbox.config(state="disabled")
+            self.carousel_checkbox.config(state="disabled")
             self.clients_tree_label.grid(row=4, column=0, columnspan=3, sticky='w', padx=5, pady=(10,0))
             self.clients_frame.grid(row=5, column=0, columnspan=3, sticky='nsew', padx=5)
             self.action_btn.config(text="Iniciar Transmisión", state="normal")
@@ -564,7 +713,9 @@ class PyCastApp:
         elif state == 'sending':
             self.session_name_entry.config(state="disabled")
             self.select_file_btn.config(state="disabled")
+            self.select_dir_btn.config(state="disabled")
             self.multiclient_checkbox.config(state="disabled")
+            self.carousel_checkbox.config(state="disabled")
             self.progress_bar.grid(row=7, column=0, columnspan=3, sticky="ew", padx=5, pady=5, ipady=5)
             self.progress_label.grid(row=8, column=0, columnspan=3, sticky="ew", padx=5)
             self.action_btn.config(text="Cancelar", state="normal")
@@ -589,24 +740,25 @@ class PyCastApp:
             for i in self.clients_tree.get_children(): self.clients_tree.delete(i)
             return
 
-        file_path = self.selected_file_path.get()
+        paths = list(self.selected_paths)
         session_name = self.session_name.get()
-        if not file_path or not os.path.exists(file_path):
+        if not paths or not all(os.path.exists(path) for path in paths):
             messagebox.showerror("Error", "El archivo seleccionado no es válido o no existe.")
             return
         if not session_name:
             messagebox.showerror("Error", "Asigna un nombre a la sesión.")
             return
 
-        is_multiclient = self.multiclient_mode_var.get()
+        is_carousel = self.carousel_mode_var.get()
+        is_multiclient = self.multiclient_mode_var.get() and not is_carousel
 
         def setup_and_run_sender():
             self.sender = Sender(
-                file_path, session_name, self.config,
+                paths if len(paths) > 1 else paths[0], session_name, self._effective_config(),
                 self._update_progress, self._update_status,
                 self._add_client_to_list, self._remove_client_from_list
             )
-            self.sender.start_session(multiclient=is_multiclient)
+            self.sender.start_session(multiclient=is_multiclient, carousel=is_carousel)
 
         if is_multiclient: self._set_sender_ui_state('lobby')
         else:
@@ -637,17 +789,22 @@ class PyCastApp:
         ttk.Button(receiver_frame, text="Seleccionar...", command=self._select_folder).grid(row=0, column=2, sticky="ew", padx=5, pady=5)
         
         ttk.Label(receiver_frame, text="Sesiones Disponibles:").grid(row=1, column=0, columnspan=3, sticky="w", padx=5, pady=5)
-        cols = ("Sesión", "Enviado por", "Estado")
-        self.sessions_tree = ttk.Treeview(receiver_frame, columns=cols, show="headings", height=8)
+        cols = ("Sesión", "Enviado por", "Estado", "Descarga")
+        # Se pueden seleccionar varias sesiones (Ctrl/Mayús + clic) para descargarlas a la vez.
+        self.sessions_tree = ttk.Treeview(receiver_frame, columns=cols, show="headings", height=8, selectmode="extended")
         self.sessions_tree.heading("Sesión", text="Nombre de la Sesión")
         self.sessions_tree.heading("Enviado por", text="Enviado por")
         self.sessions_tree.heading("Estado", text="Estado")
-        self.sessions_tree.column("Enviado por", width=150, anchor='center')
-        self.sessions_tree.column("Estado", width=100, anchor='center')
+        self.sessions_tree.heading("Descarga", text="Descarga")
+        self.sessions_tree.column("Enviado por", width=120, anchor='center')
+        self.sessions_tree.column("Estado", width=90, anchor='center')
+        self.sessions_tree.column("Descarga", width=110, anchor='center')
         self.sessions_tree.grid(row=2, column=0, columnspan=3, sticky="nsew", padx=5, pady=5)
+        self.download_states = {}
         
         self.join_btn = ttk.Button(receiver_frame, text="Unirse y Descargar", command=self._join_session)
         self.join_btn.grid(row=3, column=0, columnspan=3, pady=10)
+        Tooltip(self.join_btn, "Descarga las sesiones seleccionadas. Puedes añadir más sesiones mientras otras se están descargando.")
         
         self.progress_text.set("")
         ttk.Progressbar(receiver_frame, variable=self.progress_var, maximum=100).grid(row=4, column=0, columnspan=3, sticky="ew", padx=5, pady=5, ipady=5)
@@ -664,7 +821,7 @@ class PyCastApp:
         if self.status_label and self.status_label.winfo_exists():
             self.root.after(0, lambda: self.status_label.config(text=message))
 
-    def _update_progress(self, bytes_processed, total_bytes):
+    def _update_progress(self, bytes_processed, total_bytes, rate_bps=None):
         def task():
             if not hasattr(self, 'progress_var') or total_bytes == 0:
                 self.progress_var.set(0)
@@ -677,7 +834,10 @@ class PyCastApp:
             current_time = time.time()
             time_delta = current_time - self.last_update_time
             
-            if time_delta > 0.2:
+            if rate_bps is not None:
+                # El emisor informa de la tasa real medida por su regulador de envío.
+                self.progress_text.set(f"{percentage:.1f}%  ({rate_bps / 1_000_000:.2f} Mbps)")
+            elif time_delta > 0.2:
                 bytes_delta = bytes_processed - self.last_bytes_processed
                 speed_bps = (bytes_delta * 8) / time_delta
                 speed_mbps = speed_bps / 1_000_000
@@ -692,24 +852,32 @@ class PyCastApp:
         self.root.after(0, task)
 
     def _select_file(self):
-        path = filedialog.askopenfilename()
-        if path:
-            self.selected_file_path.set(path)
-            self.session_name.set(os.path.basename(path))
-            self._set_sender_ui_state('ready')
+        paths = filedialog.askopenfilenames()
+        if paths: self._set_selected_paths(list(paths))
+
+    def _select_send_folder(self):
+        path = filedialog.askdirectory(title="Selecciona la carpeta a enviar")
+        if path: self._set_selected_paths([path])
 
     def _select_folder(self):
         path = filedialog.askdirectory()
         if path: self.selected_folder_path.set(path)
     
     def _start_receiver_logic(self):
-        self.receiver = Receiver(self.config, self._update_progress, self._update_status, self._on_download_complete)
+        self.receiver = Receiver(self._effective_config(), self._update_progress, self._update_status, self._on_download_complete)
         self.service_browser = PyCastServiceBrowser(self._add_session, self._remove_session, self._update_session)
         self.receiver.start_listening()
         
-    def _on_download_complete(self, status="completed"):
+    def _on_download_complete(self, status="completed", session_id=None):
         def task():
-            if status == "completed":
+            row_text = {"completed": "Completada", "cancelled": "Cancelada", "failed_verification": "Corrupta",
+                        "incomplete": "Incompleta", "failed": "Fallida"}.get(status, status)
+            if session_id: self._set_download_state(session_id, row_text)
+            if self.receiver and self.receiver.downloads:
+                # Quedan otras descargas en curso: la barra sigue mostrando su progreso conjunto.
+                session_name = self.active_sessions.get(session_id, {}).get('session_name', '')
+                self._update_status(f"'{session_name}': {row_text.lower()}. Quedan {len(self.receiver.downloads)} descargas en curso.")
+            elif status == "completed":
                 self.progress_var.set(100)
                 self.progress_text.set("¡Descarga completa!")
                 self._update_status("¡Descarga completa! Listo para una nueva descarga.")
@@ -717,24 +885,39 @@ class PyCastApp:
                 self.progress_var.set(0)
                 self.progress_text.set("Descarga cancelada")
                 self._update_status("La descarga fue cancelada. Listo para una nueva descarga.")
-            elif status == "failed_verification":
+            elif status == "incomplete":
+                self.progress_text.set("Descarga incompleta")
+                self._update_status("Descarga incompleta. Vuelve a unirte a la sesión para completarla.")
+            elif status == "failed":
                 self.progress_var.set(0)
-                self.progress_text.set("¡Verificación fallida!")
-                self._update_status("El archivo recibido estaba corrupto y ha sido eliminado.")
+                self.progress_text.set("Descarga fallida")
+                self._update_status("La descarga falló: el emisor no es compatible con esta versión de PyCast.")
+            if status == "failed_verification":
+                if not (self.receiver and self.receiver.downloads):
+                    self.progress_var.set(0)
+                    self.progress_text.set("¡Verificación fallida!")
+                    self._update_status("El archivo recibido estaba corrupto y ha sido eliminado.")
                 messagebox.showerror("Error de Verificación", 
                                      "La comprobación de integridad del archivo ha fallado. "
                                      "El archivo descargado estaba corrupto y ha sido eliminado.")
-
-            if self.join_btn and self.join_btn.winfo_exists():
-                self.join_btn.config(state='normal')
         self.root.after(0, task)
 
+    def _set_download_state(self, session_id, text):
+        """Actualiza la columna "Descarga" de una sesión (desde el hilo de la interfaz)."""
+        self.download_states[session_id] = text
+        if self.sessions_tree and self.sessions_tree.winfo_exists() and self.sessions_tree.exists(session_id):
+            self.sessions_tree.set(session_id, "Descarga", text)
+
+    def _session_row(self, details):
+        return (details['session_name'], details['username'], details['status'].capitalize(),
+                self.download_states.get(details['session_id'], ""))
+
     def _add_session(self, details):
         if self.sessions_tree and self.sessions_tree.winfo_exists():
             session_id = details['session_id']
             if not self.sessions_tree.exists(session_id):
                 self.active_sessions[session_id] = details
-                values = (details['session_name'], details['username'], details['status'].capitalize())
+                values = self._session_row(details)
                 self.root.after(0, lambda: self.sessions_tree.insert('', 'end', iid=session_id, values=values))
 
     def _remove_session(self, session_id):
@@ -746,34 +929,45 @@ class PyCastApp:
         session_id = details['session_id']
         if self.sessions_tree and self.sessions_tree.winfo_exists() and self.sessions_tree.exists(session_id):
             self.active_sessions[session_id] = details
-            values = (details['session_name'], details['username'], details['status'].capitalize())
+            values = self._session_row(details)
             self.root.after(0, lambda: self.sessions_tree.item(session_id, values=values))
 
     def _join_session(self):
-        selected_item_id = self.sessions_tree.focus()
-        if not selected_item_id:
-            messagebox.showerror("Error", "Por favor, selecciona una sesión de la lista.")
+        selected_ids = self.sessions_tree.selection()
+        if not selected_ids:
+            messagebox.showerror("Error", "Por favor, selecciona una o varias sesiones de la lista.")
             return
         destination_folder = self.selected_folder_path.get()
-        session_info = self.active_sessions.get(selected_item_id)
-        if not session_info or session_info.get('status') == 'busy':
-            messagebox.showwarning("Sesión Ocupada", "Esta sesión no está disponible.", parent=self.root)
+        sessions = [self.active_sessions.get(item_id) for item_id in selected_ids]
+        sessions = [info for info in sessions if info and not self.receiver.is_joined(info['session_id'])
+                    and self.download_states.get(info['session_id']) != "Conectando..."]
+        if not sessions:
+            messagebox.showinfo("Sesiones en curso", "Las sesiones seleccionadas ya se están descargando.", parent=self.root)
+            return
+        if any(info.get('status') == 'busy' for info in sessions):
+            messagebox.showwarning("Sesión Ocupada", "Alguna de las sesiones seleccionadas no está disponible.", parent=self.root)
             return
         
-        self._update_progress(0, 0)
-        self.last_update_time = time.time()
-        self.last_bytes_processed = 0
+        if not self.receiver.downloads:
+            # Primer lote: la barra de progreso empieza de cero.
+            self._update_progress(0, 0)
+            self.last_update_time = time.time()
+            self.last_bytes_processed = 0
 
-        self.join_btn.config(state="disabled")
-        threading.Thread(target=self._perform_handshake_and_wait, args=(session_info, destination_folder), daemon=True).start()
+        for session_info in sessions:
+            self._set_download_state(session_info['session_id'], "Conectando...")
+            threading.Thread(target=self._perform_handshake_and_wait, args=(session_info, destination_folder), daemon=True).start()
 
     def _perform_handshake_and_wait(self, session_info, destination_folder):
         try:
             self._update_status(f"Conectando con {session_info.get('username')}...")
-            handshake_sock = socket.create_connection((session_info['address'], HANDSHAKE_PORT), timeout=5)
+            handshake_sock = socket.create_connection((session_info['address'], session_endpoints(session_info)['handshake_port']), timeout=5)
             
             with handshake_sock:
-                payload = json.dumps({'session_id': session_info['session_id'], 'username': self.config.get('username')}).encode('utf-8')
+                request = {'session_id': session_info['session_id'], 'username': self.config.get('username'),
+                           'receiver_id': self.receiver.receiver_id.hex()}
+                request.update(self.receiver.resume_request(session_info, destination_folder))
+                payload = json.dumps(request).encode('utf-8') + b'\n'
                 handshake_sock.sendall(payload)
                 response = handshake_sock.recv(1024)
                 if response == b'ACK_MULTI':
@@ -782,14 +976,18 @@ class PyCastApp:
                     start_signal = handshake_sock.recv(1024)
                     if start_signal != b'START':
                         raise ConnectionAbortedError("Señal de inicio inválida.")
+                elif response == b'ACK_CAROUSEL':
+                    self._update_status("Sesión en modo carrusel. Esperando los metadatos...")
                 elif response != b'ACK_SINGLE':
                     raise ConnectionAbortedError("Respuesta de handshake desconocida.")
             
-            self.receiver.join_session(session_info, destination_folder)
+            if not self.receiver.join_session(session_info, destination_folder):
+                raise ConnectionAbortedError("No se pudo unir al grupo multicast de la sesión.")
+            self.root.after(0, lambda: self._set_download_state(session_info['session_id'], "Descargando"))
 
-        except (socket.timeout, ConnectionRefusedError, OSError, ConnectionAbortedError) as e:
-            messagebox.showerror("Error de Conexión", f"No se pudo contactar al emisor: {e}", parent=self.root)
-            self.root.after(0, lambda: self.join_btn.config(state="normal"))
+        except (socket.timeout, ConnectionRefusedError, OSError, ConnectionAbortedError, ValueError) as e:
+            self.root.after(0, lambda: self._set_download_state(session_info['session_id'], "Error"))
+            messagebox.showerror("Error de Conexión", f"No se pudo contactar al emisor de '{session_info.get('session_name')}': {e}", parent=self.root)
         
     def _cleanup_network_services(self):
         if self.sender: self.sender.stop_session()
@@ -802,6 +1000,7 @@ class PyCastApp:
     def _on_closing(self):
         if messagebox.askokcancel("Salir", "¿Estás seguro de que quieres salir?"):
             self._cleanup_network_services()
+            if self.metrics_server: self.metrics_server.stop()
             self.root.destroy()
 
     def run(self):
@@ -817,11 +1016,26 @@ Ejemplos de uso:
   # Enviar un archivo a múltiples receptores con un nombre de sesión personalizado
   python pycast_app.py send ./fotos.zip --name "Fotos de la Fiesta" --multi
 
+  # Emitir una imagen en bucle para equipos que se unen en momentos distintos
+  python pycast_app.py send ./imagen.img --carousel
+
+  # Enviar una carpeta completa y un archivo suelto en la misma sesión (sin empaquetarlos)
+  python pycast_app.py send ./proyecto/ ./notas.txt
+
+  # Enviar mostrando el detalle de cada bloque y cada NACK (o solo avisos y errores con --quiet)
+  python pycast_app.py send ./documento.pdf --verbose
+
   # Buscar y recibir un archivo en la carpeta por defecto
   python pycast_app.py receive
 
   # Recibir un archivo y guardarlo en una carpeta específica
   python pycast_app.py receive --output-dir /tmp/descargas/
+
+  # Recibir publicando métricas en http://127.0.0.1:9100/metrics y guardarlas al terminar
+  python pycast_app.py receive --metrics-port 9100 --metrics-json metricas.json
+
+  # Ajustar la configuración de red para esta red contra un receptor en escucha
+  python pycast_app.py tune --peer 192.168.1.20
 """
     parser = argparse.ArgumentParser(
         description="PyCast: Herramienta de transferencia de archivos en LAN.",
@@ -829,24 +1043,61 @@ Ejemplos de uso:
         formatter_class=argparse.RawTextHelpFormatter
     )
     subparsers = parser.add_subparsers(dest='command', help='Comandos:')
+
+    # Opciones de salida comunes a todos los comandos.
+    output_parser = argparse.ArgumentParser(add_help=False)
+    output_group = output_parser.add_mutually_exclusive_group()
+    output_group.add_argument('-v', '--verbose', action='store_true', help='Mostrar también el detalle de cada bloque, NACK y ronda de reparación.')
+    output_group.add_argument('-q', '--quiet', action='store_true', help='Mostrar solo avisos y errores.')
     
-    send_parser = subparsers.add_parser('send', help='Enviar un archivo.')
-    send_parser.add_argument('file_path', metavar='ARCHIVO', help='Ruta al archivo que se va a enviar.')
+    send_parser = subparsers.add_parser('send', parents=[output_parser], help='Enviar uno o varios archivos o carpetas.')
+    send_parser.add_argument('file_path', metavar='ARCHIVO', nargs='+', help='Archivos o carpetas que se van a enviar (en una sola sesión).')
     send_parser.add_argument('--name', help='Nombre personalizado para la sesión (por defecto: nombre del archivo).')
     send_parser.add_argument('--multi', action='store_true', help='Habilitar modo multi-cliente (lobby). Se esperará a que el usuario presione Enter para iniciar la transmisión.')
+    send_parser.add_argument('--carousel', action='store_true', help='Modo carrusel: emitir el archivo en bucle hasta pulsar Ctrl+C. Los receptores pueden unirse en cualquier momento y no envían NACKs.')
     
-    receive_parser = subparsers.add_parser('receive', help='Recibir un archivo.')
+    receive_parser = subparsers.add_parser('receive', parents=[output_parser], help='Recibir un archivo.')
     receive_parser.add_argument('--output-dir', metavar='CARPETA', help='Carpeta para guardar los archivos descargados (por defecto: la configurada en la app).')
+
+    for command_parser in (send_parser, receive_parser):
+        command_parser.add_argument('--metrics-port', type=int, metavar='PUERTO', help='Publicar las métricas en http://127.0.0.1:PUERTO/metrics (por defecto: el Puerto de Métricas de la configuración; 0 = no publicar).')
+        command_parser.add_argument('--metrics-json', metavar='ARCHIVO', help="Guardar las métricas en ARCHIVO (JSON) al terminar ('-' = mostrarlas en pantalla).")
     
+    tune_parser = subparsers.add_parser('tune', parents=[output_parser], help='Ajustar la configuración de red para la red actual.')
+    tune_group = tune_parser.add_mutually_exclusive_group(required=True)
+    tune_group.add_argument('--peer', metavar='IP', help='IP de un equipo con PyCast en modo recepción (o con "tune --respond").')
+    tune_group.add_argument('--respond', action='store_true', help='Solo responder a las sondas de ajuste de otro equipo.')
+    tune_parser.add_argument('--network', metavar='SUBRED', help='Subred a la que se asocian los ajustes (ej: 10.0.0.0/16). Por defecto, la de la IP local con la máscara de su interfaz (en sistemas distintos de Linux se supone /24).')
+
     args = parser.parse_args()
+    setup_logging(logging.DEBUG if getattr(args, 'verbose', False) else logging.WARNING if getattr(args, 'quiet', False) else logging.INFO)
 
-    if args.command in ['send', 'receive']:
+    if args.command in ['send', 'receive', 'tune']:
         print("La configuración de red desde config.json se usará para la CLI.")
         config = load_config()
-        if args.command == 'send':
-            run_cli_sender(args, config)
-        elif args.command == 'receive':
-            run_cli_receiver(args, config)
+        if args.command != 'tune':
+            config, network_key = apply_network_profile(config)
+            if network_key: logger.info("Aplicado el perfil de red ajustado para %s.", network_key)
+        metrics_server = None
+        if args.command != 'tune':
+            metrics_port = args.metrics_port if args.metrics_port is not None else config['network_settings'].get('metrics_port', 0)
+            if metrics_port:
+                metrics_server = MetricsServer(metrics_port)
+                metrics_server.start()
+        try:
+            if args.command == 'send':
+                run_cli_sender(args, config)
+            elif args.command == 'receive':
+                run_cli_receiver(args, config)
+            elif args.command == 'tune':
+                run_cli_tune(args, config)
+        finally:
+            if metrics_server: metrics_server.stop()
+            if getattr(args, 'metrics_json', None):
+                try:
+                    REGISTRY.dump_json(args.metrics_json)
+                except OSError as e:
+                    print(f"No se pudieron guardar las métricas en {args.metrics_json}: {e}")
     else:
         main_window = TkinterDnD.Tk()
         app = PyCastApp(main_window)
@@ -1,67 +1,104 @@
 # receiver.py
+import logging
+import selectors
 import socket
 import threading
-import json
-import os
 import uuid
-import shutil
-import zlib  # NUEVO: Importado para calcular el checksum CRC32
-
-# --- Constantes de Red ---
-MULTICAST_GROUP = '239.192.1.100'
-MULTICAST_PORT = 5007
-NACK_PORT = 5009
-
-# NUEVO: Función de ayuda para calcular CRC32 en trozos (eficiente con la memoria)
-def _calculate_file_crc32(file_path):
-    """Calcula el checksum CRC32 de un archivo leyéndolo en trozos."""
-    crc_value = 0
-    try:
-        with open(file_path, 'rb') as f:
-            while chunk := f.read(65536): # Leer en trozos de 64KB
-                crc_value = zlib.crc32(chunk, crc_value)
-    except IOError:
-        return None # Devuelve None si el archivo no se puede leer
-    return crc_value
+import os
+import time
+from collections import deque
+from batch_io import open_batch_receiver, use_batch_io
+from packet_ring import PacketRing
+from tuning import ProbeResponder
+from session_endpoints import session_endpoints
+from session_download import SessionDownload
+from resume_state import load_resume_state, state_matches
+from delta_sync import file_signatures
+from metrics import REGISTRY, ReceiverMetrics, udp_socket_drops
+from protocol import PACKET_MAGIC, HEADER_SIZE, SESSION_ID_SLICE, RECEIVER_ID_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Datagramas que se leen como mucho por llamada con la E/S por lotes (recvmmsg).
+RECV_BATCH_SIZE = 64
+# Huecos del anillo entre el hilo lector y el de procesado (cada uno de 64 KB).
+RING_SLOTS = 256
+
+# Receptor del que se leen las métricas del kernel, del anillo y de las descargas: el que está
+# escuchando. Las métricas se registran una sola vez; un Receiver nuevo (la interfaz los recrea al
+# reiniciar los servicios de red) se enlaza al empezar a escuchar y el anterior se desenlaza al parar.
+_metrics_receiver = None
+
+def _receiver_metric(read):
+    """Función de consulta que aplica `read` al receptor enlazado (0 si no hay ninguno)."""
+    def fn():
+        receiver = _metrics_receiver
+        return read(receiver) if receiver is not None else 0
+    return fn
+
+REGISTRY.gauge('pycast_receiver_socket_drops', 'Datagramas descartados por el kernel en los sockets de los grupos unidos (solo Linux).',
+               fn=_receiver_metric(lambda receiver: sum(udp_socket_drops(sock) for sock in receiver.session_sockets.values())))
+REGISTRY.gauge('pycast_receiver_ring_occupancy', 'Paquetes leídos pendientes de procesar en el anillo.',
+               fn=_receiver_metric(lambda receiver: receiver.ring_stats().get('occupancy', 0)))
+REGISTRY.counter('pycast_receiver_ring_full_waits_total', 'Veces que el hilo lector encontró el anillo lleno.',
+                 fn=_receiver_metric(lambda receiver: receiver.ring_stats().get('full_waits', 0)))
+REGISTRY.gauge('pycast_receiver_active_downloads', 'Descargas en curso.',
+               fn=_receiver_metric(lambda receiver: len(receiver.downloads)))
 
 class Receiver:
+    """
+    Receptor de una o varias sesiones a la vez. Cada `join_session` añade una descarga a la
+    tabla de descargas (archivo, bloques recibidos, contadores: ver session_download.py); un
+    único hilo lee los sockets de todos los grupos unidos y el de procesado reparte cada
+    paquete a su descarga por el identificador de sesión de la cabecera.
+    """
     def __init__(self, config, progress_callback, status_callback, completion_callback):
         self.config = config
         self.progress_callback = progress_callback
         self.status_callback = status_callback
+        # Se llama con status=... y session_id=... al terminar cada descarga.
         self.completion_callback = completion_callback
         
         self.CHUNK_SIZE = self.config.get('network_settings', {}).get('chunk_size', 8192)
-        self.BUFFER_SIZE = 32768 + 2048 
+        self.WRITE_BUFFER_BYTES = self.config.get('network_settings', {}).get('write_buffer_mb', 64) * 1024 * 1024
+        self.IO_BACKEND = self.config.get('network_settings', {}).get('io_backend', 'auto')
+        self.BATCH_IO = use_batch_io(self.IO_BACKEND)
 
         # --- NUEVO: Imprimir configuración por defecto al inicio ---
-        print("\n--- [RECEIVER] Configuración de Red Inicial (Local) ---")
-        print(f"  - CHUNK_SIZE (default): {self.CHUNK_SIZE} bytes")
-        print(f"  - BUFFER_SIZE (fijo): {self.BUFFER_SIZE} bytes")
-        print("-----------------------------------------------------\n")
+        logger.info("--- [RECEIVER] Configuración de Red Inicial (Local) ---\n%s", "\n".join([
+            f"  - CHUNK_SIZE (default): {self.CHUNK_SIZE} bytes",
+            f"  - RING: {RING_SLOTS} huecos de recepción",
+            f"  - WRITE_BUFFER: {self.WRITE_BUFFER_BYTES // (1024 * 1024)} MB por descarga",
+            f"  - IO_BACKEND: {self.IO_BACKEND} ({'recvmmsg' if self.BATCH_IO else 'recvfrom'})",
+            "-----------------------------------------------------"]))
 
-        self.listen_socket = None
+        # Identifica a este receptor ante los emisores: va en el handshake y en los ACK de bloque.
+        self.receiver_id = os.urandom(RECEIVER_ID_SIZE)
         self.nack_socket = None
         self.is_listening = False
         self.thread = None
-        
-        self.current_session_info = {}
-        self.joined_session_id = None
-        self.sender_address = None
+        self.worker_thread = None
+        self.ring = None
+        # Responde a las sondas de `pycast_app.py tune` mientras se escucha.
+        self.probe_responder = None
 
-        self.output_file = None
-        self.temp_file_path = None
-        
-        self.received_seqs_current_block = set()
-        self.last_processed_block = -1
+        # Descargas en curso por identificador de sesión (los 16 bytes de la cabecera) y socket de
+        # datos de cada (grupo, puerto) unido, compartido por las sesiones que usen el mismo. Ambos
+        # diccionarios se sustituyen enteros al cambiar, así los hilos de red los leen sin bloqueo.
+        self.downloads = {}
+        self.session_sockets = {}
+        self.lock = threading.Lock()
+        # Descargas sustituidas al volver a unirse a su sesión. Ya no están en la tabla, pero el hilo
+        # de procesado puede estar atendiendo un paquete suyo: es él quien las suspende, entre paquetes.
+        self.retired_downloads = deque()
+        # Progreso de las descargas del lote actual {session_id: (bytes, total)}; se informa del total.
+        self.download_progress = {}
+
+        # Métricas (metrics.py). Las del kernel y el anillo se leen del receptor enlazado al escuchar.
+        self.metrics = ReceiverMetrics()
 
     def _setup_socket(self):
         try:
-            self.listen_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-            self.listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.listen_socket.bind(('', MULTICAST_PORT))
-            mreq = socket.inet_aton(MULTICAST_GROUP) + socket.inet_aton('0.0.0.0')
-            self.listen_socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
             self.nack_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             self.status_callback("Socket configurado. Esperando instrucciones...")
             return True
@@ -69,187 +106,270 @@ class Receiver:
             self.status_callback(f"Error al configurar socket: {e}")
             return False
 
+    def _open_session_socket(self, group, port):
+        """
+        Socket de datos unido solo al grupo de la sesión: el tráfico de otras sesiones lo descartan
+        la tarjeta y el kernel. Devuelve None si no se puede unir al grupo.
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            # Enlazado a la dirección del grupo no recibe los de otros sockets del equipo en el mismo puerto
+            # (Windows no lo permite: allí se enlaza a todas las direcciones).
+            sock.bind(('' if os.name == 'nt' else group, port))
+            mreq = socket.inet_aton(group) + socket.inet_aton('0.0.0.0')
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+            # Con espera limitada el hilo lector puede comprobar si debe terminar.
+            sock.settimeout(0.5)
+        except OSError as e:
+            sock.close()
+            self.status_callback(f"Error al unirse al grupo {group}:{port}: {e}")
+            return None
+        return sock
+
     def start_listening(self):
         if self._setup_socket():
             self.is_listening = True
+            self.ring = PacketRing(RING_SLOTS)
+            # Dos etapas: un hilo solo vacía los sockets en el anillo y otro procesa los paquetes.
             self.thread = threading.Thread(target=self._listen_loop, daemon=True)
+            self.worker_thread = threading.Thread(target=self._process_loop, daemon=True)
+            self.worker_thread.start()
             self.thread.start()
+            self.probe_responder = ProbeResponder()
+            if not self.probe_responder.start(): self.probe_responder = None
+            self.bind_metrics()
+
+    def bind_metrics(self):
+        """Publica en las métricas del registro los contadores de este receptor."""
+        global _metrics_receiver
+        _metrics_receiver = self
+
+    def unbind_metrics(self):
+        global _metrics_receiver
+        if _metrics_receiver is self: _metrics_receiver = None
+
+    def ring_stats(self):
+        """Ocupación del anillo de recepción (paquetes leídos pendientes de procesar)."""
+        return self.ring.stats() if self.ring else {}
 
     def stop_listening(self):
         self.is_listening = False
-        if self.listen_socket: self.listen_socket.close()
+        self.unbind_metrics()
+        with self.lock:
+            downloads, self.downloads = list(self.downloads.values()), {}
+            sockets, self.session_sockets = list(self.session_sockets.values()), {}
+        for sock in sockets: sock.close()
         if self.nack_socket: self.nack_socket.close()
-        self._cleanup_temp_file()
+        if self.probe_responder: self.probe_responder.stop()
+        # El hilo de procesado termina el paquete en curso antes de que se cierren los escritores.
+        if self.worker_thread and self.worker_thread is not threading.current_thread():
+            self.worker_thread.join(timeout=1.0)
+        while self.retired_downloads:
+            downloads.append(self.retired_downloads.popleft())
+        for download in downloads:
+            download.active = False
+            download.suspend()
         self.status_callback("Escucha detenida.")
 
+    def resume_request(self, session_info, destination_folder):
+        """
+        Campos que se añaden al handshake cuando ya tenemos parte del archivo: los bloques de una
+        descarga interrumpida del mismo archivo o, si no la hay, las firmas de los bloques de una
+        versión anterior con el mismo nombre. El emisor se salta los bloques que tienen todos los receptores.
+        """
+        state = load_resume_state(destination_folder, session_info.get('file_name'))
+        if not state: return self._delta_request(session_info, destination_folder)
+        try:
+            announced = {'file_name': session_info.get('file_name'), 'file_size': int(session_info.get('file_size', -1)),
+                         'file_mtime': int(session_info.get('file_mtime', -1)),
+                         'chunk_size': state['chunk_size'], 'block_size_packets': state['block_size_packets']}
+        except ValueError:
+            return {}
+        if not state_matches(state, announced): return self._delta_request(session_info, destination_folder)
+        return {'resume': {'chunk_size': state['chunk_size'], 'block_size_packets': state['block_size_packets'],
+                           'held_blocks': state.get('blocks', '')}}
+
+    def _delta_request(self, session_info, destination_folder):
+        """Firmas por bloque del archivo que ya está en la carpeta de destino, con la geometría del emisor."""
+        old_path = os.path.join(destination_folder, session_info.get('file_name') or '')
+        if not session_info.get('file_name') or not os.path.isfile(old_path): return {}
+        try:
+            chunk_size, block_size_packets = int(session_info['chunk_size']), int(session_info['block_size_packets'])
+        except (KeyError, ValueError):
+            return {}  # Emisor que no anuncia su geometría.
+        signatures = file_signatures(old_path, chunk_size * block_size_packets)
+        if signatures is None: return {}
+        logger.info("[RCV] Versión anterior encontrada: se enviarán las firmas de sus bloques para recibir solo los cambios.")
+        return {'delta': {'chunk_size': chunk_size, 'block_size_packets': block_size_packets, 'signatures': signatures}}
+
+
     def join_session(self, session_info, destination_folder):
-        self._cleanup_temp_file()
-        self.current_session_info.clear()
-        self.progress_callback(0, 0)
-        self.received_seqs_current_block.clear()
-        self.last_processed_block = -1
-        
-        self.joined_session_id = session_info['session_id']
-        self.sender_address = session_info['address']
-        self.current_session_info['destination_folder'] = destination_folder
-        self.status_callback(f"Uniéndose a la sesión {self.joined_session_id[:8]}...")
+        """
+        Empieza a descargar una sesión, además de las que ya estén en curso. Volver a unirse a
+        una sesión en curso la reinicia (conservando lo recibido para reanudar). Devuelve True si se unió.
+        """
+        endpoints = session_endpoints(session_info)
+        address = (endpoints['multicast_group'], endpoints['data_port'])
+        session_bytes = uuid.UUID(session_info['session_id']).bytes
+        with self.lock:
+            previous = self.downloads.get(session_bytes)
+            if all(download is previous for download in self.downloads.values()):
+                self.download_progress.clear()  # Sin otras descargas en curso empieza un lote nuevo.
+            sock = self._session_socket(address)
+            if sock is None: return False
+            download = SessionDownload(self, session_info, destination_folder, sock, endpoints)
+            # Sustituirla en la tabla la retira del reparto antes de cerrar su escritor.
+            self.downloads = {**self.downloads, session_bytes: download}
+            if previous:
+                previous.active = False
+                if self.is_listening: self.retired_downloads.append(previous)
+        if previous and not self.is_listening: previous.suspend()
 
+        download.progress_callback(0, 0)
+        download.status_callback(f"Uniéndose a la sesión {download.session_id[:8]}...")
+        return True
 
-    def _listen_loop(self):
-        while self.is_listening:
-            try:
-                data, _ = self.listen_socket.recvfrom(self.BUFFER_SIZE)
-                self._process_packet(data)
-            except socket.error:
-                if not self.is_listening: break
+    def _session_socket(self, address):
+        """Socket unido a (grupo, puerto), abriéndolo si ninguna sesión lo usa ya. Se llama con self.lock."""
+        sock = self.session_sockets.get(address) or self._open_session_socket(*address)
+        if sock is not None: self.session_sockets = {**self.session_sockets, address: sock}
+        return sock
 
-    def _process_packet(self, data):
+    def _listen_for_nacks(self, download):
+        """
+        Escucha también el puerto de NACK del grupo de la descarga, para oír los NACK de los demás
+        receptores. Devuelve la dirección a la que enviar los propios, o None si no se pudo.
+        """
+        address = (download.listen_address[0], download.sender_nack_port)
+        with self.lock:
+            if self.downloads.get(download.session_bytes) is not download: return None
+            return address if self._session_socket(address) else None
+
+    def is_joined(self, session_id):
+        """True si hay una descarga en curso de la sesión."""
         try:
-            packet = json.loads(data.decode('utf-8'))
-            session_id = packet.get('session_id')
-            if not session_id or session_id != self.joined_session_id: return
-
-            ptype = packet.get('type')
-            if ptype == 'metadata' and not self.output_file:
-                self._handle_metadata(packet)
-            elif ptype == 'block_end':
-                self._handle_block_end(packet)
-            elif ptype == 'eof':
-                print("[RCV] RECIBIDO EOF. Finalizando y verificando archivo.")
-                self._reassemble_file()
-                self.joined_session_id = None
-            elif ptype == 'cancel':
-                self.status_callback("La transmisión fue cancelada por el emisor.")
-                self._cleanup_temp_file()
-                self.joined_session_id = None
-                self.completion_callback(status="cancelled")
-        
-        except (json.JSONDecodeError, UnicodeDecodeError):
-            if not self.output_file: return
-            if uuid.UUID(bytes=data[:16]) != uuid.UUID(self.joined_session_id): return
-            
-            seq_num = int.from_bytes(data[16:20], 'big')
-            self.output_file.seek(seq_num * self.CHUNK_SIZE)
-            self.output_file.write(data[20:])
-            self.received_seqs_current_block.add(seq_num)
-    
-    def _handle_block_end(self, packet):
-        block_idx = packet['block_index']
-        
-        if block_idx <= self.last_processed_block: 
-            return
-            
-        print(f"\n[RCV] RECIBIDO FIN_DE_BLOQUE para el bloque {block_idx}.")
-        
-        if block_idx > self.last_processed_block + 1:
-            print(f"[RCV] ADVERTENCIA: Se saltó del bloque {self.last_processed_block} al {block_idx}. ¡El paquete 'fin de bloque' anterior probablemente se perdió!")
+            return uuid.UUID(session_id).bytes in self.downloads
+        except (TypeError, ValueError):
+            return False
 
+    def _leave_session(self, download):
+        """Quita la descarga de la tabla y suelta los sockets de grupos que ya no usa nadie."""
+        with self.lock:
+            if self.downloads.get(download.session_bytes) is download:
+                self.downloads = {key: other for key, other in self.downloads.items() if other is not download}
+            in_use = {address for other in self.downloads.values() for address in (other.listen_address, other.nack_address)}
+            # El hilo lector cierra los sockets que desaparecen del diccionario.
+            self.session_sockets = {address: sock for address, sock in self.session_sockets.items() if address in in_use}
 
-        block_size = self.current_session_info['block_size_packets']
-        total_chunks = self.current_session_info['total_chunks']
-        start_seq, end_seq = block_idx * block_size, min((block_idx + 1) * block_size, total_chunks)
-        
-        expected_seqs = set(range(start_seq, end_seq))
-        missing_seqs = list(expected_seqs - self.received_seqs_current_block)
+    def _report_progress(self, download, bytes_completed, total_bytes):
+        with self.lock:
+            self.download_progress[download.session_id] = (bytes_completed, total_bytes)
+            progress = list(self.download_progress.values())
+        self.progress_callback(sum(done for done, _ in progress), sum(total for _, total in progress))
+
+    def _report_status(self, download, message):
+        # Con varias descargas a la vez cada mensaje indica de qué sesión es.
+        if len(self.downloads) > 1: message = f"[{download.session_name}] {message}"
+        self.status_callback(message)
+
+    def _report_completion(self, download, status):
+        self.completion_callback(status=status, session_id=download.session_id)
+
+    def _listen_loop(self):
+        """
+        Etapa lectora: solo mueve datagramas de los sockets de los grupos unidos a huecos libres
+        del anillo. Con un solo grupo espera directamente en su socket; con varios, en un selector.
+        """
+        ring = self.ring
+        metrics = self.metrics
+        selector = selectors.DefaultSelector()
+        sockets, readers = {}, {}
+        while self.is_listening:
+            if self.session_sockets is not sockets:
+                # Cambió la tabla: se registran los sockets nuevos y se cierran desde este hilo los que sobran.
+                sockets = self.session_sockets
+                for address, (sock, batch) in list(readers.items()):
+                    if sockets.get(address) is sock: continue
+                    try: selector.unregister(sock)
+                    except (KeyError, ValueError): pass
+                    if batch: batch.close()
+                    sock.close()
+                    del readers[address]
+                for address, sock in sockets.items():
+                    if address in readers: continue
+                    batch = open_batch_receiver(sock, ring.buffer, ring.slot_size, RECV_BATCH_SIZE) if self.BATCH_IO else None
+                    readers[address] = (sock, batch)
+                    selector.register(sock, selectors.EVENT_READ, readers[address])
+            if not readers:
+                time.sleep(0.1)
+                continue
+            if len(readers) == 1:
+                ready, wait_ms = list(readers.values()), 500
+            else:
+                try:
+                    ready, wait_ms = [key.data for key, _ in selector.select(timeout=0.5)], 0
+                except (OSError, ValueError):
+                    continue  # Un socket se cerró mientras se esperaba: se rehace el registro.
+            for sock, batch in ready:
+                slots = ring.acquire(RECV_BATCH_SIZE if batch else 1, timeout=0.5)
+                if not slots: continue
+                try:
+                    if batch:
+                        lengths = batch.recv(slots, wait_ms)
+                    else:
+                        lengths = [sock.recv_into(ring.slot_view(slots[0]))]
+                except socket.timeout:
+                    lengths = []
+                except socket.error:
+                    lengths = []
+                if lengths:
+                    metrics.packets_received.inc(len(lengths))
+                    metrics.bytes_received.inc(sum(lengths))
+                for slot, length in zip(slots, lengths):
+                    ring.publish(slot, length)
+                for slot in slots[len(lengths):]:
+                    ring.release(slot)
+                ring.publish_done()
+        for sock, batch in readers.values():
+            if batch: batch.close()
+        selector.close()
 
-        if missing_seqs:
-            print(f"[RCV] Bloque {block_idx}: Faltan {len(missing_seqs)} paquetes. Enviando NACK. (Ej: {missing_seqs[:5]})")
-            nack_packet = {"session_id": self.joined_session_id, "block_index": block_idx, "missing_seqs": missing_seqs}
+    def _process_loop(self):
+        """
+        Etapa de procesado: entrega cada paquete del anillo a la descarga de su sesión.
+        Las vistas apuntan a huecos que se reutilizan: lo que se guarde debe copiarse.
+        """
+        ring = self.ring
+        while self.is_listening:
+            packet = ring.next_packet(timeout=self._run_timers())
+            if packet is None: continue
+            slot, data = packet
             try:
-                self.nack_socket.sendto(json.dumps(nack_packet).encode('utf-8'), (self.sender_address, NACK_PORT))
+                self._process_packet(data)
             except Exception as e:
-                print(f"[RCV] Error enviando NACK: {e}")
-        else:
-            print(f"[RCV] Bloque {block_idx} completo y verificado. No se necesita NACK.")
-            self.last_processed_block = block_idx
-            self.received_seqs_current_block.clear()
-            
-            total_bytes = self.current_session_info['file_size']
-            bytes_processed = min((block_idx + 1) * block_size * self.CHUNK_SIZE, total_bytes)
-            self.progress_callback(bytes_processed, total_bytes)
-
-            self.status_callback(f"Bloque {block_idx + 1} recibido correctamente.")
-
-    def _handle_metadata(self, packet):
-        self.current_session_info.update(packet)
-        
-        original_chunk_size = self.CHUNK_SIZE
-        self.CHUNK_SIZE = self.current_session_info.get('chunk_size', self.CHUNK_SIZE)
-        
-        # --- NUEVO: Imprimir la configuración recibida del emisor ---
-        print("\n--- [RECEIVER] Configuración de Red Recibida del Emisor ---")
-        if self.CHUNK_SIZE != original_chunk_size:
-            print(f"  - CHUNK_SIZE: {self.CHUNK_SIZE} bytes (Cambiado desde {original_chunk_size})")
-        else:
-            print(f"  - CHUNK_SIZE: {self.CHUNK_SIZE} bytes (Coincide con el local)")
-        
-        print(f"  - BLOCK_SIZE_PACKETS: {self.current_session_info.get('block_size_packets')}")
-        print(f"  - REPAIR_ROUNDS: {self.current_session_info.get('repair_rounds')}")
-        print(f"  - NACK_LISTEN_TIMEOUT: {self.current_session_info.get('nack_listen_timeout')}")
-        print("-----------------------------------------------------------\n")
+                logger.error("[RCV] Error procesando paquete: %s", e)
+            finally:
+                ring.release(slot)
 
-        self.temp_file_path = os.path.join(self.current_session_info['destination_folder'], f".{self.current_session_info['file_name']}.pycast-tmp")
-        try:
-            self.output_file = open(self.temp_file_path, "wb")
-            if self.current_session_info.get('file_size', 0) > 0:
-                self.output_file.truncate(self.current_session_info['file_size'])
-            self.status_callback(f"Descargando: {self.current_session_info['session_name']}")
-        except IOError as e:
-            self.status_callback(f"Error al crear archivo temporal: {e}")
-            self._cleanup_temp_file()
-
-    def _reassemble_file(self):
-        output_path = None
-        try:
-            if self.output_file:
-                 self.output_file.close()
-                 self.output_file = None
-            
-            output_path = os.path.join(self.current_session_info['destination_folder'], self.current_session_info['file_name'])
-            shutil.move(self.temp_file_path, output_path)
-            
-            if not os.path.exists(output_path):
-                self.status_callback("Error CRÍTICO: El archivo no se pudo guardar.")
-                return
-
-            self.status_callback("Verificando integridad del archivo...")
-            expected_crc = self.current_session_info.get('file_crc32')
-            expected_size = self.current_session_info.get('file_size')
-
-            if expected_crc is None:
-                self.status_callback(f"Archivo '{self.current_session_info['file_name']}' descargado. (Sin verificación CRC)")
-                self.completion_callback(status="completed")
-                return
-
-            received_crc = _calculate_file_crc32(output_path)
-            received_size = os.path.getsize(output_path)
-
-            if received_size == expected_size and received_crc == expected_crc:
-                self.status_callback(f"Archivo '{self.current_session_info['file_name']}' descargado y verificado con éxito.")
-                total_bytes = self.current_session_info.get('file_size', 1)
-                self.progress_callback(total_bytes, total_bytes)
-                self.completion_callback(status="completed")
-            else:
-                print(f"[RCV] ¡FALLO DE VERIFICACIÓN! Esperado: (size={expected_size}, crc={expected_crc}), Recibido: (size={received_size}, crc={received_crc})")
-                self.status_callback("¡ERROR! El archivo está corrupto. Eliminando...")
-                os.remove(output_path) 
-                self.completion_callback(status="failed_verification")
+    def _process_packet(self, data):
+        # Lo que no es de ninguna sesión unida se descarta mirando solo la cabecera.
+        if len(data) < HEADER_SIZE or data[:2] != PACKET_MAGIC: return
+        download = self.downloads.get(bytes(data[SESSION_ID_SLICE]))
+        if download: download.process_packet(data)
 
-        except Exception as e:
-            self.status_callback(f"Error al finalizar la descarga: {e}")
-            if output_path and os.path.exists(output_path):
-                try: os.remove(output_path)
-                except: pass
-        finally:
-            self._cleanup_temp_file()
-
-
-    def _cleanup_temp_file(self):
-        if self.output_file:
-            try: self.output_file.close()
-            except: pass
-            self.output_file = None
-        if self.temp_file_path and os.path.exists(self.temp_file_path):
-            try: os.remove(self.temp_file_path)
-            except: pass
-            self.temp_file_path = None
+    def _run_timers(self):
+        """
+        Envía los NACK aplazados que han vencido y cierra las descargas cuyo emisor dejó de enviar
+        EOF durante la reparación final. Devuelve cuánto esperar como mucho al siguiente paquete.
+        """
+        while self.retired_downloads:
+            self.retired_downloads.popleft().suspend()
+        now = time.monotonic()
+        wait = 0.5
+        for download in self.downloads.values():
+            deadlines = [download.check_eof_deadline(now)]
+            if download.pending_nacks: deadlines.append(download.flush_nacks(now))
+            for deadline in deadlines:
+                if deadline is not None: wait = min(wait, max(0.0, deadline - now))
+        return wait
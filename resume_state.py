@@ -0,0 +1,71 @@
+# resume_state.py
+"""
+Estado persistente de una descarga interrumpida.
+
+Junto al archivo temporal `.<nombre>.pycast-tmp` se guarda `.<nombre>.pycast-state`, un JSON
+con la identidad del archivo (nombre, tamaño, fecha de modificación y CRC si se conoce), la
+geometría de la transmisión y un mapa de bits de los bloques ya recibidos y verificados,
+junto con el CRC de cada uno para poder completar la verificación incremental al reanudar.
+"""
+import base64
+import json
+import os
+
+STATE_SUFFIX = ".pycast-state"
+
+# Campos que deben coincidir entre el estado guardado y los metadatos del emisor.
+_IDENTITY_KEYS = ('file_name', 'file_size', 'file_mtime', 'chunk_size', 'block_size_packets')
+
+def state_path(folder, file_name):
+    return os.path.join(folder, f".{file_name}{STATE_SUFFIX}")
+
+def encode_block_bitmap(blocks, total_blocks):
+    bitmap = bytearray((total_blocks + 7) // 8)
+    for block_idx in blocks:
+        if 0 <= block_idx < total_blocks:
+            bitmap[block_idx >> 3] |= 0x80 >> (block_idx & 7)
+    return base64.b64encode(bytes(bitmap)).decode('ascii')
+
+def decode_block_bitmap(encoded):
+    try:
+        bitmap = base64.b64decode(encoded)
+    except (ValueError, TypeError):
+        return set()
+    return {byte_idx * 8 + bit for byte_idx, byte in enumerate(bitmap) if byte
+            for bit in range(8) if byte & (0x80 >> bit)}
+
+def load_resume_state(folder, file_name):
+    """Devuelve el estado guardado para `file_name` en `folder`, o None si no hay uno válido."""
+    if not file_name:
+        return None
+    try:
+        with open(state_path(folder, file_name), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if isinstance(state, dict) and all(k in state for k in _IDENTITY_KEYS) else None
+
+def save_resume_state(folder, state):
+    """Escribe el estado de forma atómica (archivo auxiliar + os.replace)."""
+    path = state_path(folder, state['file_name'])
+    tmp_path = path + ".new"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def remove_resume_state(folder, file_name):
+    try:
+        os.remove(state_path(folder, file_name))
+    except OSError:
+        pass
+
+def state_matches(state, metadata):
+    """True si el estado guardado corresponde al mismo contenido y geometría que anuncia el emisor."""
+    if any(state.get(k) != metadata.get(k) for k in _IDENTITY_KEYS):
+        return False
+    # El CRC del archivo y el del manifiesto (envío de varios archivos) solo se comparan si ambos se conocen.
+    for key in ('file_crc32', 'manifest_crc32'):
+        saved, announced = state.get(key), metadata.get(key)
+        if saved is not None and announced is not None and saved != announced:
+            return False
+    return True
@@ -1,4 +1,5 @@
 # sender.py
+import logging
 import socket
 import threading
 import os
@@ -6,31 +7,92 @@ import json
 import uuid
 import time
 import zlib
+import mmap
+import math
+from contextlib import contextmanager, nullcontext
 from service_discovery import ServiceAnnouncer
+from pacing import TokenBucketPacer, AimdRateController
+from fec import ParityEncoder, encode_parity_seq
+from batch_io import open_batch_sender, use_batch_io
+from checksum import crc32_combine, compute_file_crc32
+from resume_state import decode_block_bitmap
+from delta_sync import block_signature, decode_signatures
+from fountain import FountainEncoder
+from compression import AdaptiveCompressor, codec_available
+from session_endpoints import allocate_session_endpoints
+from metrics import SenderMetrics
+from file_set import scan_paths, file_set_label, file_set_crc32, open_file_set_source
+from protocol import (decode_nack, nack_receiver_id, parse_ack_packet, RECEIVER_ID_SIZE, TYPE_OFFSET, PKT_ACK, pack_header, pack_symbol_header, FLAG_LOCAL_BLOCK, SYMBOL_ID_SIZE, build_metadata_packet, build_manifest_packets, build_block_end_packet, build_eof_packet, PROTOCOL_VERSION,
+                      HEADER_SIZE, MAX_CHUNK_SIZE, PKT_DATA, PKT_PARITY, PKT_CANCEL)
+
+logger = logging.getLogger(__name__)
 
 # --- Constantes de Red (solo las que no son configurables) ---
-MULTICAST_GROUP = '239.192.1.100'
-MULTICAST_PORT = 5007
+# El grupo multicast y los puertos se asignan por sesión (ver session_endpoints.py).
 MULTICAST_TTL = 1
-HANDSHAKE_PORT = 5008
-NACK_PORT = 5009
 
-def _calculate_file_crc32(file_path):
-    """Calcula el checksum CRC32 de un archivo leyéndolo en trozos."""
-    crc_value = 0
-    with open(file_path, 'rb') as f:
-        while chunk := f.read(65536):  # Leer en trozos de 64KB
-            crc_value = zlib.crc32(chunk, crc_value)
-    return crc_value
+# Modo carrusel: símbolos de reparación por bloque y pasada, como fracción de los trozos del bloque.
+CAROUSEL_REPAIR_FRACTION = 0.2
+
+# Bloques seguidos que un miembro del lobby puede cerrar sin confirmar antes de que se deje de esperar su ACK.
+ACK_QUIET_BLOCKS = 8
+
+# Tasa máxima del control adaptativo cuando no hay tasa objetivo (0 = sin límite), en Mbps.
+ADAPTIVE_RATE_CEILING_MBPS = 10_000
+# Mientras la tasa sube, el estado muestra la tasa actual como mucho una vez por este intervalo (s).
+RATE_STATUS_INTERVAL = 1.0
+
+# sendmsg permite enviar cabecera y datos como búferes separados sin concatenarlos (no existe en Windows).
+_HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+def _recv_json(conn, max_bytes=1 << 20):
+    """
+    Lee la petición JSON del handshake. Los clientes la terminan con un salto de línea (puede
+    ocupar varios segmentos TCP si lleva el mapa de bloques para reanudar); para clientes que no
+    lo envían basta con que lo recibido ya sea un JSON completo.
+    """
+    data = b''
+    while len(data) < max_bytes:
+        part = conn.recv(65536)
+        if not part: break
+        data += part
+        if data.endswith(b'\n'): break
+        try:
+            return json.loads(data.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+    return json.loads(data.decode('utf-8'))
+
+@contextmanager
+def _map_file(f, file_size, writable=False):
+    """
+    Mapea el archivo en memoria y devuelve un memoryview sobre él. Con `writable` se mapea
+    copia-en-escritura (nunca se escribe): ctypes necesita un búfer escribible para obtener
+    la dirección de los datos en la E/S por lotes.
+    """
+    access = mmap.ACCESS_COPY if writable else mmap.ACCESS_READ
+    mapping = mmap.mmap(f.fileno(), 0, access=access) if file_size else None
+    view = memoryview(mapping) if mapping else memoryview(b'')
+    try:
+        yield view
+    finally:
+        view.release()
+        if mapping: mapping.close()
 
 class Sender:
     def __init__(self, file_path, session_name, config, progress_callback, status_callback, 
                  client_connected_callback=None, client_disconnected_callback=None):
-        self.file_path = file_path
+        # `file_path` puede ser una ruta o una lista de archivos y carpetas. Con más de un archivo
+        # (o una carpeta) se envía un conjunto: un solo flujo de bytes más un manifiesto.
+        self.paths = [file_path] if isinstance(file_path, (str, os.PathLike)) else list(file_path)
+        self.file_path = self.paths[0] if self.paths else ""
+        self.manifest = None
+        self.manifest_sources = []
         self.session_name = session_name
         self.config = config
         self.username = config.get('username')
         self.session_id = str(uuid.uuid4())
+        self.session_id_bytes = uuid.UUID(self.session_id).bytes
         
         self.progress_callback = progress_callback
         self.status_callback = status_callback
@@ -38,22 +100,54 @@ class Sender:
         self.client_disconnected_callback = client_disconnected_callback
         
         net_conf = self.config.get('network_settings')
-        self.CHUNK_SIZE = net_conf.get('chunk_size', 8192)
+        self.CHUNK_SIZE = min(net_conf.get('chunk_size', 8192), MAX_CHUNK_SIZE)
         self.BLOCK_SIZE_PACKETS = net_conf.get('block_size_packets', 256)
         self.REPAIR_ROUNDS = net_conf.get('repair_rounds', 5)
         self.NACK_LISTEN_TIMEOUT = net_conf.get('nack_listen_timeout', 0.2)
+        # Espera aleatoria máxima de los receptores antes de pedir (deben llegar dentro de la escucha).
+        self.NACK_BACKOFF = min(max(0, net_conf.get('nack_backoff_ms', 40)) / 1000, self.NACK_LISTEN_TIMEOUT / 2)
+        self.TARGET_BITRATE = net_conf.get('target_bitrate', 0)  # Mbps, 0 = sin límite
+        self.MAX_BURST = net_conf.get('max_burst', 16)  # paquetes
+        self.FEC_PARITY_PACKETS = net_conf.get('fec_parity_packets', 0)  # por bloque, 0 = sin FEC
+        self.WINDOW_BLOCKS = max(1, net_conf.get('window_blocks', 1))  # bloques en vuelo, 1 = parada y espera
+        self.STREAM_CHECKSUM = bool(net_conf.get('stream_checksum', 1))  # CRC durante el envío, enviado en el EOF
+        self.IO_BACKEND = net_conf.get('io_backend', 'auto')  # standard / mmsg / auto
+        self.ADAPTIVE_RATE = bool(net_conf.get('adaptive_rate', 1))  # tasa ajustada por las pérdidas (AIMD)
+        self.START_BITRATE = net_conf.get('start_bitrate', 100.0)  # Mbps, inicio del control adaptativo sin tasa objetivo
+        self.BATCH_IO = use_batch_io(self.IO_BACKEND)
+        self.batch_sender = None
+        self.COMPRESSION = net_conf.get('compression', 'off')  # off / zlib / lz4
+        if self.COMPRESSION != 'off' and not codec_available(self.COMPRESSION):
+            logger.warning("[SND] El códec '%s' no está instalado; se usará 'zlib'.", self.COMPRESSION)
+            self.COMPRESSION = 'zlib'
+        self.compressor = None
 
         # --- NUEVO: Imprimir configuración al inicio ---
-        print("\n--- [SENDER] Configuración de Red Inicial ---")
-        print(f"  - CHUNK_SIZE: {self.CHUNK_SIZE} bytes")
-        print(f"  - BLOCK_SIZE_PACKETS: {self.BLOCK_SIZE_PACKETS} paquetes")
-        print(f"  - REPAIR_ROUNDS: {self.REPAIR_ROUNDS} rondas")
-        print(f"  - NACK_LISTEN_TIMEOUT: {self.NACK_LISTEN_TIMEOUT} segundos")
-        print("-------------------------------------------\n")
+        logger.info("--- [SENDER] Configuración de Red Inicial ---\n%s", "\n".join([
+            f"  - CHUNK_SIZE: {self.CHUNK_SIZE} bytes",
+            f"  - BLOCK_SIZE_PACKETS: {self.BLOCK_SIZE_PACKETS} paquetes",
+            f"  - REPAIR_ROUNDS: {self.REPAIR_ROUNDS} rondas",
+            f"  - NACK_LISTEN_TIMEOUT: {self.NACK_LISTEN_TIMEOUT} segundos",
+            f"  - NACK_BACKOFF: hasta {self.NACK_BACKOFF * 1000:.0f} ms (NACKs por multicast con supresión)",
+            f"  - TARGET_BITRATE: {self.TARGET_BITRATE or 'sin límite'} Mbps",
+            f"  - MAX_BURST: {self.MAX_BURST} paquetes",
+            f"  - FEC_PARITY_PACKETS: {self.FEC_PARITY_PACKETS} por bloque",
+            f"  - WINDOW_BLOCKS: {self.WINDOW_BLOCKS} bloques en vuelo",
+            f"  - IO_BACKEND: {self.IO_BACKEND} ({'sendmmsg' if self.BATCH_IO else 'sendto'})",
+            f"  - STREAM_CHECKSUM: {'sí' if self.STREAM_CHECKSUM else 'no'}",
+            f"  - ADAPTIVE_RATE: {'sí (la tasa objetivo es el máximo)' if self.ADAPTIVE_RATE else 'no'}",
+            f"  - COMPRESSION: {self.COMPRESSION}",
+            "-------------------------------------------"]))
 
         self.is_active = False
         self.transmission_started = False
         self.multiclient_mode = False
+        self.carousel_mode = False
+        # Grupo y puertos de la sesión, asignados en start_session.
+        self.endpoints = None
+        self.multicast_address = None
+        self.handshake_port = None
+        self.nack_port = None
         
         self.session_thread = None
         self.service_announcer = None
@@ -62,12 +156,47 @@ class Sender:
         self.clients_lock = threading.Lock()
         
         self.transmission_start_event = threading.Event()
+        self.stream_crc32 = 0
+        self.block_crcs = {}
+        # Lo que cada receptor ya tiene (de una descarga interrumpida o de una versión anterior
+        # del archivo): los bloques que tienen todos no se envían.
+        self.receiver_holdings = []
+        # Receptores cuyos ACK de bloque se esperan {receiver_id: nombre}, fijados al empezar la
+        # transmisión (None si alguno no los envía) y bloques seguidos que cada uno lleva sin confirmar.
+        self.ack_members = None
+        self.ack_quiet_blocks = {}
+        # Métricas de envío (metrics.py), compartidas por todas las sesiones del proceso.
+        self.metrics = SenderMetrics()
+        # Última vez que se mostró la tasa del control adaptativo en el estado.
+        self.rate_status_time = 0.0
 
-    def start_session(self, multiclient=False):
-        if not os.path.exists(self.file_path):
+    def start_session(self, multiclient=False, carousel=False):
+        if not self.paths or not all(os.path.exists(path) for path in self.paths):
             self.status_callback("Error: El archivo no existe.")
             return
+        if len(self.paths) > 1 or os.path.isdir(self.file_path):
+            try:
+                self.manifest, self.manifest_sources = scan_paths(self.paths)
+            except (OSError, ValueError) as e:
+                self.status_callback(f"Error al preparar los archivos: {e}")
+                return
+            logger.info("[SND] Conjunto de %s archivos y %s carpetas vacías.", len(self.manifest['files']), len(self.manifest['dirs']))
+        try:
+            self.endpoints = allocate_session_endpoints(self.config.get('network_settings', {}))
+        except ValueError as e:
+            self.status_callback(f"Error al asignar grupo y puertos de la sesión: {e}")
+            return
+        self.multicast_address = (self.endpoints['multicast_group'], self.endpoints['data_port'])
+        self.handshake_port = self.endpoints['handshake_port']
+        self.nack_port = self.endpoints['nack_port']
+        logger.info("[SND] Sesión en el grupo %s:%s (handshake TCP %s, NACK UDP %s).", self.multicast_address[0], self.multicast_address[1], self.handshake_port, self.nack_port)
         self.multiclient_mode = multiclient
+        self.carousel_mode = carousel
+        if carousel:
+            # El símbolo lleva su identificador delante de los datos y no se comprime.
+            self.CHUNK_SIZE = min(self.CHUNK_SIZE, MAX_CHUNK_SIZE - SYMBOL_ID_SIZE)
+            self.COMPRESSION = 'off'
+            self.FEC_PARITY_PACKETS = 0  # La reparación la hacen los símbolos del código fuente.
         self.is_active = True
         self.session_thread = threading.Thread(target=self._session_lifecycle)
         self.session_thread.daemon = True
@@ -79,33 +208,57 @@ class Sender:
         self.transmission_started = False
         self.transmission_start_event.set()
         
-        if was_active: self._send_cancellation_message()
+        if was_active and self.multicast_address: self._send_cancellation_message()
         if self.service_announcer: self.service_announcer.stop()
 
         if self.handshake_socket:
             try:
-                socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect(('127.0.0.1', HANDSHAKE_PORT))
+                socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect(('127.0.0.1', self.handshake_port))
             except socket.error: pass
             finally: self.handshake_socket.close()
         
         self.status_callback("Sesión cancelada.")
 
     def _send_cancellation_message(self):
-        cancel_packet = {"type": "cancel", "session_id": self.session_id}
+        cancel_packet = pack_header(PKT_CANCEL, self.session_id_bytes)
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP) as sock:
                 sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, MULTICAST_TTL)
                 for _ in range(3): 
-                    sock.sendto(json.dumps(cancel_packet).encode('utf-8'), (MULTICAST_GROUP, MULTICAST_PORT))
+                    sock.sendto(cancel_packet, self.multicast_address)
                     time.sleep(0.02)
         except Exception as e:
-            print(f"Error enviando mensaje de cancelación: {e}")
+            logger.warning("Error enviando mensaje de cancelación: %s", e)
+
+    def _file_identity(self):
+        """Nombre, tamaño y fecha de lo que se envía (de un conjunto: la suma y la fecha más reciente)."""
+        if self.manifest is None:
+            file_stat = os.stat(self.file_path)
+            return {'file_name': os.path.basename(self.file_path), 'file_size': file_stat.st_size, 'file_mtime': int(file_stat.st_mtime)}
+        files = self.manifest['files']
+        return {'file_name': file_set_label(self.paths), 'file_size': sum(size for _, size, _ in files),
+                'file_mtime': max((mtime for _, _, mtime in files), default=0)}
+
+    @contextmanager
+    def _open_source(self, file_size):
+        """Datos a enviar: el archivo mapeado en memoria o el espacio lógico del conjunto de archivos."""
+        if self.manifest is not None:
+            with open_file_set_source(self.manifest_sources, [size for _, size, _ in self.manifest['files']]) as source:
+                yield source
+            return
+        with open(self.file_path, 'rb') as f, _map_file(f, file_size, self.BATCH_IO) as source:
+            yield source
 
     def _session_lifecycle(self):
-        self.service_announcer = ServiceAnnouncer(self.session_id, self.session_name, HANDSHAKE_PORT, self.username)
+        file_identity = self._file_identity()
+        # La geometría se anuncia para que los receptores con una versión anterior calculen sus firmas por bloque.
+        announced = dict(file_identity, chunk_size=self.CHUNK_SIZE, block_size_packets=self.BLOCK_SIZE_PACKETS, **self.endpoints)
+        if self.carousel_mode: announced['status'] = 'carousel'
+        self.service_announcer = ServiceAnnouncer(self.session_id, self.session_name, self.handshake_port, self.username, announced)
         self.service_announcer.start()
         
-        if self.multiclient_mode: self._run_multiclient_lobby()
+        if self.carousel_mode: self._run_carousel_session()
+        elif self.multiclient_mode: self._run_multiclient_lobby()
         else: self._run_single_client_session()
         
         if self.service_announcer: self.service_announcer.stop()
@@ -119,15 +272,48 @@ class Sender:
         if self.is_active and receiver_info:
             self.service_announcer.update_status('busy')
             self.status_callback(f"Conectado con '{receiver_info.get('username', 'un receptor')}'. Iniciando envío...")
+            self.receiver_holdings = [self._holdings(receiver_info)]
+            self._set_ack_members([receiver_info])
             self.transmission_started = True
             self._transmit_file()
 
+    def _run_carousel_session(self):
+        """Carrusel: se emite desde ya y cualquier receptor puede unirse en cualquier momento."""
+        self.status_callback("Carrusel en marcha. Los receptores pueden unirse cuando quieran.")
+        acceptor = threading.Thread(target=self._accept_carousel_receivers); acceptor.daemon = True
+        acceptor.start()
+        self.transmission_started = True
+        self._transmit_file()
+
+    def _accept_carousel_receivers(self):
+        """Responde a los handshakes para que los receptores sepan que basta con escuchar."""
+        self.handshake_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.handshake_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            self.handshake_socket.bind(('', self.handshake_port))
+            self.handshake_socket.listen()
+            while self.is_active:
+                conn, addr = self.handshake_socket.accept()
+                with conn:
+                    if not self.is_active: break
+                    try:
+                        conn.settimeout(5)
+                        request = _recv_json(conn)
+                        if request.get('session_id') != self.session_id: continue
+                        conn.sendall(b'ACK_CAROUSEL')
+                        logger.info("[SND] '%s' se une al carrusel.", request.get('username', addr[0]))
+                    except (json.JSONDecodeError, OSError) as e:
+                        logger.warning("Error de conexión en el carrusel con %s: %s", addr, e)
+        except socket.error: pass
+        finally:
+            if self.handshake_socket: self.handshake_socket.close()
+
     def _run_multiclient_lobby(self):
         self.transmission_start_event.clear()
         self.handshake_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.handshake_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         try:
-            self.handshake_socket.bind(('', HANDSHAKE_PORT))
+            self.handshake_socket.bind(('', self.handshake_port))
             self.handshake_socket.listen()
             self.status_callback("Lobby abierto. Esperando conexiones...")
             while self.is_active and not self.transmission_started:
@@ -145,14 +331,15 @@ class Sender:
     def _handle_client_connection(self, conn, addr):
         client_id = str(uuid.uuid4())
         try:
-            request = json.loads(conn.recv(1024).decode('utf-8'))
+            request = _recv_json(conn)
             if request.get('session_id') != self.session_id: return
 
             conn.sendall(b'ACK_MULTI')
             username = request.get('username', f'Cliente {addr[0]}')
             
             with self.clients_lock:
-                self.connected_clients[client_id] = {'username': username}
+                self.connected_clients[client_id] = {'username': username, 'holdings': self._holdings(request),
+                                                     'receiver_id': request.get('receiver_id')}
             
             if self.client_connected_callback:
                 self.client_connected_callback(client_id, username)
@@ -165,7 +352,7 @@ class Sender:
                 except OSError: pass
         
         except (json.JSONDecodeError, OSError, ConnectionResetError) as e:
-            print(f"Error de conexión en el lobby con {addr}: {e}")
+            logger.warning("Error de conexión en el lobby con %s: %s", addr, e)
         
         finally:
             try: conn.close()
@@ -180,20 +367,70 @@ class Sender:
         self.transmission_started = True
         if self.service_announcer: self.service_announcer.update_status('busy')
         self.status_callback("Cerrando lobby e iniciando transmisión...")
+        with self.clients_lock:
+            self.receiver_holdings = [client['holdings'] for client in self.connected_clients.values()]
+            self._set_ack_members(list(self.connected_clients.values()))
         self.transmission_start_event.set()
         time.sleep(0.5) 
         self._transmit_file()
 
+    def _set_ack_members(self, members):
+        """
+        Fija los receptores cuyos ACK de bloque se esperan, a partir de su handshake. Si alguno no
+        envía identificador (versión anterior) no se usan los ACK: se espera siempre el tiempo de escucha.
+        """
+        ack_members = {}
+        for member in members:
+            try:
+                receiver_id = bytes.fromhex(member.get('receiver_id') or '')
+            except ValueError:
+                receiver_id = b''
+            if len(receiver_id) != RECEIVER_ID_SIZE:
+                logger.info("[SND] Algún receptor no envía ACKs de bloque: se esperará siempre el tiempo de escucha de NACKs.")
+                self.ack_members = None
+                return
+            ack_members[receiver_id] = member.get('username', receiver_id.hex())
+        self.ack_members = ack_members or None
+        self.ack_quiet_blocks = {}
+
+    def _holdings(self, request):
+        """
+        Lo que el receptor ya tiene según su handshake: bloques de una descarga interrumpida y
+        firmas de los bloques de una versión anterior del archivo (se ignoran si su geometría no coincide).
+        """
+        holdings = {'held_blocks': set(), 'signatures': []}
+        for key in ('resume', 'delta'):
+            info = request.get(key)
+            if not isinstance(info, dict): continue
+            if info.get('chunk_size') != self.CHUNK_SIZE or info.get('block_size_packets') != self.BLOCK_SIZE_PACKETS: continue
+            if key == 'resume':
+                holdings['held_blocks'] = decode_block_bitmap(info.get('held_blocks', ''))
+            elif self.manifest is None:  # Un conjunto de archivos no tiene una versión anterior única.
+                holdings['signatures'] = decode_signatures(info.get('signatures', ''))
+        return holdings
+
+    def _receivers_hold(self, source, block_idx):
+        """True si todos los receptores tienen ya el bloque, por reanudación o por firma coincidente."""
+        if not self.receiver_holdings: return False
+        signature = None
+        for holdings in self.receiver_holdings:
+            if block_idx in holdings['held_blocks']: continue
+            if block_idx >= len(holdings['signatures']): return False
+            if signature is None:
+                signature = block_signature(self._block_view(source, block_idx))
+            if holdings['signatures'][block_idx] != signature: return False
+        return True
+
     def _listen_for_single_handshake(self):
         self.handshake_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.handshake_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         try:
-            self.handshake_socket.bind(('', HANDSHAKE_PORT))
+            self.handshake_socket.bind(('', self.handshake_port))
             self.handshake_socket.listen(1)
             conn, _ = self.handshake_socket.accept()
             with conn:
                 if not self.is_active: return None
-                request = json.loads(conn.recv(1024).decode('utf-8'))
+                request = _recv_json(conn)
                 conn.sendall(b'ACK_SINGLE')
                 if request.get('session_id') == self.session_id: return request
             return None
@@ -202,119 +439,455 @@ class Sender:
             if self.handshake_socket: self.handshake_socket.close()
 
 
+    def _open_nack_socket(self):
+        """
+        Socket de NACKs: recibe los que llegan por unicast (receptores antiguos) y, unido al grupo
+        de la sesión, los que los receptores envían por multicast para que los oigan los demás.
+        """
+        nack_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Un receptor en este mismo equipo escucha también el puerto de NACK del grupo.
+        nack_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        nack_socket.bind(('', self.nack_port))
+        try:
+            mreq = socket.inet_aton(self.multicast_address[0]) + socket.inet_aton('0.0.0.0')
+            nack_socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        except OSError as e:
+            logger.warning("[SND] No se pudo unir al grupo para recibir NACKs por multicast: %s", e)
+        nack_socket.setblocking(False)
+        return nack_socket
+
     def _transmit_file(self):
         multicast_socket, nack_socket = None, None
+        eof_sent = False
         try:
             multicast_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
             multicast_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, MULTICAST_TTL)
-            nack_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            nack_socket.bind(('', NACK_PORT))
-            nack_socket.setblocking(False)
+            nack_socket = self._open_nack_socket()
 
-            file_size = os.path.getsize(self.file_path)
+            file_identity = self._file_identity()
+            file_size = file_identity['file_size']
             
-            self.status_callback("Calculando checksum del archivo...")
-            file_crc32 = _calculate_file_crc32(self.file_path)
-            self.status_callback("Checksum calculado. Iniciando envío...")
+            # En modo streaming el CRC se acumula al leer cada trozo por primera vez y viaja en el EOF,
+            # así el primer byte sale sin esperar a leer el archivo entero.
+            self.stream_crc32 = 0
+            self.block_crcs = {}
+            # En el carrusel no hay EOF: el CRC se calcula antes y viaja en los metadatos que se repiten.
+            if self.STREAM_CHECKSUM and not self.carousel_mode:
+                file_crc32 = None
+            else:
+                self.status_callback("Calculando checksum del archivo...")
+                file_crc32 = file_set_crc32(self.manifest_sources) if self.manifest else compute_file_crc32(self.file_path)
+                self.status_callback("Checksum calculado. Iniciando envío...")
             
             total_chunks = (file_size // self.CHUNK_SIZE) + (1 if file_size % self.CHUNK_SIZE > 0 else 0)
             total_blocks = (total_chunks // self.BLOCK_SIZE_PACKETS) + (1 if total_chunks % self.BLOCK_SIZE_PACKETS > 0 else 0)
 
             metadata = {
-                "type": "metadata", "session_id": self.session_id, "session_name": self.session_name,
-                "file_name": os.path.basename(self.file_path), "file_size": file_size, 
+                "protocol_version": PROTOCOL_VERSION, "session_name": self.session_name,
+                "file_name": file_identity['file_name'], "file_size": file_size,
+                "file_mtime": file_identity['file_mtime'],
                 "file_crc32": file_crc32,
+                "checksum_in_eof": file_crc32 is None,
                 "total_chunks": total_chunks,
                 # Parámetros de red
                 "chunk_size": self.CHUNK_SIZE, 
                 "block_size_packets": self.BLOCK_SIZE_PACKETS,
                 "nack_listen_timeout": self.NACK_LISTEN_TIMEOUT,
-                "repair_rounds": self.REPAIR_ROUNDS
+                # Los receptores envían los NACK al grupo tras una espera aleatoria de hasta este tiempo.
+                "nack_backoff": self.NACK_BACKOFF,
+                # Los miembros conocidos confirman cada bloque para que el emisor no espere en balde.
+                "block_acks": bool(self.ack_members) and not self.carousel_mode,
+                "repair_rounds": self.REPAIR_ROUNDS,
+                "fec_parity_packets": self.FEC_PARITY_PACKETS,
+                "window_blocks": self.WINDOW_BLOCKS,
+                "compression": None if self.COMPRESSION == 'off' else self.COMPRESSION,
+                "carousel": self.carousel_mode
             }
+            session_id_bytes = self.session_id_bytes
+            manifest_packets = []
+            if self.manifest is not None:
+                manifest_packets, manifest_crc32 = build_manifest_packets(session_id_bytes, self.manifest, self.CHUNK_SIZE)
+                metadata.update({"file_count": len(self.manifest['files']), "manifest_parts": len(manifest_packets),
+                                 "manifest_crc32": manifest_crc32})
+            metadata_packet = build_metadata_packet(session_id_bytes, metadata)
             for _ in range(3):
                 if not self.is_active: break
-                multicast_socket.sendto(json.dumps(metadata).encode('utf-8'), (MULTICAST_GROUP, MULTICAST_PORT))
+                multicast_socket.sendto(metadata_packet, self.multicast_address)
+                for packet in manifest_packets:
+                    multicast_socket.sendto(packet, self.multicast_address)
                 time.sleep(0.1)
 
             if not self.is_active: return
             
-            session_id_bytes = uuid.UUID(self.session_id).bytes
+            self.compressor = AdaptiveCompressor(self.COMPRESSION) if self.COMPRESSION != 'off' else None
+            packet_size = HEADER_SIZE + self.CHUNK_SIZE
+            pacer = TokenBucketPacer(self.TARGET_BITRATE * 1_000_000, self.MAX_BURST * packet_size)
+            rate_controller = None
+            # Sin NACKs (carrusel) no hay pérdidas que medir: se emite a la tasa objetivo.
+            if self.ADAPTIVE_RATE and not self.carousel_mode:
+                # Con tasa objetivo (configurada o medida con `tune`) se arranca a su mitad; sin ella, en la tasa inicial.
+                start_mbps = self.TARGET_BITRATE / 2 if self.TARGET_BITRATE else self.START_BITRATE
+                rate_controller = AimdRateController(pacer, (self.TARGET_BITRATE or ADAPTIVE_RATE_CEILING_MBPS) * 1_000_000, start_mbps * 1_000_000)
+                logger.info("[SND] Control de tasa adaptativo: inicio a %.1f Mbps, máximo %.1f Mbps.", rate_controller.rate_bps / 1_000_000, rate_controller.max_rate_bps / 1_000_000)
             
-            with open(self.file_path, 'rb') as f:
-                for block_idx in range(total_blocks):
-                    if not self.is_active: break
-                    start_seq = block_idx * self.BLOCK_SIZE_PACKETS
-                    end_seq = min((block_idx + 1) * self.BLOCK_SIZE_PACKETS, total_chunks)
-                    
-                    print(f"\n[SND] Enviando bloque {block_idx} (paquetes {start_seq}-{end_seq-1})...")
+            # Cada paquete envía un memoryview del mapeo del archivo: la carga útil no se copia en Python.
+            # Con E/S por lotes cada llamada a sendmmsg envía hasta MAX_BURST paquetes de datos
+            # (un conjunto de archivos no es un único búfer: se envía paquete a paquete).
+            with self._open_source(file_size) as source, \
+                    (open_batch_sender(multicast_socket, self.multicast_address, source, self.MAX_BURST, HEADER_SIZE)
+                     if self.BATCH_IO else nullcontext()) as batch:
+                self.batch_sender = batch
+                if self.carousel_mode:
+                    self._run_carousel(source, multicast_socket, pacer, total_chunks, [metadata_packet] + manifest_packets)
+                    return
+                # Bloques enviados cuya ronda de reparación sigue abierta:
+                # block_idx -> {'round': nº de FIN_DE_BLOQUE enviados, 'deadline': fin de la escucha, 'missing': set()}
+                in_flight = {}
+                next_block = 0
+                bytes_confirmed = 0
+                # Bloques cerrados y cuántos de ellos sin agotar la espera gracias a los ACK.
+                blocks_closed = blocks_closed_early = 0
+                while self.is_active and (next_block < total_blocks or in_flight):
+                    self._drain_nacks(nack_socket, in_flight)
 
-                    for seq_num in range(start_seq, end_seq):
-                        if not self.is_active: break
-                        f.seek(seq_num * self.CHUNK_SIZE)
-                        packet = session_id_bytes + seq_num.to_bytes(4, 'big') + f.read(self.CHUNK_SIZE)
-                        multicast_socket.sendto(packet, (MULTICAST_GROUP, MULTICAST_PORT))
-                        time.sleep(0.0001)
-                    
-                    if not self.is_active: break
+                    now = time.time()
+                    for block_idx in sorted(in_flight):
+                        state = in_flight[block_idx]
+                        answered = self._round_answered(state)
+                        if now < state['deadline'] and not answered: continue
+                        if self.ack_members and self.ack_members.keys() <= state['acked']:
+                            state['missing'] = set()  # Todos los miembros tienen el bloque.
+                        if rate_controller and state.get('lost') is not None:
+                            self._report_block_loss(rate_controller, block_idx, state, next_block - 1)
+
+                        if state['missing']:
+                            logger.debug("[SND] Retransmitiendo %s paquetes para el bloque %s.", len(state['missing']), block_idx)
+                            self._send_chunks(source, multicast_socket, pacer, sorted(state['missing']))
+                            state['missing'] = set()
+                            if state['round'] < self.REPAIR_ROUNDS:
+                                state['round'] += 1
+                                state['answered'] = set()
+                                self._send_block_end(multicast_socket, block_idx, state['round'])
+                                state['deadline'] = time.time() + self.NACK_LISTEN_TIMEOUT
+                                continue
+                            logger.warning("[SND] ADVERTENCIA: Se superaron las rondas de reparación para el bloque %s. Puede haber clientes desincronizados.", block_idx)
+                        elif answered:
+                            logger.debug("[SND] Bloque %s confirmado por todos los receptores (ACK).", block_idx)
+                        else:
+                            logger.debug("[SND] Bloque %s confirmado. No se recibieron NACKs.", block_idx)
 
-                    last_round_had_nacks = False
-                    for repair_round in range(self.REPAIR_ROUNDS):
+                        del in_flight[block_idx]
+                        self._note_quiet_members(state)
+                        blocks_closed += 1
+                        if answered and now < state['deadline']: blocks_closed_early += 1
+                        self._record_block_metrics(state)
+                        bytes_confirmed += self._block_length(block_idx, file_size)
+                        rate = pacer.measure_rate()
+                        self.metrics.send_rate.set(rate)
+                        self.progress_callback(bytes_confirmed, file_size, self._effective_rate(rate))
+
+                    while self.is_active and next_block < total_blocks and self._receivers_hold(source, next_block):
+                        self._skip_block(source, multicast_socket, next_block)
+                        bytes_confirmed += self._block_length(next_block, file_size)
+                        next_block += 1
+
+                    if next_block < total_blocks and len(in_flight) < self.WINDOW_BLOCKS:
+                        sent_at = time.time()
+                        self._send_block(source, multicast_socket, pacer, next_block, total_chunks)
                         if not self.is_active: break
-                        
-                        print(f"[SND] Fin del bloque {block_idx}. Ronda de reparación {repair_round + 1}/{self.REPAIR_ROUNDS}. Esperando NACKs...")
-                        
-                        block_end_packet = {"type": "block_end", "session_id": self.session_id, "block_index": block_idx}
-                        for _ in range(2):
-                            multicast_socket.sendto(json.dumps(block_end_packet).encode('utf-8'), (MULTICAST_GROUP, MULTICAST_PORT))
-                            time.sleep(0.01)
-
-                        missing_seqs = set()
-                        listen_end = time.time() + self.NACK_LISTEN_TIMEOUT
-                        while time.time() < listen_end:
-                            if not self.is_active: break
-                            try:
-                                data, addr = nack_socket.recvfrom(4096)
-                                nack_req = json.loads(data.decode('utf-8'))
-                                if nack_req.get('session_id') == self.session_id and nack_req.get('block_index') == block_idx:
-                                    print(f"[SND] RECIBIDO NACK de {addr} para bloque {block_idx}: {len(nack_req.get('missing_seqs', []))} paquetes.")
-                                    missing_seqs.update(nack_req.get('missing_seqs', []))
-                            except (BlockingIOError, json.JSONDecodeError): 
-                                time.sleep(0.01)
-
-                        if not missing_seqs:
-                            print(f"[SND] Bloque {block_idx} confirmado. No se recibieron NACKs. Avanzando.")
-                            last_round_had_nacks = False
-                            break
-
-                        last_round_had_nacks = True
-                        print(f"[SND] Retransmitiendo {len(missing_seqs)} paquetes para el bloque {block_idx}.")
-                        
-                        for seq_num in sorted(list(missing_seqs)):
-                            if not self.is_active: break
-                            f.seek(seq_num * self.CHUNK_SIZE)
-                            packet = session_id_bytes + seq_num.to_bytes(4, 'big') + f.read(self.CHUNK_SIZE)
-                            multicast_socket.sendto(packet, (MULTICAST_GROUP, MULTICAST_PORT))
-                            time.sleep(0.0002)
-
-                    if last_round_had_nacks:
-                        print(f"[SND] ADVERTENCIA: Se superaron las rondas de reparación para el bloque {block_idx}. Puede haber clientes desincronizados.")
-
-                    bytes_processed = min(end_seq * self.CHUNK_SIZE, file_size)
-                    self.progress_callback(bytes_processed, file_size)
-
-            if self.is_active: 
-                print("[SND] Transmisión completada. Enviando EOF.")
-                self.status_callback("Transmisión completada.")
+                        self._send_block_end(multicast_socket, next_block, 1)
+                        # 'lost': paquetes pedidos por cualquier receptor en la primera ronda (señal del control de tasa).
+                        in_flight[next_block] = {'round': 1, 'deadline': time.time() + self.NACK_LISTEN_TIMEOUT, 'missing': set(),
+                                                 'packets': self._block_packets(next_block, total_chunks), 'lost': set(),
+                                                 # Miembros que confirmaron el bloque y que respondieron en esta ronda.
+                                                 'acked': set(), 'answered': set(),
+                                                 # Para las métricas: primer envío y NACKs recibidos.
+                                                 'sent_at': sent_at, 'nacks': 0}
+                        next_block += 1
+                    else:
+                        time.sleep(0.005)
+
+                if self.is_active:
+                    logger.info("[SND] Transmisión completada. Tasa media: %.2f Mbps. Enviando EOF.", pacer.average_rate() / 1_000_000)
+                    if metadata['block_acks']:
+                        logger.info("[SND] ACKs de bloque: %s de %s bloques cerrados sin agotar la espera de NACKs.", blocks_closed_early, blocks_closed)
+                    if self.compressor:
+                        compressor = self.compressor
+                        logger.info("[SND] Compresión %s: %.1f MB de datos en %.1f MB (ratio %.2f). Tasa efectiva: %.2f Mbps.", compressor.codec, compressor.raw_bytes / 1e6, compressor.wire_bytes / 1e6, compressor.ratio(), self._effective_rate(pacer.average_rate()) / 1_000_000)
+                    self._finish_with_repairs(source, multicast_socket, nack_socket, pacer, total_chunks)
+                    eof_sent = True
+                    self.status_callback("Transmisión completada.")
             
         except Exception as e:
             if self.is_active: self.status_callback(f"Error en transmisión: {e}")
         finally:
-            if self.is_active:
-                eof_packet = {"type": "eof", "session_id": self.session_id}
-                for _ in range(5):
-                    if multicast_socket: multicast_socket.sendto(json.dumps(eof_packet).encode('utf-8'), (MULTICAST_GROUP, MULTICAST_PORT))
-                    time.sleep(0.1)
+            # Si la transmisión se interrumpe, los receptores deben saberlo: un EOF les haría pedir
+            # reparaciones a un emisor que ya no responde.
+            if self.is_active and not eof_sent and self.multicast_address:
+                self._send_cancellation_message()
             
+            self.batch_sender = None
             if multicast_socket: multicast_socket.close()
             if nack_socket: nack_socket.close()
             self.is_active = self.transmission_started = False
+
+    def _run_carousel(self, source, multicast_socket, pacer, total_chunks, metadata_packets):
+        """
+        Recorre el archivo en pasadas hasta que se detiene la sesión. Cada bloque va precedido de los
+        metadatos (para quien acaba de unirse) y se envía como sus trozos seguidos de símbolos de
+        reparación distintos en cada pasada. No se escuchan NACKs.
+        """
+        total_blocks = (total_chunks + self.BLOCK_SIZE_PACKETS - 1) // self.BLOCK_SIZE_PACKETS
+        file_size = len(source)
+        pass_idx = 0
+        logger.info("[SND] Carrusel: %s bloques por pasada, %.0f%% de símbolos de reparación.", total_blocks, CAROUSEL_REPAIR_FRACTION * 100)
+        while self.is_active:
+            for block_idx in range(total_blocks):
+                for packet in metadata_packets:
+                    multicast_socket.sendto(packet, self.multicast_address)
+                start_seq = block_idx * self.BLOCK_SIZE_PACKETS
+                chunks = [self._chunk_view(source, seq_num) for seq_num in range(start_seq, min(start_seq + self.BLOCK_SIZE_PACKETS, total_chunks))]
+                for symbol_id, chunk in enumerate(chunks):
+                    if not self.is_active: return
+                    self._send_packet(multicast_socket, pacer, pack_symbol_header(self.session_id_bytes, block_idx, symbol_id), chunk)
+
+                repairs = math.ceil(len(chunks) * CAROUSEL_REPAIR_FRACTION)
+                encoder = FountainEncoder(block_idx, chunks, self.CHUNK_SIZE)
+                for i in range(repairs):
+                    if not self.is_active: return
+                    symbol_id = len(chunks) + pass_idx * repairs + i
+                    self._send_packet(multicast_socket, pacer, pack_symbol_header(self.session_id_bytes, block_idx, symbol_id), encoder.symbol(symbol_id))
+                rate = pacer.measure_rate()
+                self.metrics.send_rate.set(rate)
+                self.progress_callback(min((block_idx + 1) * self.BLOCK_SIZE_PACKETS * self.CHUNK_SIZE, file_size), file_size, rate)
+            pass_idx += 1
+            logger.info("[SND] Carrusel: pasada %s completada. Tasa media: %.2f Mbps.", pass_idx, pacer.average_rate() / 1_000_000)
+            self.status_callback(f"Carrusel: pasada {pass_idx} completada. Se sigue emitiendo hasta detener la sesión.")
+
+    def _block_length(self, block_idx, file_size):
+        """Bytes del archivo que cubre un bloque (el último puede ser más corto)."""
+        block_bytes = self.BLOCK_SIZE_PACKETS * self.CHUNK_SIZE
+        return min(file_size - block_idx * block_bytes, block_bytes)
+
+    def _block_packets(self, block_idx, total_chunks):
+        return min(self.BLOCK_SIZE_PACKETS, total_chunks - block_idx * self.BLOCK_SIZE_PACKETS)
+
+    def _record_block_metrics(self, state):
+        metrics = self.metrics
+        metrics.blocks_confirmed.inc()
+        metrics.block_nacks.observe(state['nacks'])
+        metrics.block_repair_rounds.observe(state['round'])
+        metrics.block_latency.observe(time.time() - state['sent_at'])
+
+    def _report_block_loss(self, rate_controller, block_idx, state, last_sent_block):
+        """
+        Pasa al control de tasa la pérdida del primer envío del bloque: la unión de los paquetes
+        pedidos por todos los receptores. Con la supresión de NACKs un receptor no repite lo que
+        otro ya pidió, así que contar por receptor (o por dirección) subestimaría la pérdida.
+        """
+        loss_ratio = len(state['lost']) / max(1, state['packets'])
+        state['lost'] = None
+        previous_bps = rate_controller.rate_bps
+        if not rate_controller.on_block_feedback(block_idx, loss_ratio, last_sent_block): return
+        rate_mbps = rate_controller.rate_bps / 1_000_000
+        decreased = rate_controller.rate_bps < previous_bps
+        # Las subidas ocurren en cada bloque limpio: solo se registran en DEBUG.
+        logger.log(logging.INFO if decreased else logging.DEBUG, "[SND] Tasa ajustada a %.1f Mbps (pérdida en el bloque %s: %.1f%%).", rate_mbps, block_idx, loss_ratio * 100)
+        now = time.monotonic()
+        if decreased or now - self.rate_status_time >= RATE_STATUS_INTERVAL:
+            self.rate_status_time = now
+            self.status_callback(f"Enviando a {rate_mbps:.1f} Mbps (pérdida {loss_ratio:.1%})")
+
+    def _send_packet(self, multicast_socket, pacer, header, payload=b''):
+        size = len(header) + len(payload)
+        pacer.consume(size)
+        self.metrics.packets_sent.inc()
+        self.metrics.bytes_sent.inc(size)
+        if _HAS_SENDMSG:
+            multicast_socket.sendmsg((header, payload), (), 0, self.multicast_address)
+        else:
+            multicast_socket.sendto(header + payload, self.multicast_address)
+
+    def _effective_rate(self, wire_rate):
+        """Tasa en datos del archivo: con compresión es mayor que la tasa en la red."""
+        return wire_rate / self.compressor.ratio() if self.compressor else wire_rate
+
+    def _send_data(self, source, multicast_socket, pacer, seq_num):
+        if self.compressor:
+            # Los trozos comprimidos van aparte; los que no compensan siguen por el lote sin copiarse.
+            packed = self.compressor.compress(self._chunk_view(source, seq_num))
+            if packed is not None:
+                header = pack_header(PKT_DATA, self.session_id_bytes, seq_num, self.compressor.flag)
+                self._send_packet(multicast_socket, pacer, header, packed)
+                return
+        header = pack_header(PKT_DATA, self.session_id_bytes, seq_num)
+        batch = self.batch_sender
+        if batch is None:
+            self._send_packet(multicast_socket, pacer, header, self._chunk_view(source, seq_num))
+            return
+        offset = seq_num * self.CHUNK_SIZE
+        if batch.add(header, offset, min(self.CHUNK_SIZE, len(source) - offset)):
+            self._flush_batch(pacer)
+
+    def _flush_batch(self, pacer):
+        """Envía los paquetes de datos acumulados en el lote, descontándolos del regulador de una vez."""
+        batch = self.batch_sender
+        if batch and batch.count:
+            pacer.consume(batch.queued_bytes)
+            self.metrics.packets_sent.inc(batch.count)
+            self.metrics.bytes_sent.inc(batch.queued_bytes)
+            batch.flush()
+
+    def _chunk_view(self, source, seq_num):
+        offset = seq_num * self.CHUNK_SIZE
+        return source[offset:offset + self.CHUNK_SIZE]
+
+    def _send_chunks(self, source, multicast_socket, pacer, seq_nums):
+        """Reenvío de trozos pedidos por NACK."""
+        self.metrics.packets_retransmitted.inc(len(seq_nums))
+        for seq_num in seq_nums:
+            if not self.is_active: break
+            self._send_data(source, multicast_socket, pacer, seq_num)
+        self._flush_batch(pacer)
+
+    def _send_block(self, source, multicast_socket, pacer, block_idx, total_chunks):
+        """Primer envío de un bloque: sus trozos de datos y, si hay FEC, su paridad."""
+        start_seq = block_idx * self.BLOCK_SIZE_PACKETS
+        end_seq = min((block_idx + 1) * self.BLOCK_SIZE_PACKETS, total_chunks)
+        logger.debug("[SND] Enviando bloque %s (paquetes %s-%s)...", block_idx, start_seq, end_seq - 1)
+
+        block_crc = 0
+        parity = ParityEncoder(start_seq, end_seq, self.FEC_PARITY_PACKETS, self.CHUNK_SIZE) if self.FEC_PARITY_PACKETS else None
+        for seq_num in range(start_seq, end_seq):
+            if not self.is_active: return
+            chunk = self._chunk_view(source, seq_num)
+            block_crc = zlib.crc32(chunk, block_crc)
+            if parity: parity.add_chunk(seq_num, chunk)
+            self._send_data(source, multicast_socket, pacer, seq_num)
+        self._flush_batch(pacer)
+
+        self._record_block_crc(source, block_idx, block_crc)
+
+        if parity:
+            for group, payload in parity.parity_payloads():
+                header = pack_header(PKT_PARITY, self.session_id_bytes, encode_parity_seq(block_idx, group, self.FEC_PARITY_PACKETS))
+                self._send_packet(multicast_socket, pacer, header, payload)
+
+    def _record_block_crc(self, source, block_idx, block_crc):
+        # El CRC del archivo se obtiene combinando los de los bloques: cada trozo se recorre una sola vez.
+        self.block_crcs[block_idx] = block_crc
+        if self.STREAM_CHECKSUM:
+            self.stream_crc32 = crc32_combine(self.stream_crc32, block_crc, self._block_length(block_idx, len(source)))
+
+    def _block_view(self, source, block_idx):
+        start = block_idx * self.BLOCK_SIZE_PACKETS * self.CHUNK_SIZE
+        return source[start:start + self._block_length(block_idx, len(source))]
+
+    def _skip_block(self, source, multicast_socket, block_idx):
+        """
+        Bloque que todos los receptores ya tienen: no se envía, pero cuenta para el CRC del archivo.
+        Su FIN_DE_BLOQUE marcado como local indica a quien lo tenga de una versión anterior que lo copie.
+        """
+        self._record_block_crc(source, block_idx, zlib.crc32(self._block_view(source, block_idx)))
+        block_end_packet = build_block_end_packet(self.session_id_bytes, block_idx, self.block_crcs[block_idx], FLAG_LOCAL_BLOCK)
+        for _ in range(2):
+            multicast_socket.sendto(block_end_packet, self.multicast_address)
+        self.metrics.blocks_skipped.inc()
+        logger.debug("[SND] Bloque %s omitido: los receptores ya lo tienen.", block_idx)
+
+    def _send_block_end(self, multicast_socket, block_idx, repair_round):
+        logger.debug("[SND] Fin del bloque %s. Ronda de reparación %s/%s. Esperando NACKs...", block_idx, repair_round, self.REPAIR_ROUNDS)
+        block_end_packet = build_block_end_packet(self.session_id_bytes, block_idx, self.block_crcs.get(block_idx))
+        for _ in range(2):
+            multicast_socket.sendto(block_end_packet, self.multicast_address)
+
+    def _send_eof(self, multicast_socket, eof_round):
+        eof_packet = build_eof_packet(self.session_id_bytes, self.stream_crc32 if self.STREAM_CHECKSUM else None, eof_round)
+        for _ in range(5):
+            multicast_socket.sendto(eof_packet, self.multicast_address)
+            time.sleep(0.1)
+
+    def _finish_with_repairs(self, source, multicast_socket, nack_socket, pacer, total_chunks):
+        """
+        Envía el EOF y atiende la reparación dirigida: un receptor que llega al EOF con bloques
+        incompletos o corruptos pide solo esos bloques por NACK en lugar de descartar el archivo.
+        Cada ronda termina con un nuevo EOF numerado; en la última el receptor ya no pide más.
+        Si una ronda no trae NACKs se salta directamente al EOF final, para que ningún receptor se
+        quede esperando una ronda que no va a llegar (su NACK pudo perderse o suprimirse).
+        """
+        for eof_round in range(self.REPAIR_ROUNDS + 1):
+            self._send_eof(multicast_socket, eof_round)
+            if eof_round == self.REPAIR_ROUNDS: return
+
+            requests = {}
+            deadline = time.time() + self.NACK_LISTEN_TIMEOUT
+            while self.is_active and time.time() < deadline:
+                self._drain_nacks(nack_socket, requests, accept_any_block=True)
+                time.sleep(0.005)
+            if not self.is_active: return  # stop_session ya avisó con CANCEL.
+            if not requests:
+                self._send_eof(multicast_socket, self.REPAIR_ROUNDS)
+                return
+
+            for block_idx in sorted(requests):
+                seq_nums = sorted(seq for seq in requests[block_idx]['missing'] if seq < total_chunks)
+                logger.debug("[SND] Reparación final (ronda %s): reenviando %s paquetes del bloque %s.", eof_round + 1, len(seq_nums), block_idx)
+                self._send_chunks(source, multicast_socket, pacer, seq_nums)
+                self._send_block_end(multicast_socket, block_idx, eof_round + 1)
+
+    def _round_answered(self, state):
+        """
+        True si todos los miembros ya respondieron en esta ronda (ACK, NACK o NACK cubierto por el de
+        otro) y se sabe qué hacer sin esperar más: confirmar el bloque o reenviar lo pedido.
+        """
+        if not self.ack_members: return False
+        if any(member not in state['acked'] and member not in state['answered'] for member in self.ack_members): return False
+        return bool(state['missing']) or self.ack_members.keys() <= state['acked']
+
+    def _note_quiet_members(self, state):
+        """Deja de esperar a los miembros que llevan ACK_QUIET_BLOCKS bloques seguidos sin confirmar."""
+        if not self.ack_members: return
+        for member in list(self.ack_members):
+            if member in state['acked']:
+                self.ack_quiet_blocks[member] = 0
+                continue
+            self.ack_quiet_blocks[member] = self.ack_quiet_blocks.get(member, 0) + 1
+            if self.ack_quiet_blocks[member] >= ACK_QUIET_BLOCKS:
+                logger.warning("[SND] '%s' lleva %s bloques sin confirmar: se deja de esperar su ACK.", self.ack_members[member], ACK_QUIET_BLOCKS)
+                del self.ack_members[member]
+
+    def _handle_ack(self, data, in_flight):
+        ack = parse_ack_packet(data)
+        if not ack or ack[0] != self.session_id_bytes or not self.ack_members: return
+        self.metrics.acks_received.inc()
+        state = in_flight.get(ack[1])
+        if state is None or 'acked' not in state: return  # Bloque ya cerrado o reparación tras el EOF.
+        (state['answered'] if ack[3] else state['acked']).add(ack[2])
+
+    def _drain_nacks(self, nack_socket, in_flight, accept_any_block=False):
+        """
+        Lee sin bloquear todos los NACKs pendientes y los asigna a su bloque en vuelo.
+        Con `accept_any_block` (reparación tras el EOF) se aceptan también bloques ya cerrados.
+        """
+        while True:
+            try:
+                data, addr = nack_socket.recvfrom(4096)
+            except BlockingIOError:
+                return
+            if len(data) > TYPE_OFFSET and data[TYPE_OFFSET] == PKT_ACK:
+                self._handle_ack(data, in_flight)
+                continue
+            nack = decode_nack(data)
+            if not nack or nack[0] != self.session_id_bytes: continue
+            self.metrics.nacks_received.inc()
+            if accept_any_block and nack[1] in self.block_crcs:
+                in_flight.setdefault(nack[1], {'missing': set()})
+            state = in_flight.get(nack[1])
+            if state is None: continue
+            logger.debug("[SND] RECIBIDO NACK de %s para bloque %s: %s paquetes.", addr, nack[1], len(nack[2]))
+            state['missing'].update(nack[2])
+            if 'nacks' in state: state['nacks'] += 1
+            receiver_id = nack_receiver_id(data)
+            if receiver_id and 'answered' in state: state['answered'].add(receiver_id)
+            if state.get('lost') is not None:
+                state['lost'].update(nack[2])
@@ -20,7 +20,7 @@ def get_local_ip():
 
 class ServiceAnnouncer:
     """Anuncia un servicio PyCast en la red local usando Zeroconf."""
-    def __init__(self, session_id, session_name, port, username):
+    def __init__(self, session_id, session_name, port, username, extra_properties=None):
         self.zeroconf = None
         self.thread = None
         self.is_running = False
@@ -31,6 +31,8 @@ class ServiceAnnouncer:
             'username': username,
             'status': 'available' # Estado inicial
         }
+        # Datos adicionales de la sesión (p. ej. identidad del archivo para reanudar descargas)
+        properties.update({k: str(v) for k, v in (extra_properties or {}).items()})
         
         self.local_ip = get_local_ip()
         service_name = f"{session_name}.{SERVICE_TYPE}"
@@ -0,0 +1,759 @@
+# session_download.py
+"""
+Estado y lógica de una descarga: lo que el receptor guarda por cada sesión a la que está unido.
+
+El `Receiver` lee los datagramas de todos los grupos en un solo hilo y los reparte por el
+identificador de sesión de la cabecera; cada `SessionDownload` tiene su propio archivo
+temporal, escritor diferido, conjunto de secuencias recibidas, bloques completados,
+decodificadores FEC y estado para reanudar, así que varias descargas avanzan a la vez sin
+interferir entre sí.
+"""
+import logging
+import socket
+import os
+import random
+import shutil
+import time
+import uuid
+import zlib
+from collections import deque
+from checksum import ChunkedCrc32, crc32_concat, compute_file_crc32
+from disk_writer import WriteBehindWriter
+from file_set import validate_manifest, file_set_crc32, place_file_set
+from resume_state import encode_block_bitmap, decode_block_bitmap, load_resume_state, save_resume_state, remove_resume_state, state_matches
+from compression import decompress, codec_available
+from delta_sync import read_block
+from fountain import FountainDecoder
+from fec import ParityDecoder, decode_parity_seq
+from protocol import (encode_nack, decode_nack, build_ack_packet, parse_metadata_packet, parse_symbol_id, SYMBOL_ID_SIZE, PKT_SYMBOL, parse_manifest_parts, parse_block_end_packet, parse_eof_packet,
+                      HEADER_SIZE, TYPE_OFFSET, FLAGS_OFFSET, FLAG_CODEC_MASK, FLAG_LOCAL_BLOCK, SEQ_SLICE, SUPPORTED_PROTOCOL_VERSIONS,
+                      PKT_DATA, PKT_PARITY, PKT_METADATA, PKT_BLOCK_END, PKT_EOF, PKT_CANCEL, PKT_MANIFEST, PKT_NACK)
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto se guarda como mucho el estado para reanudar durante la descarga.
+RESUME_SAVE_INTERVAL = 2.0
+
+# Datagramas NACK propios que se recuerdan para reconocer su eco en el grupo.
+SENT_NACK_HISTORY = 64
+# Tras cada EOF se espera el siguiente como mucho (rondas que quedan) * (nack_listen_timeout +
+# este margen, que cubre las copias repetidas del EOF y el reenvío): si no llega, el emisor
+# ya no está o no oyó el NACK y se termina con lo recibido.
+EOF_ROUND_MARGIN = 1.0
+# Un FIN_DE_BLOQUE repetido de un bloque ya completo se vuelve a confirmar como mucho con esta
+# frecuencia: las dos copias seguidas de cada ronda producen un solo ACK.
+ACK_REPEAT_INTERVAL = 0.05
+
+class SessionDownload:
+    """Una descarga en curso: una sesión a la que el receptor está unido y su archivo de destino."""
+    def __init__(self, receiver, session_info, destination_folder, listen_socket, endpoints):
+        self.receiver = receiver
+        self.CHUNK_SIZE = receiver.config.get('network_settings', {}).get('chunk_size', 8192)
+        self.WRITE_BUFFER_BYTES = receiver.WRITE_BUFFER_BYTES
+
+        self.session_id = session_info['session_id']
+        self.session_bytes = uuid.UUID(self.session_id).bytes
+        self.session_name = session_info.get('session_name') or self.session_id[:8]
+        self.sender_address = session_info['address']
+        self.sender_nack_port = endpoints['nack_port']
+        # Socket del grupo de la sesión (compartido si otra sesión usa el mismo) y socket de los NACK.
+        self.listen_socket = listen_socket
+        self.listen_address = (endpoints['multicast_group'], endpoints['data_port'])
+        self.nack_socket = receiver.nack_socket
+        # (grupo, puerto de NACK) en el que se escuchan los NACK de otros receptores, si el emisor los usa.
+        self.nack_address = None
+        # False en cuanto la descarga termina o se abandona: el receptor deja de entregarle paquetes.
+        self.active = True
+
+        self.current_session_info = {'destination_folder': destination_folder}
+        self.file_writer = None
+        self.temp_file_path = None
+        # Envío de varios archivos: partes del manifiesto recibidas (None si no se espera ninguno)
+        # y, una vez completo, ([(ruta, tamaño, mtime)], [carpetas vacías]).
+        self.manifest_parts = None
+        self.file_set = None
+
+        # Con envío en ventana puede haber varios bloques abiertos a la vez: se guardan
+        # las secuencias recibidas de todos los bloques aún incompletos.
+        self.received_seqs = set()
+        self.completed_blocks = set()
+        self.last_block_end_seen = -1
+        self.bytes_completed = 0
+        self.fec_decoders = {}
+        # Modo carrusel: decodificador de cada bloque a medio recibir.
+        self.fountain_decoders = {}
+        # Verificación incremental: CRC en curso de cada bloque abierto y (crc, longitud)
+        # de cada bloque completado, para no releer el archivo al final.
+        self.block_crc_trackers = {}
+        self.block_crcs = {}
+        self.last_eof_round = -1
+        # Plazo (monotonic) para el siguiente EOF mientras se esperan reparaciones finales, o None.
+        self.eof_deadline = None
+        # Reanudación: bloques completados a la espera de que el escritor los lleve al archivo
+        # [(token, block_idx)] y bloques que ya se pueden dar por guardados.
+        self.unsaved_blocks = []
+        self.durable_blocks = set()
+        self.last_resume_save = 0.0
+        # NACKs por multicast: peticiones aplazadas {bloque: [plazo, secuencias]}, datagramas propios
+        # recientes y contadores de enviados y suprimidos por haberlos pedido ya otro receptor.
+        self.pending_nacks = {}
+        self.sent_nacks = deque(maxlen=SENT_NACK_HISTORY)
+        self.nacks_sent = 0
+        self.nacks_suppressed = 0
+        # ACK de bloque (si el emisor los pide): cuándo se confirmó por última vez cada bloque.
+        self.ack_times = {}
+        # Métricas del receptor y llegada del primer paquete de cada bloque abierto (latencia de bloque).
+        self.metrics = receiver.metrics
+        self.block_started = {}
+
+    # Los avisos pasan por el receptor, que los agrega o los etiqueta con la sesión.
+    def progress_callback(self, bytes_completed, total_bytes):
+        self.receiver._report_progress(self, bytes_completed, total_bytes)
+
+    def status_callback(self, message):
+        self.receiver._report_status(self, message)
+
+    def completion_callback(self, status):
+        self.receiver._report_completion(self, status)
+
+    def _size_receive_buffer(self, chunk_size, block_size_packets):
+        """Pide al kernel un búfer de socket capaz de absorber un bloque completo en ráfaga."""
+        if not self.listen_socket: return
+        wanted = (chunk_size + HEADER_SIZE) * block_size_packets
+        try:
+            if self.listen_socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) >= wanted: return
+            self.listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, wanted)
+            granted = self.listen_socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        except OSError as e:
+            logger.warning("[RCV] No se pudo ajustar SO_RCVBUF: %s", e)
+            return
+        logger.info("[RCV] SO_RCVBUF: solicitados %s KB, concedidos %s KB.", wanted // 1024, granted // 1024)
+        if granted < wanted:
+            logger.warning("[RCV] ADVERTENCIA: el sistema limita el búfer del socket (p. ej. net.core.rmem_max en Linux). Pueden perderse paquetes en ráfagas.")
+
+    def process_packet(self, data):
+        """Atiende un paquete de esta sesión (el receptor ya comprobó la cabecera)."""
+        if not self.active: return
+        ptype = data[TYPE_OFFSET]
+        if ptype == PKT_DATA:
+            self._handle_data_packet(data)
+        elif ptype == PKT_SYMBOL:
+            if self.file_writer and self.current_session_info.get('carousel'): self._handle_symbol(data)
+        elif ptype == PKT_PARITY:
+            self._handle_parity_packet(int.from_bytes(data[SEQ_SLICE], 'big'), data[HEADER_SIZE:])
+        elif ptype == PKT_BLOCK_END:
+            if not self.file_writer: return
+            block_idx = int.from_bytes(data[SEQ_SLICE], 'big')
+            if data[FLAGS_OFFSET] & FLAG_LOCAL_BLOCK:
+                self._copy_local_block(block_idx, parse_block_end_packet(data))
+            else:
+                self._handle_block_end(block_idx, parse_block_end_packet(data))
+            # Una reparación en curso tras el EOF mantiene vivo el plazo.
+            if self.eof_deadline is not None: self._arm_eof_deadline()
+        elif ptype == PKT_METADATA:
+            if not self.file_writer and self.manifest_parts is None:
+                packet = parse_metadata_packet(data)
+                if packet: self._handle_metadata(packet)
+        elif ptype == PKT_MANIFEST:
+            if not self.file_writer and self.manifest_parts is not None:
+                self._handle_manifest_part(int.from_bytes(data[SEQ_SLICE], 'big'), bytes(data[HEADER_SIZE:]))
+        elif ptype == PKT_EOF:
+            # El EOF se repite varias veces por ronda: solo se atiende la primera copia de cada una.
+            eof_round = int.from_bytes(data[SEQ_SLICE], 'big')
+            if eof_round <= self.last_eof_round: return
+            self.last_eof_round = eof_round
+            if self.current_session_info.get('checksum_in_eof'):
+                self.current_session_info['file_crc32'] = parse_eof_packet(data)
+            if eof_round < self.current_session_info.get('repair_rounds', 0) and self._request_final_repairs(eof_round):
+                self._arm_eof_deadline()
+                return
+            if not self._pending_blocks(): logger.info("[RCV] RECIBIDO EOF. Finalizando y verificando archivo.")
+            self._finish_after_eof()
+        elif ptype == PKT_NACK:
+            if self.pending_nacks: self._handle_peer_nack(bytes(data))
+        elif ptype == PKT_CANCEL:
+            self.status_callback("La transmisión fue cancelada por el emisor.")
+            self.suspend()
+            self._leave_session()
+            self.completion_callback(status="cancelled")
+
+    def _leave_session(self):
+        self.active = False
+        self.receiver._leave_session(self)
+
+    def _finish_after_eof(self):
+        """Verifica y cierra el archivo o, si aún faltan bloques, termina como incompleta."""
+        self.eof_deadline = None
+        if self._pending_blocks():
+            # Agotadas las rondas de reparación: se conserva lo recibido para reanudar más tarde.
+            self.status_callback(f"Descarga incompleta: faltan {len(self._pending_blocks())} bloques. Se conserva para reanudar.")
+            self.suspend()
+            self._leave_session()
+            self.completion_callback(status="incomplete")
+            return
+        self._reassemble_file()
+        self._leave_session()
+
+    def _arm_eof_deadline(self):
+        info = self.current_session_info
+        rounds_left = max(1, info.get('repair_rounds', 0) - max(self.last_eof_round, 0))
+        self.eof_deadline = time.monotonic() + rounds_left * (info.get('nack_listen_timeout', 0.2) + EOF_ROUND_MARGIN)
+
+    def check_eof_deadline(self, now):
+        """Termina la descarga si venció el plazo del siguiente EOF. Devuelve el plazo pendiente (o None)."""
+        if self.eof_deadline is None or not self.active: return None
+        if now < self.eof_deadline: return self.eof_deadline
+        logger.warning("[RCV] El emisor no envió el siguiente EOF a tiempo: se termina con lo recibido.")
+        self._finish_after_eof()
+        return None
+
+    def _handle_data_packet(self, data):
+        if not self.file_writer: return
+        seq_num = int.from_bytes(data[SEQ_SLICE], 'big')
+        if seq_num in self.received_seqs: return
+        if seq_num // self.current_session_info['block_size_packets'] in self.completed_blocks: return
+
+        codec_flags = data[FLAGS_OFFSET] & FLAG_CODEC_MASK
+        if codec_flags:
+            # Se descomprime antes de todo lo demás: CRC, FEC y escritura usan el trozo original.
+            offset = seq_num * self.CHUNK_SIZE
+            expected = min(self.CHUNK_SIZE, self.current_session_info.get('file_size', 0) - offset)
+            chunk = decompress(codec_flags, bytes(data[HEADER_SIZE:]), self.CHUNK_SIZE)
+            if chunk is None or len(chunk) != expected: return  # Se volverá a pedir con un NACK.
+        else:
+            chunk = bytes(data[HEADER_SIZE:])
+        self._accept_chunk(seq_num, chunk)
+
+    def _accept_chunk(self, seq_num, chunk):
+        # Si el escritor está saturado el trozo se descarta y se pedirá de nuevo con un NACK.
+        if not self.file_writer.submit(seq_num * self.CHUNK_SIZE, chunk): return
+        self.received_seqs.add(seq_num)
+        block_idx = seq_num // self.current_session_info['block_size_packets']
+        self._get_crc_tracker(block_idx).add(seq_num, chunk)
+        decoder = self._get_fec_decoder(block_idx)
+        if decoder: decoder.add_chunk(seq_num, chunk)
+
+    def _get_crc_tracker(self, block_idx):
+        tracker = self.block_crc_trackers.get(block_idx)
+        if tracker is None:
+            tracker = self.block_crc_trackers[block_idx] = ChunkedCrc32(block_idx * self.current_session_info['block_size_packets'])
+            self.block_started.setdefault(block_idx, time.monotonic())
+        return tracker
+
+    def _get_fec_decoder(self, block_idx):
+        """Devuelve (creándolo si hace falta) el decodificador FEC del bloque, o None sin FEC."""
+        parity_count = self.current_session_info.get('fec_parity_packets', 0)
+        if not parity_count or block_idx in self.completed_blocks: return None
+        decoder = self.fec_decoders.get(block_idx)
+        if decoder is None:
+            block_size = self.current_session_info['block_size_packets']
+            start_seq = block_idx * block_size
+            end_seq = min(start_seq + block_size, self.current_session_info['total_chunks'])
+            decoder = self.fec_decoders[block_idx] = ParityDecoder(start_seq, end_seq, parity_count, self.CHUNK_SIZE)
+        return decoder
+
+    def _handle_parity_packet(self, seq_field, payload):
+        parity_count = self.current_session_info.get('fec_parity_packets', 0)
+        if not parity_count: return
+        block_idx, group = decode_parity_seq(seq_field, parity_count)
+        decoder = self._get_fec_decoder(block_idx)
+        if decoder: decoder.add_parity(group, payload)
+
+    def _recover_with_fec(self, block_idx):
+        """
+        Reconstruye los trozos perdidos del bloque que la paridad permita. Devuelve cuántos faltaban
+        y aceptó el escritor (uno que descarta por búfer lleno se pedirá con un NACK y no cuenta).
+        """
+        decoder = self.fec_decoders.get(block_idx)
+        if not decoder: return 0
+        file_size = self.current_session_info['file_size']
+        accepted = 0
+        for seq_num, chunk in decoder.recover(self.received_seqs):
+            if seq_num in self.received_seqs: continue
+            offset = seq_num * self.CHUNK_SIZE
+            chunk = chunk[:file_size - offset]
+            if self.file_writer.submit(offset, chunk):
+                self.received_seqs.add(seq_num)
+                self._get_crc_tracker(block_idx).add(seq_num, chunk)
+                accepted += 1
+        return accepted
+    
+    def _send_nack(self, block_idx, missing_seqs):
+        """
+        Pide paquetes al emisor. Si la sesión usa NACKs por multicast, la petición se aplaza un tiempo
+        al azar (como en SRM) y se descarta si antes se oye a otro receptor pedir lo mismo.
+        """
+        backoff = self.current_session_info.get('nack_backoff')
+        if backoff is None or self.nack_address is None:
+            self._transmit_nack(block_idx, missing_seqs)
+            return
+        pending = self.pending_nacks.get(block_idx)
+        if pending is None:
+            self.pending_nacks[block_idx] = [time.monotonic() + random.uniform(0, backoff), set(missing_seqs)]
+        else:
+            pending[1].update(missing_seqs)
+
+    def flush_nacks(self, now):
+        """Envía los NACK aplazados cuyo plazo ha vencido. Devuelve el plazo más próximo que queda (o None)."""
+        next_deadline = None
+        for block_idx, (deadline, missing_seqs) in list(self.pending_nacks.items()):
+            if now >= deadline:
+                del self.pending_nacks[block_idx]
+                self._transmit_nack(block_idx, sorted(missing_seqs))
+            elif next_deadline is None or deadline < next_deadline:
+                next_deadline = deadline
+        return next_deadline
+
+    def _transmit_nack(self, block_idx, missing_seqs):
+        target = self.nack_address or (self.sender_address, self.sender_nack_port)
+        try:
+            for datagram in encode_nack(self.session_bytes, block_idx, missing_seqs, self.receiver.receiver_id):
+                if self.nack_address: self.sent_nacks.append(datagram)
+                self.nack_socket.sendto(datagram, target)
+            self.nacks_sent += 1
+            self.metrics.nacks_sent.inc()
+        except Exception as e:
+            logger.warning("[RCV] Error enviando NACK: %s", e)
+
+    def _handle_peer_nack(self, datagram):
+        """NACK oído en el grupo: lo que ya pidió otro receptor no se vuelve a pedir."""
+        if datagram in self.sent_nacks: return  # Eco de uno propio.
+        nack = decode_nack(datagram)
+        if not nack: return
+        pending = self.pending_nacks.get(nack[1])
+        if pending is None: return
+        pending[1].difference_update(nack[2])
+        if not pending[1]:
+            del self.pending_nacks[nack[1]]
+            self.nacks_suppressed += 1
+            self.metrics.nacks_suppressed.inc()
+            # El emisor cuenta la respuesta de cada miembro: se le dice que lo que falta ya está pedido.
+            self._send_ack(nack[1], covered=True)
+
+    def _send_ack(self, block_idx, covered=False):
+        """Confirma al emisor un bloque completo (o, con `covered`, cubierto por el NACK de otro receptor)."""
+        if not self.current_session_info.get('block_acks'): return
+        try:
+            packet = build_ack_packet(self.session_bytes, block_idx, self.receiver.receiver_id, covered)
+            self.nack_socket.sendto(packet, (self.sender_address, self.sender_nack_port))
+            self.metrics.acks_sent.inc()
+        except Exception as e:
+            logger.warning("[RCV] Error enviando ACK: %s", e)
+
+    def _block_crc_matches(self, block_idx, end_seq, expected_crc):
+        """Comprueba el CRC calculado al recibir el bloque contra el publicado. Sin CRC publicado se acepta."""
+        if expected_crc is None: return True
+        block_crc = self._get_crc_tracker(block_idx).result(end_seq)
+        return block_crc is None or block_crc[0] == expected_crc
+
+    def _pending_blocks(self):
+        """Bloques aún sin completar de la descarga en curso ([] si no hay descarga abierta)."""
+        if not self.file_writer: return []
+        block_size = self.current_session_info['block_size_packets']
+        total_blocks = -(-self.current_session_info['total_chunks'] // block_size)
+        return [block_idx for block_idx in range(total_blocks) if block_idx not in self.completed_blocks]
+
+    def _request_final_repairs(self, eof_round):
+        """
+        Al recibir el EOF pide por NACK solo los bloques que siguen incompletos o corruptos,
+        en vez de descartar el archivo. Devuelve True si se pidió alguna reparación.
+        """
+        pending_blocks = self._pending_blocks()
+        if not pending_blocks: return False
+        block_size = self.current_session_info['block_size_packets']
+        total_chunks = self.current_session_info['total_chunks']
+
+        logger.info("[RCV] EOF (ronda %s): %s bloques sin completar. Pidiendo reparación dirigida. (Ej: %s)", eof_round, len(pending_blocks), pending_blocks[:5])
+        self.status_callback(f"Reparando {len(pending_blocks)} bloques incompletos...")
+        for block_idx in pending_blocks:
+            start_seq, end_seq = block_idx * block_size, min((block_idx + 1) * block_size, total_chunks)
+            missing_seqs = [seq for seq in range(start_seq, end_seq) if seq not in self.received_seqs]
+            # Si no falta ningún trozo solo se perdió el FIN_DE_BLOQUE: se pide el último trozo para
+            # que el emisor lo repita (el duplicado se ignora al llegar).
+            self._send_nack(block_idx, missing_seqs or [end_seq - 1])
+        return True
+
+    def _handle_block_end(self, block_idx, expected_crc=None):
+        if block_idx in self.completed_blocks: 
+            # Nueva ronda de un bloque que ya tenemos: quizá se perdió nuestro ACK.
+            if time.monotonic() - self.ack_times.get(block_idx, 0) >= ACK_REPEAT_INTERVAL:
+                self.ack_times[block_idx] = time.monotonic()
+                self._send_ack(block_idx)
+            return
+            
+        logger.debug("[RCV] RECIBIDO FIN_DE_BLOQUE para el bloque %s.", block_idx)
+        
+        if block_idx > self.last_block_end_seen + 1:
+            logger.warning("[RCV] ADVERTENCIA: Se saltó del bloque %s al %s. ¡El paquete 'fin de bloque' anterior probablemente se perdió!", self.last_block_end_seen, block_idx)
+        self.last_block_end_seen = max(self.last_block_end_seen, block_idx)
+
+        block_size = self.current_session_info['block_size_packets']
+        total_chunks = self.current_session_info['total_chunks']
+        start_seq, end_seq = block_idx * block_size, min((block_idx + 1) * block_size, total_chunks)
+        
+        recovered = self._recover_with_fec(block_idx)
+        if recovered:
+            logger.debug("[RCV] Bloque %s: %s paquetes reconstruidos con FEC.", block_idx, recovered)
+            self.metrics.fec_recovered.inc(recovered)
+
+        missing_seqs = [seq for seq in range(start_seq, end_seq) if seq not in self.received_seqs]
+
+        if missing_seqs:
+            logger.debug("[RCV] Bloque %s: Faltan %s paquetes. Enviando NACK. (Ej: %s)", block_idx, len(missing_seqs), missing_seqs[:5])
+            self._send_nack(block_idx, missing_seqs)
+        elif not self._block_crc_matches(block_idx, end_seq, expected_crc):
+            # Algún trozo llegó alterado: se descarta el bloque entero y se pide de nuevo solo ese bloque.
+            logger.warning("[RCV] Bloque %s: el CRC no coincide con el publicado por el emisor. Pidiendo el bloque completo.", block_idx)
+            self.metrics.block_crc_failures.inc()
+            self.received_seqs.difference_update(range(start_seq, end_seq))
+            self.block_crc_trackers.pop(block_idx, None)
+            self.fec_decoders.pop(block_idx, None)
+            self._send_nack(block_idx, range(start_seq, end_seq))
+        else:
+            logger.debug("[RCV] Bloque %s completo y verificado. No se necesita NACK.", block_idx)
+            self.completed_blocks.add(block_idx)
+            self.pending_nacks.pop(block_idx, None)
+            self.ack_times[block_idx] = time.monotonic()
+            self._send_ack(block_idx)
+            self.received_seqs.difference_update(range(start_seq, end_seq))
+            self.fec_decoders.pop(block_idx, None)
+            block_crc = self._get_crc_tracker(block_idx).result(end_seq)
+            if block_crc is not None: self.block_crcs[block_idx] = block_crc
+            self.block_crc_trackers.pop(block_idx, None)
+            self.metrics.blocks_completed.inc()
+            started = self.block_started.pop(block_idx, None)
+            if started is not None: self.metrics.block_latency.observe(time.monotonic() - started)
+            
+            total_bytes = self.current_session_info['file_size']
+            self.bytes_completed += min(end_seq * self.CHUNK_SIZE, total_bytes) - start_seq * self.CHUNK_SIZE
+            self.progress_callback(self.bytes_completed, total_bytes)
+
+            self.unsaved_blocks.append((self.file_writer.write_token(), block_idx))
+            self._checkpoint_resume_state()
+            self.status_callback(f"Bloque {block_idx + 1} recibido correctamente.")
+
+    def _handle_symbol(self, data):
+        """Símbolo del carrusel: se acumula en el decodificador de su bloque hasta completarlo."""
+        info = self.current_session_info
+        block_idx = int.from_bytes(data[SEQ_SLICE], 'big')
+        symbol_id = parse_symbol_id(data)
+        block_size = info['block_size_packets']
+        start_seq = block_idx * block_size
+        if symbol_id is None or block_idx in self.completed_blocks or start_seq >= info['total_chunks']: return
+        payload = data[HEADER_SIZE + SYMBOL_ID_SIZE:]
+        if len(payload) > self.CHUNK_SIZE: return
+
+        decoder = self.fountain_decoders.get(block_idx)
+        if decoder is None:
+            # Memoria acotada: con demasiados bloques a medias, los nuevos esperan a otra pasada.
+            if sum(d.memory_bytes() for d in self.fountain_decoders.values()) >= self.WRITE_BUFFER_BYTES: return
+            decoder = self.fountain_decoders[block_idx] = FountainDecoder(block_idx, min(block_size, info['total_chunks'] - start_seq), self.CHUNK_SIZE)
+            self.block_started.setdefault(block_idx, time.monotonic())
+        decoder.add_symbol(symbol_id, payload)
+        if decoder.is_complete():
+            self._complete_carousel_block(block_idx, decoder)
+
+    def _complete_carousel_block(self, block_idx, decoder):
+        start_seq = block_idx * self.current_session_info['block_size_packets']
+        file_size = self.current_session_info['file_size']
+        for idx, chunk in decoder.chunks():
+            seq_num = start_seq + idx
+            if seq_num not in self.received_seqs:
+                self._accept_chunk(seq_num, chunk[:file_size - seq_num * self.CHUNK_SIZE])
+        if any(seq_num not in self.received_seqs for seq_num in range(start_seq, start_seq + decoder.k)):
+            return  # Escritor saturado: se reintenta con el siguiente símbolo del bloque.
+        del self.fountain_decoders[block_idx]
+        self._handle_block_end(block_idx)
+
+        total_blocks = -(-self.current_session_info['total_chunks'] // self.current_session_info['block_size_packets'])
+        if len(self.completed_blocks) == total_blocks:
+            logger.info("[RCV] Carrusel: todos los bloques recibidos. Finalizando y verificando archivo.")
+            self._reassemble_file()
+            self._leave_session()
+
+    def _copy_local_block(self, block_idx, expected_crc):
+        """
+        Bloque que el emisor no envía porque todos los receptores lo tienen. Si no lo tenemos ya
+        (reanudación), se copia de la versión anterior del archivo comprobando antes su CRC; si no
+        coincide queda pendiente y se pedirá en las reparaciones finales.
+        """
+        if block_idx in self.completed_blocks or self.file_set or expected_crc is None: return
+        info = self.current_session_info
+        block_size = info['block_size_packets']
+        start_seq, end_seq = block_idx * block_size, min((block_idx + 1) * block_size, info['total_chunks'])
+        offset = start_seq * self.CHUNK_SIZE
+        old_path = os.path.join(info['destination_folder'], info['file_name'])
+        data = read_block(old_path, offset, min(end_seq * self.CHUNK_SIZE, info['file_size']) - offset)
+        if data is None or zlib.crc32(data) != expected_crc:
+            logger.warning("[RCV] Bloque %s: la copia local no coincide; se pedirá al emisor.", block_idx)
+            return
+        for seq_num in range(start_seq, end_seq):
+            if seq_num not in self.received_seqs:
+                position = (seq_num - start_seq) * self.CHUNK_SIZE
+                self._accept_chunk(seq_num, data[position:position + self.CHUNK_SIZE])
+        logger.debug("[RCV] Bloque %s copiado de la versión anterior del archivo.", block_idx)
+        self._handle_block_end(block_idx, expected_crc)
+
+    def _handle_metadata(self, packet):
+        protocol_version = packet.get('protocol_version')
+        if protocol_version not in SUPPORTED_PROTOCOL_VERSIONS:
+            # Los metadatos se repiten (y en carrusel, sin fin): se abandona la sesión en lugar de fallar en cada copia.
+            self.status_callback(f"Error: el emisor usa una versión de protocolo no soportada ({protocol_version}).")
+            self._leave_session()
+            self.completion_callback(status="failed")
+            return
+        self.current_session_info.update(packet)
+        
+        original_chunk_size = self.CHUNK_SIZE
+        self.CHUNK_SIZE = self.current_session_info.get('chunk_size', self.CHUNK_SIZE)
+        # El búfer del socket debe absorber un bloque completo con la geometría del emisor.
+        self._size_receive_buffer(self.CHUNK_SIZE, self.current_session_info.get('block_size_packets', 256))
+        
+        # Configuración recibida del emisor
+        lines = [f"  - SESIÓN: {self.session_name} ({self.session_id[:8]})"]
+        if self.CHUNK_SIZE != original_chunk_size:
+            lines.append(f"  - CHUNK_SIZE: {self.CHUNK_SIZE} bytes (Cambiado desde {original_chunk_size})")
+        else:
+            lines.append(f"  - CHUNK_SIZE: {self.CHUNK_SIZE} bytes (Coincide con el local)")
+        
+        lines.append(f"  - BLOCK_SIZE_PACKETS: {self.current_session_info.get('block_size_packets')}")
+        lines.append(f"  - REPAIR_ROUNDS: {self.current_session_info.get('repair_rounds')}")
+        lines.append(f"  - NACK_LISTEN_TIMEOUT: {self.current_session_info.get('nack_listen_timeout')}")
+        if self.current_session_info.get('nack_backoff') is not None:
+            lines.append(f"  - NACK_BACKOFF: hasta {self.current_session_info['nack_backoff'] * 1000:.0f} ms (NACKs por multicast con supresión)")
+        lines.append(f"  - FEC_PARITY_PACKETS: {self.current_session_info.get('fec_parity_packets', 0)}")
+        lines.append(f"  - WINDOW_BLOCKS: {self.current_session_info.get('window_blocks', 1)}")
+        lines.append(f"  - COMPRESSION: {self.current_session_info.get('compression') or 'off'}")
+        if self.current_session_info.get('carousel'):
+            lines.append("  - MODO: carrusel (sin NACKs, se completa al reunir suficientes símbolos)")
+        if self.current_session_info.get('manifest_parts'):
+            lines.append(f"  - ARCHIVOS: {self.current_session_info.get('file_count')} (manifiesto en {self.current_session_info['manifest_parts']} paquetes)")
+        lines.append("-----------------------------------------------------------")
+        logger.info("--- [RECEIVER] Configuración de Red Recibida del Emisor ---\n%s", "\n".join(lines))
+
+        codec = self.current_session_info.get('compression')
+        if codec and not codec_available(codec):
+            self.status_callback(f"Error: el emisor comprime con '{codec}', que no está instalado (pip install {codec}).")
+            self._leave_session()
+            self.completion_callback(status="cancelled")
+            return
+
+        if self.current_session_info.get('nack_backoff') is not None and not self.current_session_info.get('carousel'):
+            # Para oír los NACK de los demás receptores; si no se puede, se piden por unicast sin esperar.
+            self.nack_address = self.receiver._listen_for_nacks(self)
+
+        if self.current_session_info.get('manifest_parts'):
+            # Varios archivos: la descarga empieza cuando llega el manifiesto completo.
+            self.manifest_parts = {}
+            self.status_callback("Recibiendo la lista de archivos...")
+            return
+        self._open_download()
+
+    def _handle_manifest_part(self, part_idx, payload):
+        info = self.current_session_info
+        if part_idx >= info['manifest_parts']: return
+        self.manifest_parts[part_idx] = payload
+        if len(self.manifest_parts) < info['manifest_parts']: return
+
+        manifest = parse_manifest_parts([self.manifest_parts[idx] for idx in range(info['manifest_parts'])], info.get('manifest_crc32'))
+        if manifest is None:
+            self.manifest_parts = {}  # Se espera a la siguiente repetición de los metadatos.
+            return
+        try:
+            self.file_set = validate_manifest(manifest, info.get('file_size', 0))
+        except ValueError as e:
+            self.status_callback(f"Error: manifiesto de archivos no válido ({e}).")
+            self._leave_session()
+            self.completion_callback(status="cancelled")
+            return
+        self._open_download()
+
+    def _open_download(self):
+        """Crea el archivo temporal (o la carpeta temporal de un conjunto) y empieza a aceptar datos."""
+        destination_folder = self.current_session_info['destination_folder']
+        self.temp_file_path = os.path.join(destination_folder, f".{self.current_session_info['file_name']}.pycast-tmp")
+        state = load_resume_state(destination_folder, self.current_session_info['file_name'])
+        resumable = bool(state) and state_matches(state, self.current_session_info) and os.path.exists(self.temp_file_path)
+        try:
+            files = [(path, size) for path, size, _ in self.file_set[0]] if self.file_set else None
+            self.file_writer = WriteBehindWriter(self.temp_file_path, self.current_session_info.get('file_size', 0),
+                                                 self.WRITE_BUFFER_BYTES, truncate=not resumable, files=files, metrics=self.metrics)
+            if resumable:
+                self._restore_resume_state(state)
+            else:
+                remove_resume_state(destination_folder, self.current_session_info['file_name'])
+            self.status_callback(f"Descargando: {self.current_session_info['session_name']}")
+        except IOError as e:
+            self.status_callback(f"Error al crear archivo temporal: {e}")
+            self._cleanup_temp_file()
+
+    def _restore_resume_state(self, state):
+        block_size = self.current_session_info['block_size_packets']
+        total_blocks = -(-self.current_session_info['total_chunks'] // block_size)
+        block_crcs = {int(block_idx): tuple(value) for block_idx, value in state.get('block_crcs', {}).items()}
+        # Solo se aprovechan los bloques de los que se guardó también el CRC (verificación incremental).
+        held = {block_idx for block_idx in decode_block_bitmap(state.get('blocks', ''))
+                if block_idx < total_blocks and block_idx in block_crcs}
+        file_size = self.current_session_info['file_size']
+        self.completed_blocks.update(held)
+        self.durable_blocks.update(held)
+        self.block_crcs.update((block_idx, block_crcs[block_idx]) for block_idx in held)
+        self.bytes_completed = sum(min(file_size - block_idx * block_size * self.CHUNK_SIZE, block_size * self.CHUNK_SIZE)
+                                   for block_idx in held)
+        logger.info("[RCV] Reanudando descarga: %s de %s bloques ya estaban recibidos.", len(held), total_blocks)
+        self.status_callback(f"Reanudando: {len(held)} de {total_blocks} bloques ya recibidos.")
+        self.progress_callback(self.bytes_completed, file_size)
+
+    def _checkpoint_resume_state(self, force=False):
+        """Guarda (como mucho cada RESUME_SAVE_INTERVAL) los bloques completados que ya están en el archivo."""
+        writer = self.file_writer
+        if writer:
+            still_pending = []
+            for token, block_idx in self.unsaved_blocks:
+                if writer.is_written(token): self.durable_blocks.add(block_idx)
+                else: still_pending.append((token, block_idx))
+            self.unsaved_blocks = still_pending
+        if not force and time.time() - self.last_resume_save < RESUME_SAVE_INTERVAL: return
+        self.last_resume_save = time.time()
+
+        info = self.current_session_info
+        total_blocks = -(-info['total_chunks'] // info['block_size_packets'])
+        state = {key: info.get(key) for key in ('file_name', 'file_size', 'file_mtime', 'file_crc32', 'manifest_crc32',
+                                                'chunk_size', 'block_size_packets')}
+        state['blocks'] = encode_block_bitmap(self.durable_blocks, total_blocks)
+        state['block_crcs'] = {str(block_idx): self.block_crcs[block_idx] for block_idx in self.durable_blocks if block_idx in self.block_crcs}
+        try:
+            save_resume_state(info['destination_folder'], state)
+        except OSError as e:
+            logger.warning("[RCV] No se pudo guardar el estado para reanudar: %s", e)
+
+    def suspend(self):
+        """
+        Interrumpe la descarga en curso conservando el archivo temporal y el estado de los bloques
+        recibidos, para reanudarla al volver a unirse a una sesión con el mismo archivo.
+        """
+        if not self.file_writer or not self.completed_blocks:
+            self._cleanup_temp_file()
+            return
+        writer, self.file_writer = self.file_writer, None
+        try:
+            writer.close()
+        except OSError as e:
+            logger.error("[RCV] Error de escritura al interrumpir la descarga: %s", e)
+            self._cleanup_temp_file()
+            return
+        self.durable_blocks.update(self.completed_blocks)
+        self.unsaved_blocks.clear()
+        self._checkpoint_resume_state(force=True)
+        logger.info("[RCV] Descarga interrumpida: %s bloques guardados para reanudar.", len(self.completed_blocks))
+        self.temp_file_path = None
+
+    def _reassemble_file(self):
+        output_path = None
+        try:
+            if self.file_writer:
+                writer, self.file_writer = self.file_writer, None
+                writer.close()
+                stats = writer.stats()
+                logger.info("[RCV] Escritura diferida: %.1f MB en %s escrituras, pico de búfer %.1f MB, %s paquetes descartados por búfer lleno.", stats['bytes_written'] / (1024 * 1024), stats['write_calls'], stats['peak_pending_bytes'] / (1024 * 1024), stats['dropped_chunks'])
+                if self.nack_address:
+                    logger.info("[RCV] NACKs: %s enviados, %s suprimidos porque otro receptor ya los había pedido.", self.nacks_sent, self.nacks_suppressed)
+                ring = self.receiver.ring_stats()
+                if ring:
+                    logger.info("[RCV] Anillo de recepción: pico de %s/%s huecos ocupados, %s veces lleno.", ring['peak_occupancy'], ring['slots'], ring['full_waits'])
+
+            if self.file_set:
+                self._finish_file_set()
+                return
+            
+            output_path = os.path.join(self.current_session_info['destination_folder'], self.current_session_info['file_name'])
+            shutil.move(self.temp_file_path, output_path)
+            
+            if not os.path.exists(output_path):
+                self.status_callback("Error CRÍTICO: El archivo no se pudo guardar.")
+                return
+
+            self.status_callback("Verificando integridad del archivo...")
+            expected_crc = self.current_session_info.get('file_crc32')
+            expected_size = self.current_session_info.get('file_size')
+
+            if expected_crc is None:
+                self.status_callback(f"Archivo '{self.current_session_info['file_name']}' descargado. (Sin verificación CRC)")
+                self.completion_callback(status="completed")
+                return
+
+            received_crc = self._incremental_file_crc32()
+            if received_crc is None:
+                logger.info("[RCV] Faltan CRC parciales de algún bloque; verificando con una lectura completa del archivo.")
+                try:
+                    received_crc = compute_file_crc32(output_path)
+                except OSError:
+                    received_crc = None  # Archivo ilegible: se informa como fallo de verificación.
+            received_size = os.path.getsize(output_path)
+
+            if received_size == expected_size and received_crc == expected_crc:
+                self.status_callback(f"Archivo '{self.current_session_info['file_name']}' descargado y verificado con éxito.")
+                total_bytes = self.current_session_info.get('file_size', 1)
+                self.progress_callback(total_bytes, total_bytes)
+                self.completion_callback(status="completed")
+            else:
+                logger.error("[RCV] ¡FALLO DE VERIFICACIÓN! Esperado: (size=%s, crc=%s), Recibido: (size=%s, crc=%s)", expected_size, expected_crc, received_size, received_crc)
+                self.status_callback("¡ERROR! El archivo está corrupto. Eliminando...")
+                os.remove(output_path) 
+                self.completion_callback(status="failed_verification")
+
+        except Exception as e:
+            self.status_callback(f"Error al finalizar la descarga: {e}")
+            if output_path and os.path.exists(output_path):
+                try: os.remove(output_path)
+                except: pass
+        finally:
+            self._cleanup_temp_file()
+            if self.current_session_info.get('file_name'):
+                remove_resume_state(self.current_session_info['destination_folder'], self.current_session_info['file_name'])
+
+
+    def _finish_file_set(self):
+        """Verifica el conjunto en la carpeta temporal y solo entonces mueve cada archivo a su sitio."""
+        info = self.current_session_info
+        files, dirs = self.file_set
+        expected_crc = info.get('file_crc32')
+        if expected_crc is not None:
+            self.status_callback("Verificando integridad de los archivos...")
+            received_crc = self._incremental_file_crc32()
+            if received_crc is None:
+                logger.info("[RCV] Faltan CRC parciales de algún bloque; verificando con una lectura completa de los archivos.")
+                received_crc = file_set_crc32(os.path.join(self.temp_file_path, path) for path, _, _ in files)
+            if received_crc != expected_crc:
+                logger.error("[RCV] ¡FALLO DE VERIFICACIÓN! Esperado: crc=%s, Recibido: crc=%s", expected_crc, received_crc)
+                self.status_callback("¡ERROR! Los archivos están corruptos. Eliminando...")
+                self.completion_callback(status="failed_verification")
+                return
+
+        place_file_set(self.temp_file_path, info['destination_folder'], files, dirs)
+        verified = "y verificados " if expected_crc is not None else ""
+        self.status_callback(f"{len(files)} archivos de '{info['file_name']}' descargados {verified}con éxito.")
+        total_bytes = info.get('file_size', 0)
+        self.progress_callback(total_bytes, total_bytes)
+        self.completion_callback(status="completed")
+
+    def _incremental_file_crc32(self):
+        """CRC32 del archivo combinando los CRC de cada bloque (O(bloques)), o None si falta alguno."""
+        block_size = self.current_session_info['block_size_packets']
+        total_blocks = -(-self.current_session_info['total_chunks'] // block_size)
+        if len(self.block_crcs) != total_blocks:
+            return None
+        return crc32_concat(self.block_crcs[block_idx] for block_idx in range(total_blocks))
+
+    def _cleanup_temp_file(self):
+        if self.file_writer:
+            try: self.file_writer.discard()
+            except: pass
+            self.file_writer = None
+        if self.temp_file_path and os.path.exists(self.temp_file_path):
+            try:
+                # Con varios archivos el temporal es una carpeta.
+                if os.path.isdir(self.temp_file_path): shutil.rmtree(self.temp_file_path)
+                else: os.remove(self.temp_file_path)
+            except: pass
+            self.temp_file_path = None
\ No newline at end of file
@@ -0,0 +1,78 @@
+# session_endpoints.py
+"""
+Grupo multicast y puertos propios de cada sesión.
+
+Cada emisor elige al iniciar la sesión un grupo al azar del rango configurado y un par de
+puertos libres del rango de puertos: P para el handshake (TCP) y los datos (UDP multicast)
+y P+1 para los NACK (UDP). Así varios emisores pueden convivir en el mismo equipo, y cada
+receptor se une solo al grupo de la sesión que descarga: el tráfico de las demás lo
+descartan la tarjeta de red y el kernel en lugar de llegar al programa.
+
+Todo ello se anuncia en el registro TXT de Zeroconf. Las sesiones que no lo anuncian son de
+versiones anteriores, con grupo y puertos fijos y el protocolo JSON que este receptor ya no
+entiende: se rechazan al unirse.
+"""
+import ipaddress
+import random
+import socket
+
+def parse_group_range(text):
+    """Grupos multicast de un rango en notación CIDR ('239.192.2.0/24'). Lanza ValueError si no es válido."""
+    network = ipaddress.ip_network(text.strip(), strict=False)
+    if network.version != 4 or not network.is_multicast:
+        raise ValueError(f"El rango {text} no es de direcciones multicast IPv4.")
+    hosts = list(network.hosts()) or [network.network_address]
+    return [str(address) for address in hosts]
+
+def parse_port_range(text):
+    """(primero, último) de un rango 'inicio-fin'. Lanza ValueError si no es válido o tiene menos de 2 puertos."""
+    start, _, end = text.partition('-')
+    start, end = int(start), int(end or start)
+    if not 1024 <= start < end <= 65535:
+        raise ValueError(f"Rango de puertos no válido: {text}")
+    return start, end
+
+def _ports_free(port):
+    """True si se pueden abrir el handshake (TCP) en `port` y los NACK (UDP) en `port + 1`."""
+    tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        tcp.bind(('', port))
+        udp.bind(('', port + 1))
+        return True
+    except OSError:
+        return False
+    finally:
+        tcp.close()
+        udp.close()
+
+def allocate_session_endpoints(net_conf):
+    """
+    Elige grupo y puertos para una sesión nueva a partir de la configuración de red.
+    Devuelve {'multicast_group', 'data_port', 'handshake_port', 'nack_port'}; lanza
+    ValueError si los rangos no son válidos o no queda ningún par de puertos libre.
+    """
+    groups = parse_group_range(net_conf.get('multicast_group_range', '239.192.2.0/24'))
+    first, last = parse_port_range(net_conf.get('session_port_range', '5100-5199'))
+    candidates = list(range(first, last, 2))
+    random.shuffle(candidates)
+    for port in candidates:
+        if _ports_free(port):
+            return {'multicast_group': random.choice(groups), 'data_port': port,
+                    'handshake_port': port, 'nack_port': port + 1}
+    raise ValueError(f"No hay puertos libres en el rango {first}-{last}.")
+
+def session_endpoints(session_info):
+    """
+    Grupo y puertos anunciados por una sesión. Lanza ValueError si no los anuncia (emisor de una
+    versión anterior, incompatible) o no son válidos.
+    """
+    keys = ('multicast_group', 'data_port', 'handshake_port', 'nack_port')
+    if not all(session_info.get(key) for key in keys):
+        raise ValueError("El emisor usa una versión anterior de PyCast, incompatible con esta: debe actualizarse.")
+    try:
+        return {'multicast_group': session_info['multicast_group'], 'data_port': int(session_info['data_port']),
+                'handshake_port': int(session_info['handshake_port']), 'nack_port': int(session_info['nack_port'])}
+    except (TypeError, ValueError):
+        raise ValueError("La sesión anuncia un grupo o unos puertos no válidos.")
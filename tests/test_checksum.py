@@ -0,0 +1,37 @@
+# tests/test_checksum.py
+import os
+import random
+import zlib
+
+from checksum import ChunkedCrc32, compute_file_crc32, crc32_combine, crc32_concat
+
+def test_crc32_combine_matches_whole_crc():
+    rng = random.Random(1)
+    data = rng.randbytes(100_000)
+    for split in (0, 1, 4095, 50_000, len(data)):
+        a, b = data[:split], data[split:]
+        assert crc32_combine(zlib.crc32(a), zlib.crc32(b), len(b)) == zlib.crc32(data)
+
+def test_crc32_concat_of_blocks_matches_file_crc():
+    rng = random.Random(2)
+    blocks = [rng.randbytes(rng.randint(1, 9000)) for _ in range(20)]
+    parts = [(zlib.crc32(block), len(block)) for block in blocks]
+    assert crc32_concat(parts) == zlib.crc32(b''.join(blocks))
+
+def test_chunked_crc32_out_of_order():
+    rng = random.Random(3)
+    chunks = [rng.randbytes(1024) for _ in range(16)]
+    order = list(range(16))
+    rng.shuffle(order)
+    crc = ChunkedCrc32(100)
+    for idx in order[:-1]:
+        crc.add(100 + idx, chunks[idx])
+    assert crc.result(116) is None
+    crc.add(100 + order[-1], chunks[order[-1]])
+    assert crc.result(116) == (zlib.crc32(b''.join(chunks)), 16 * 1024)
+
+def test_compute_file_crc32(tmp_path):
+    data = os.urandom(200_000)
+    path = tmp_path / 'f.bin'
+    path.write_bytes(data)
+    assert compute_file_crc32(path) == zlib.crc32(data)
@@ -0,0 +1,24 @@
+# tests/test_compression.py
+import os
+
+from compression import CODEC_FLAGS, MIN_BYPASS_CHUNKS, SAMPLE_CHUNKS, AdaptiveCompressor, decompress
+
+def test_zlib_round_trip():
+    compressor = AdaptiveCompressor('zlib')
+    chunk = b'pycast ' * 1000
+    packed = compressor.compress(chunk)
+    assert packed is not None and len(packed) < len(chunk)
+    assert decompress(CODEC_FLAGS['zlib'], packed, len(chunk)) == chunk
+
+def test_decompress_rejects_invalid_data():
+    packed = AdaptiveCompressor('zlib').compress(b'a' * 4096)
+    assert decompress(CODEC_FLAGS['zlib'], packed[:-4], 4096) is None
+    assert decompress(CODEC_FLAGS['zlib'], packed, 100) is None  # Más grande que el trozo
+
+def test_incompressible_data_pauses_compression():
+    compressor = AdaptiveCompressor('zlib')
+    for _ in range(SAMPLE_CHUNKS):
+        assert compressor.compress(os.urandom(4096)) is None
+    assert compressor.bypass_remaining == MIN_BYPASS_CHUNKS
+    # Durante la pausa ni siquiera los datos comprimibles se comprimen.
+    assert compressor.compress(b'a' * 4096) is None
@@ -0,0 +1,54 @@
+# tests/test_disk_writer.py
+import os
+
+import pytest
+
+import disk_writer
+from disk_writer import WriteBehindWriter
+
+def test_out_of_order_chunks(tmp_path):
+    data = os.urandom(100_000)
+    path = tmp_path / 'out.bin'
+    writer = WriteBehindWriter(str(path), len(data), 1 << 20)
+    for offset in reversed(range(0, len(data), 1000)):
+        assert writer.submit(offset, data[offset:offset + 1000])
+    writer.close()
+    assert path.read_bytes() == data
+
+def test_resubmitted_chunk_does_not_leak_pending_bytes(tmp_path):
+    writer = WriteBehindWriter(str(tmp_path / 'out.bin'), 100, 1000)
+    with writer.cond:  # Con el cerrojo tomado el hilo no puede llevarse el trozo todavía.
+        assert writer.submit(0, b'a' * 10)
+        assert writer.submit(0, b'b' * 10)
+        assert writer.pending_bytes == 10
+    writer.close()
+    assert writer.pending_bytes == 0
+    assert (tmp_path / 'out.bin').read_bytes()[:10] == b'b' * 10
+
+@pytest.mark.skipif(not hasattr(os, 'pwritev'), reason="sin pwritev (Windows)")
+def test_short_writes_are_completed(tmp_path, monkeypatch):
+    path = tmp_path / 'out.bin'
+    path.write_bytes(b'\0' * 20)
+    real_pwrite = os.pwrite
+    monkeypatch.setattr(os, 'pwritev', lambda fd, buffers, offset: real_pwrite(fd, bytes(buffers[0][:3]), offset))
+    monkeypatch.setattr(os, 'pwrite', lambda fd, data, offset: real_pwrite(fd, bytes(data[:2]), offset))
+    fd = os.open(path, os.O_RDWR)
+    try:
+        disk_writer._write_buffers(fd, 0, [b'0123456789', b'abc'])
+    finally:
+        os.close(fd)
+    assert path.read_bytes()[:13] == b'0123456789abc'
+
+@pytest.mark.skipif(not hasattr(os, 'pwritev'), reason="sin pwritev (Windows)")
+def test_zero_byte_write_raises(tmp_path, monkeypatch):
+    path = tmp_path / 'out.bin'
+    path.write_bytes(b'\0' * 20)
+    real_pwrite = os.pwrite
+    monkeypatch.setattr(os, 'pwritev', lambda fd, buffers, offset: real_pwrite(fd, bytes(buffers[0][:3]), offset))
+    monkeypatch.setattr(os, 'pwrite', lambda fd, data, offset: 0)
+    fd = os.open(path, os.O_RDWR)
+    try:
+        with pytest.raises(OSError):
+            disk_writer._write_buffers(fd, 0, [b'0123456789'])
+    finally:
+        os.close(fd)
@@ -0,0 +1,47 @@
+# tests/test_fec.py
+import random
+
+from fec import ParityDecoder, ParityEncoder, decode_parity_seq, encode_parity_seq
+
+CHUNK_SIZE = 512
+
+def _block(start_seq, count, seed=0):
+    rng = random.Random(seed)
+    return {start_seq + i: rng.randbytes(CHUNK_SIZE) for i in range(count)}
+
+def _decoder_with(chunks, start_seq, end_seq, parity_count, lost):
+    encoder = ParityEncoder(start_seq, end_seq, parity_count, CHUNK_SIZE)
+    for seq, chunk in chunks.items():
+        encoder.add_chunk(seq, chunk)
+    decoder = ParityDecoder(start_seq, end_seq, parity_count, CHUNK_SIZE)
+    for seq, chunk in chunks.items():
+        if seq not in lost: decoder.add_chunk(seq, chunk)
+    for group, payload in encoder.parity_payloads():
+        decoder.add_parity(group, payload)
+    return decoder, set(chunks) - set(lost)
+
+def test_parity_recovers_one_loss_per_group():
+    start, end, parity_count = 64, 96, 4
+    chunks = _block(start, end - start)
+    lost = {64, 69, 74, 95}  # Grupos 0, 1, 2 y 3
+    decoder, received = _decoder_with(chunks, start, end, parity_count, lost)
+    recovered = dict(decoder.recover(received))
+    assert recovered == {seq: chunks[seq] for seq in lost}
+
+def test_parity_skips_groups_with_two_losses():
+    start, end, parity_count = 0, 16, 4
+    chunks = _block(start, end - start, seed=1)
+    lost = {0, 4, 1}  # Dos pérdidas en el grupo 0, una en el 1
+    decoder, received = _decoder_with(chunks, start, end, parity_count, lost)
+    assert dict(decoder.recover(received)) == {1: chunks[1]}
+
+def test_short_last_block():
+    start, end, parity_count = 32, 34, 4  # Menos trozos que paquetes de paridad
+    chunks = _block(start, end - start, seed=2)
+    decoder, received = _decoder_with(chunks, start, end, parity_count, {33})
+    assert dict(decoder.recover(received)) == {33: chunks[33]}
+
+def test_parity_seq_round_trip():
+    for block_idx in (0, 1, 1000):
+        for group in range(8):
+            assert decode_parity_seq(encode_parity_seq(block_idx, group, 8), 8) == (block_idx, group)
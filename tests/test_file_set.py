@@ -0,0 +1,64 @@
+# tests/test_file_set.py
+import os
+import zlib
+
+import pytest
+
+from disk_writer import WriteBehindWriter
+from file_set import (file_set_crc32, open_file_set_source, place_file_set, safe_relative_path, scan_paths,
+                      validate_manifest)
+
+def _make_tree(root):
+    (root / 'album' / 'sub').mkdir(parents=True)
+    (root / 'album' / 'empty').mkdir()
+    contents = {'album/a.txt': b'hola' * 1000, 'album/sub/b.bin': os.urandom(50_000), 'album/zero': b''}
+    for path, data in contents.items():
+        (root / path).write_bytes(data)
+    (root / 'single.bin').write_bytes(os.urandom(3000))
+    contents['single.bin'] = (root / 'single.bin').read_bytes()
+    return contents
+
+def test_scan_and_source_round_trip(tmp_path):
+    contents = _make_tree(tmp_path)
+    manifest, sources = scan_paths([tmp_path / 'album', tmp_path / 'single.bin'])
+    names = [path for path, _, _ in manifest['files']]
+    assert sorted(names) == sorted(contents)
+    assert manifest['dirs'] == ['album/empty']
+    joined = b''.join(contents[name] for name in names)
+    sizes = [size for _, size, _ in manifest['files']]
+    with open_file_set_source(sources, sizes) as source:
+        assert len(source) == len(joined)
+        # Rebanadas que cruzan los límites entre archivos.
+        for start in range(0, len(joined), 4096):
+            assert source[start:start + 4096] == joined[start:start + 4096]
+    assert file_set_crc32(sources) == zlib.crc32(joined)
+
+def test_transfer_through_writer_and_place(tmp_path):
+    contents = _make_tree(tmp_path / 'src')
+    manifest, sources = scan_paths([tmp_path / 'src' / 'album'])
+    files, dirs = validate_manifest(manifest, sum(size for _, size, _ in manifest['files']))
+    staging, destination = tmp_path / 'staging', tmp_path / 'dest'
+    destination.mkdir()
+    chunk_size = 1000
+    with open_file_set_source(sources, [size for _, size, _ in files]) as source:
+        writer = WriteBehindWriter(str(staging), len(source), 1 << 20, files=[(path, size) for path, size, _ in files])
+        for offset in reversed(range(0, len(source), chunk_size)):  # Desordenado a propósito
+            assert writer.submit(offset, source[offset:offset + chunk_size])
+        writer.close()
+    place_file_set(staging, destination, files, dirs)
+    for path in ('album/a.txt', 'album/sub/b.bin', 'album/zero'):
+        assert (destination / path).read_bytes() == contents[path]
+    assert (destination / 'album' / 'empty').is_dir()
+
+@pytest.mark.parametrize('path', ['/etc/passwd', '../x', 'a/../b', 'a//b', 'C:/x', 'a\\b', ''])
+def test_safe_relative_path_rejects(path):
+    with pytest.raises(ValueError):
+        safe_relative_path(path)
+
+def test_validate_manifest_rejects_wrong_size():
+    manifest = {'files': [['a', 10, 0], ['b', 5, 0]], 'dirs': []}
+    assert validate_manifest(manifest, 15)[0] == [('a', 10, 0), ('b', 5, 0)]
+    with pytest.raises(ValueError):
+        validate_manifest(manifest, 16)
+    with pytest.raises(ValueError):
+        validate_manifest({'files': [['a', 5, 0], ['a', 5, 0]]}, 10)
@@ -0,0 +1,40 @@
+# tests/test_fountain.py
+import random
+
+from fountain import FountainDecoder, FountainEncoder
+
+CHUNK_SIZE = 256
+
+def _chunks(k, seed):
+    rng = random.Random(seed)
+    return [rng.randbytes(CHUNK_SIZE) for _ in range(k)]
+
+def test_systematic_symbols_without_loss():
+    chunks = _chunks(32, 1)
+    encoder = FountainEncoder(5, chunks, CHUNK_SIZE)
+    decoder = FountainDecoder(5, len(chunks), CHUNK_SIZE)
+    for symbol_id in range(len(chunks)):
+        decoder.add_symbol(symbol_id, encoder.symbol(symbol_id))
+    assert decoder.is_complete()
+    assert [chunk for _, chunk in decoder.chunks()] == chunks
+
+def test_recovers_block_with_loss():
+    k = 64
+    chunks = _chunks(k, 2)
+    encoder = FountainEncoder(3, chunks, CHUNK_SIZE)
+    decoder = FountainDecoder(3, k, CHUNK_SIZE)
+    rng = random.Random(3)
+    symbol_id = 0
+    while not decoder.is_complete():
+        assert symbol_id < 4 * k, "el bloque debería decodificarse con bastantes menos símbolos"
+        if rng.random() >= 0.3:  # 30% de pérdida
+            decoder.add_symbol(symbol_id, encoder.symbol(symbol_id))
+        symbol_id += 1
+    assert [chunk for _, chunk in decoder.chunks()] == chunks
+
+def test_repeated_symbol_adds_nothing():
+    chunks = _chunks(8, 4)
+    encoder = FountainEncoder(0, chunks, CHUNK_SIZE)
+    decoder = FountainDecoder(0, 8, CHUNK_SIZE)
+    assert decoder.add_symbol(2, encoder.symbol(2))
+    assert not decoder.add_symbol(2, encoder.symbol(2))
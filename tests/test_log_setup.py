@@ -0,0 +1,25 @@
+# tests/test_log_setup.py
+import logging
+
+from log_setup import RateLimitFilter
+
+def _record(msg, *args):
+    return logging.LogRecord('pycast', logging.INFO, __file__, 1, msg, args, None)
+
+def test_same_template_is_limited():
+    rate_filter = RateLimitFilter(interval=60, burst=3)
+    passed = [rate_filter.filter(_record("[SND] Bloque %s.", block)) for block in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+
+def test_omitted_count_is_reported():
+    rate_filter = RateLimitFilter(interval=0.0, burst=1)
+    rate_filter.windows[('pycast', "Aviso %s")] = [0.0, 1, 4]  # Ventana vencida con 4 omitidos
+    record = _record("Aviso %s", 1)
+    assert rate_filter.filter(record)
+    assert record.getMessage() == "Aviso 1 (+4 mensajes iguales omitidos)"
+
+def test_windows_are_bounded():
+    rate_filter = RateLimitFilter(interval=60, burst=3, max_keys=100)
+    for i in range(1000):
+        rate_filter.filter(_record(f"Mensaje ya formateado {i}"))
+    assert len(rate_filter.windows) <= 100
@@ -0,0 +1,42 @@
+# tests/test_protocol.py
+import os
+
+from protocol import RECEIVER_ID_SIZE, decode_nack, encode_nack, nack_receiver_id
+
+SESSION = os.urandom(16)
+
+def _decode_all(datagrams):
+    seqs = []
+    for datagram in datagrams:
+        session_id_bytes, block_index, part = decode_nack(datagram)
+        assert session_id_bytes == SESSION and block_index == 7
+        seqs.extend(part)
+    return seqs
+
+def test_nack_ranges_round_trip():
+    missing = list(range(1000, 1100)) + list(range(5000, 5003))
+    datagrams = encode_nack(SESSION, 7, missing)
+    assert _decode_all(datagrams) == missing
+
+def test_nack_bitmap_round_trip():
+    missing = list(range(2000, 4000, 3))  # Huecos dispersos: sale más barato el mapa de bits
+    datagrams = encode_nack(SESSION, 7, set(missing))
+    assert _decode_all(datagrams) == missing
+
+def test_nack_spanning_several_datagrams():
+    missing = list(range(0, 200_000, 7))
+    datagrams = encode_nack(SESSION, 7, missing)
+    assert len(datagrams) > 1
+    assert _decode_all(datagrams) == missing
+
+def test_nack_receiver_id():
+    receiver_id = os.urandom(RECEIVER_ID_SIZE)
+    datagrams = encode_nack(SESSION, 7, [1, 2, 3, 10], receiver_id)
+    assert all(nack_receiver_id(datagram) == receiver_id for datagram in datagrams)
+    assert _decode_all(datagrams) == [1, 2, 3, 10]
+    assert nack_receiver_id(encode_nack(SESSION, 7, [1])[0]) is None
+
+def test_decode_nack_rejects_truncated():
+    datagram = encode_nack(SESSION, 7, list(range(0, 100, 2)))[0]
+    assert decode_nack(datagram[:-10]) is None
+    assert decode_nack(b'XX' + datagram[2:]) is None
@@ -0,0 +1,31 @@
+# tests/test_resume_state.py
+from resume_state import (decode_block_bitmap, encode_block_bitmap, load_resume_state, remove_resume_state,
+                          save_resume_state, state_matches)
+
+METADATA = {'file_name': 'video.mkv', 'file_size': 10_000_000, 'file_mtime': 1700000000,
+            'chunk_size': 8192, 'block_size_packets': 256, 'file_crc32': 1234}
+
+def test_block_bitmap_round_trip():
+    blocks = {0, 1, 7, 8, 100, 4999}
+    assert decode_block_bitmap(encode_block_bitmap(blocks, 5000)) == blocks
+    assert decode_block_bitmap(encode_block_bitmap(set(), 10)) == set()
+    assert decode_block_bitmap(encode_block_bitmap({10, 11}, 10)) == set()  # Fuera de rango
+    assert decode_block_bitmap('no es base64!') == set()
+
+def test_save_load_remove(tmp_path):
+    state = dict(METADATA, blocks=encode_block_bitmap({1, 2, 3}, 5))
+    save_resume_state(tmp_path, state)
+    assert load_resume_state(tmp_path, 'video.mkv') == state
+    remove_resume_state(tmp_path, 'video.mkv')
+    assert load_resume_state(tmp_path, 'video.mkv') is None
+
+def test_load_ignores_incomplete_state(tmp_path):
+    save_resume_state(tmp_path, {'file_name': 'video.mkv'})
+    assert load_resume_state(tmp_path, 'video.mkv') is None
+
+def test_state_matches():
+    assert state_matches(dict(METADATA), METADATA)
+    assert not state_matches(dict(METADATA, file_size=1), METADATA)
+    assert not state_matches(dict(METADATA, file_crc32=99), METADATA)
+    # Un CRC desconocido en cualquiera de los dos lados no impide reanudar.
+    assert state_matches(dict(METADATA, file_crc32=None), METADATA)
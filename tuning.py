@@ -0,0 +1,318 @@
+# tuning.py
+"""
+Sonda de ajuste automático de la configuración de red.
+
+Todo receptor en escucha (o `pycast_app.py tune --respond`) ejecuta un ProbeResponder que
+cuenta los datagramas de prueba que recibe por multicast. NetworkProbe mide primero el RTT
+y luego, para cada tamaño de trozo y de bloque, envía bloques a ráfaga esperando tras cada
+uno el recuento del respondedor, igual que el protocolo real espera los NACKs. De cada
+prueba obtiene el caudal útil y la pérdida, y con la mejor propone los ajustes de red, que
+se guardan en la configuración por subred ('network_profiles'). Al arrancar en una red con
+perfil, sus ajustes se aplican sobre una copia de la configuración: nunca se escriben en
+'network_settings', que siguen siendo los valores base del resto de redes.
+
+La subred se obtiene de la máscara real de la interfaz solo en Linux; en otros sistemas se
+supone /24, y el usuario puede indicar otra al ajustar (`tune --network 10.0.0.0/16`).
+"""
+import logging
+import ipaddress
+import random
+import socket
+import struct
+import threading
+import time
+from datetime import datetime
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: sin ioctl para leer la máscara de red.
+from service_discovery import get_local_ip
+
+logger = logging.getLogger(__name__)
+
+PROBE_GROUP = '239.192.1.100'
+PROBE_PORT = 5010
+MULTICAST_TTL = 1
+
+PROBE_MAGIC = b'PT'
+# magic, tipo, id de sonda, nº de prueba, secuencia. Los recuentos se asocian al id de
+# sonda y no a la IP de origen, que puede diferir entre el tráfico multicast y el de control.
+_PROBE_HEADER = struct.Struct('!2sBIHI')
+# Tras la cabecera de un informe: paquetes y bytes recibidos en la prueba
+_REPORT_BODY = struct.Struct('!IQ')
+
+KIND_DATA = 1
+KIND_REPORT_REQUEST = 2
+KIND_REPORT = 3
+KIND_PING = 4
+KIND_PONG = 5
+
+# Barrido en dos pasos: primero el tamaño de trozo con un bloque intermedio, luego el bloque.
+CHUNK_SIZES = (4096, 8192, 16384, 32768, 61440)
+BLOCK_SIZES = (128, 256, 512)
+DEFAULT_BLOCK_SIZE = 256
+# Bytes enviados por prueba (en bloques completos; al menos uno).
+TRIAL_BYTES = 16 * 1024 * 1024
+# Las pruebas con más pérdida solo se eligen si ninguna la tiene menor.
+MAX_ACCEPTABLE_LOSS = 0.05
+
+class ProbeError(Exception):
+    """El respondedor no contesta o la prueba no se pudo completar."""
+
+class ProbeResponder:
+    """Cuenta los datagramas de prueba recibidos y contesta pings y peticiones de recuento."""
+    def __init__(self, port=PROBE_PORT):
+        self.port = port
+        self.sock = None
+        self.thread = None
+        self.is_running = False
+        # id de sonda -> [nº de prueba, paquetes, bytes]
+        self.counters = {}
+
+    def start(self):
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.sock.bind(('', self.port))
+            # Como el receptor real, que dimensiona su búfer para absorber un bloque en ráfaga.
+            try:
+                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, (CHUNK_SIZES[-1] + _PROBE_HEADER.size) * BLOCK_SIZES[-1])
+            except OSError:
+                pass
+            mreq = socket.inet_aton(PROBE_GROUP) + socket.inet_aton('0.0.0.0')
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+            self.sock.settimeout(0.5)
+        except OSError as e:
+            logger.warning("[TUNE] No se pudo iniciar el respondedor de ajuste en el puerto %s: %s", self.port, e)
+            if self.sock: self.sock.close()
+            self.sock = None
+            return False
+        self.is_running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        self.is_running = False
+        if self.sock: self.sock.close()
+
+    def _run(self):
+        while self.is_running:
+            try:
+                data, addr = self.sock.recvfrom(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if len(data) < _PROBE_HEADER.size or data[:2] != PROBE_MAGIC: continue
+            _, kind, probe_id, trial, seq = _PROBE_HEADER.unpack_from(data)
+            if kind == KIND_DATA:
+                counter = self.counters.get(probe_id)
+                if counter is None or counter[0] != trial:
+                    counter = self.counters[probe_id] = [trial, 0, 0]
+                counter[1] += 1
+                counter[2] += len(data)
+            elif kind == KIND_REPORT_REQUEST:
+                counter = self.counters.get(probe_id)
+                packets, nbytes = (counter[1], counter[2]) if counter and counter[0] == trial else (0, 0)
+                reply = _PROBE_HEADER.pack(PROBE_MAGIC, KIND_REPORT, probe_id, trial, seq) + _REPORT_BODY.pack(packets, nbytes)
+                self._reply(reply, addr)
+            elif kind == KIND_PING:
+                self._reply(_PROBE_HEADER.pack(PROBE_MAGIC, KIND_PONG, probe_id, trial, seq), addr)
+
+    def _reply(self, packet, addr):
+        try:
+            self.sock.sendto(packet, addr)
+        except OSError:
+            pass
+
+class NetworkProbe:
+    """Sondea la red contra un respondedor y propone los ajustes de red."""
+    def __init__(self, peer_ip, progress_callback=None, port=PROBE_PORT):
+        self.peer = (peer_ip, port)
+        self.port = port
+        self.progress_callback = progress_callback or (lambda message: None)
+        self.probe_id = random.getrandbits(32)
+        self.rtt = None
+        self.trial_count = 0
+
+    def run(self):
+        """Ejecuta el barrido completo. Devuelve {'settings', 'rtt', 'best', 'trials'} o lanza ProbeError."""
+        data_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        data_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, MULTICAST_TTL)
+        control_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self.rtt = self.measure_rtt(control_sock)
+            self.progress_callback(f"RTT con {self.peer[0]}: {self.rtt * 1000:.2f} ms")
+
+            trials = []
+            for chunk_size in CHUNK_SIZES:
+                trials.append(self.run_trial(data_sock, control_sock, chunk_size, DEFAULT_BLOCK_SIZE))
+            best_chunk = _best_trial(trials)['chunk_size']
+            for block_size in BLOCK_SIZES:
+                if block_size != DEFAULT_BLOCK_SIZE:
+                    trials.append(self.run_trial(data_sock, control_sock, best_chunk, block_size))
+        finally:
+            data_sock.close()
+            control_sock.close()
+
+        best = _best_trial(trials)
+        if best['loss'] >= 1.0:
+            raise ProbeError("El respondedor contesta pero no recibe el tráfico multicast de prueba. Revisa el firewall o el soporte multicast de la red.")
+        return {'settings': recommend_settings(best, self.rtt), 'rtt': self.rtt, 'best': best, 'trials': trials}
+
+    def measure_rtt(self, control_sock, samples=5):
+        rtts = []
+        for seq in range(samples):
+            reply, elapsed = self._request(control_sock, _PROBE_HEADER.pack(PROBE_MAGIC, KIND_PING, self.probe_id, 0, seq), KIND_PONG, seq, timeout=1.0)
+            if reply is not None: rtts.append(elapsed)
+        if not rtts:
+            raise ProbeError(f"El respondedor {self.peer[0]}:{self.port} no contesta. ¿Está el receptor en escucha?")
+        return min(rtts)
+
+    def run_trial(self, data_sock, control_sock, chunk_size, block_size):
+        self.trial_count += 1
+        trial = self.trial_count
+        block_bytes = chunk_size * block_size
+        blocks = max(1, TRIAL_BYTES // block_bytes)
+        packet = bytearray(_PROBE_HEADER.size + chunk_size)
+
+        sent = 0
+        received_packets = received_bytes = 0
+        start = time.perf_counter()
+        for _ in range(blocks):
+            for _ in range(block_size):
+                _PROBE_HEADER.pack_into(packet, 0, PROBE_MAGIC, KIND_DATA, self.probe_id, trial, sent)
+                data_sock.sendto(packet, (PROBE_GROUP, self.port))
+                sent += 1
+            # Como tras un FIN_DE_BLOQUE: se espera la respuesta del receptor antes de seguir.
+            report = self._request_report(control_sock, trial, sent)
+            if report is not None:
+                received_packets, received_bytes = report
+        elapsed = time.perf_counter() - start
+
+        loss = 1 - min(received_packets, sent) / sent
+        payload_bytes = received_packets * chunk_size
+        result = {'chunk_size': chunk_size, 'block_size_packets': block_size, 'sent': sent,
+                  'loss': loss, 'goodput_bps': payload_bytes * 8 / elapsed if elapsed > 0 else 0.0}
+        self.progress_callback(f"Trozo {chunk_size} B, bloque {block_size}: {result['goodput_bps'] / 1_000_000:.1f} Mbps útiles, pérdida {loss:.1%}")
+        return result
+
+    def _request_report(self, control_sock, trial, seq):
+        request = _PROBE_HEADER.pack(PROBE_MAGIC, KIND_REPORT_REQUEST, self.probe_id, trial, seq)
+        timeout = max(0.2, 4 * (self.rtt or 0.05))
+        for _ in range(3):
+            reply, _ = self._request(control_sock, request, KIND_REPORT, seq, timeout)
+            if reply is not None:
+                return _REPORT_BODY.unpack_from(reply, _PROBE_HEADER.size)
+        return None
+
+    def _request(self, control_sock, request, expected_kind, seq, timeout):
+        """Envía una petición y espera su respuesta. Devuelve (datagrama, segundos) o (None, None)."""
+        start = time.perf_counter()
+        control_sock.sendto(request, self.peer)
+        deadline = start + timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0: return None, None
+            control_sock.settimeout(remaining)
+            try:
+                data, addr = control_sock.recvfrom(1024)
+            except socket.timeout:
+                return None, None
+            if addr[0] != self.peer[0] or len(data) < _PROBE_HEADER.size: continue
+            magic, kind, probe_id, _, reply_seq = _PROBE_HEADER.unpack_from(data)
+            if magic == PROBE_MAGIC and kind == expected_kind and probe_id == self.probe_id and reply_seq == seq:
+                return data, time.perf_counter() - start
+
+def _trial_score(trial):
+    # Caudal útil penalizado por la pérdida, que en el protocolo real cuesta rondas de reparación.
+    return trial['goodput_bps'] * (1 - trial['loss']) ** 2
+
+def _best_trial(trials):
+    acceptable = [t for t in trials if t['loss'] <= MAX_ACCEPTABLE_LOSS] or trials
+    return max(acceptable, key=_trial_score)
+
+def recommend_settings(best, rtt):
+    """Ajustes de red a partir de la mejor prueba y del RTT medido."""
+    loss = best['loss']
+    return {
+        'chunk_size': best['chunk_size'],
+        'block_size_packets': best['block_size_packets'],
+        'nack_listen_timeout': round(max(0.15, 4 * rtt + 0.05), 2),
+        'repair_rounds': 5 if loss > 0.01 else 4,
+        # Con la tasa adaptativa es el techo: algo por encima de lo medido para poder subir.
+        'target_bitrate': round(best['goodput_bps'] * 1.25 / 1_000_000, 1),
+        'fec_parity_packets': 4 if loss > 0.005 else 0,
+    }
+
+# ioctl de Linux para leer la dirección y la máscara de una interfaz.
+_SIOCGIFADDR = 0x8915
+_SIOCGIFNETMASK = 0x891B
+
+def _interface_netmask(ip):
+    """Máscara de la interfaz que tiene la IP `ip` (solo Linux), o None si no se puede saber."""
+    if fcntl is None: return None
+    try:
+        interfaces = socket.if_nameindex()
+    except OSError:
+        return None
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for _, name in interfaces:
+            ifreq = struct.pack('256s', name.encode()[:15])
+            try:
+                if socket.inet_ntoa(fcntl.ioctl(sock.fileno(), _SIOCGIFADDR, ifreq)[20:24]) != ip: continue
+                return socket.inet_ntoa(fcntl.ioctl(sock.fileno(), _SIOCGIFNETMASK, ifreq)[20:24])
+            except OSError:
+                continue
+    return None
+
+def current_network_key():
+    """Subred de la IP local con la máscara de su interfaz (o /24 si no se puede leer), p. ej. '192.168.1.0/24'."""
+    ip = get_local_ip()
+    try:
+        return str(ipaddress.ip_network(f"{ip}/{_interface_netmask(ip) or 24}", strict=False))
+    except ValueError:
+        return ip
+
+def parse_network_key(text):
+    """Normaliza una subred indicada por el usuario ('10.0.0.0/16'). Lanza ValueError si no es válida."""
+    return str(ipaddress.ip_network(text.strip(), strict=False))
+
+def save_network_profile(config, network_key, result):
+    """Guarda el resultado de la sonda como perfil de la red `network_key` (no toca 'network_settings')."""
+    config.setdefault('network_profiles', {})[network_key] = {
+        'settings': result['settings'],
+        'rtt_ms': round(result['rtt'] * 1000, 3),
+        'goodput_mbps': round(result['best']['goodput_bps'] / 1_000_000, 1),
+        'loss': round(result['best']['loss'], 4),
+        'tuned_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+def _profile_for_ip(profiles, ip):
+    """(clave, perfil) de la subred más específica que contiene `ip`, o (None, None)."""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return None, None
+    best_key, best_network = None, None
+    for key in profiles:
+        try:
+            network = ipaddress.ip_network(key, strict=False)
+        except ValueError:
+            continue
+        if address in network and (best_network is None or network.prefixlen > best_network.prefixlen):
+            best_key, best_network = key, network
+    return (best_key, profiles[best_key]) if best_key else (None, None)
+
+def apply_network_profile(config):
+    """
+    Configuración para usar en la red actual: una copia de `config` con los ajustes del perfil
+    de esta red sobre 'network_settings'. `config` no cambia, así que guardarlo no convierte el
+    perfil en los valores base. Devuelve (configuración, clave de red aplicada o None).
+    """
+    network_key, profile = _profile_for_ip(config.get('network_profiles') or {}, get_local_ip())
+    if not profile: return config, None
+    effective = dict(config)
+    effective['network_settings'] = {**config.get('network_settings', {}), **profile.get('settings', {})}
+    return effective, network_key